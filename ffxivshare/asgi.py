@@ -3,6 +3,14 @@ ASGI config for ffxivshare project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+主页、分享详情、搜索、作者主页和合集详情使用异步视图（ffxivshare/urls_asgi.py），
+等待数据库和慢速客户端时不占用工作线程。启动方式例如::
+
+    uvicorn ffxivshare.asgi:application --workers 4
+    gunicorn ffxivshare.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+请保持中间件都支持异步（REQUEST_PROFILING 的统计中间件只支持同步，开启后每个请求会切换到线程执行）。
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +20,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ffxivshare.settings')
+os.environ.setdefault('DJANGO_ROOT_URLCONF', 'ffxivshare.urls_asgi')
+# 每个请求的同步部分在各自的线程中执行，持久连接会随线程结束而泄漏
+os.environ.setdefault('CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# 访问量低时浏览量缓冲也会按 VIEW_COUNTER_SPILL_INTERVAL 定时写出
+from shares import viewcounter
+
+viewcounter.enable_timer()
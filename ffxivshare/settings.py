@@ -49,16 +49,19 @@ CKEDITOR_CONFIGS = {
 }
 
 MIDDLEWARE = [
+    'shares.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'shares.replicas.PinPrimaryMiddleware',
+    'shares.anonymous.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'shares.anonymous.AuthenticationMiddleware',
+    'shares.anonymous.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'ffxivshare.urls'
+# ASGI 入口把热点只读页面换成异步视图（ffxivshare/urls_asgi.py）
+ROOT_URLCONF = os.getenv('DJANGO_ROOT_URLCONF', 'ffxivshare.urls')
 
 TEMPLATES = [
     {
@@ -79,13 +82,46 @@ TEMPLATES = [
 WSGI_APPLICATION = 'ffxivshare.wsgi.application'
 
 # Database
+# SQLite 连接建立时执行的 PRAGMA（见 shares/sqlite.py）；值会直接拼入 SQL，只能写常量
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # 负数表示 KiB，即 64 MiB
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'PRAGMAS': SQLITE_PRAGMAS,
+        # 复用连接，避免每个请求重新打开文件和执行 PRAGMA（ASGI 下每个请求在新线程中访问数据库，
+        # 无法复用，asgi.py 默认设为 0）
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# 只读副本：DATABASE_REPLICA_PATHS 为逗号分隔的 SQLite 副本文件路径，每个加为别名 replica1、replica2 ...；
+# 其他数据库的副本可以直接在 DATABASES 中添加别名并列入 DATABASE_REPLICAS。
+# 首页、搜索、作者主页和合集详情从副本读取（见 shares/replicas.py），
+# 访客提交修改后 REPLICA_PIN_SECONDS 秒内读主库；副本出错后 REPLICA_RETRY_AFTER 秒内不再使用
+for _index, _path in enumerate(filter(None, os.getenv('DATABASE_REPLICA_PATHS', '').split(',')), 1):
+    DATABASES[f'replica{_index}'] = {**DATABASES['default'], 'NAME': _path, 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+DATABASE_ROUTERS = ['shares.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+REPLICA_RETRY_AFTER = 30
+
+# 写入较多的路径（浏览量写出、创建分享、提交举报）经 shares.sqlite.write() 执行：
+# 同一进程内的写事务排队执行，遇到其他进程持有写锁时最多重试 SQLITE_WRITE_RETRIES 次，
+# 首次等待 SQLITE_WRITE_BACKOFF 秒并逐次加倍
+SQLITE_SERIALIZE_WRITES = os.getenv('SQLITE_SERIALIZE_WRITES', '1') == '1'
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_BACKOFF = 0.05
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -122,6 +158,55 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 战术板缩略图（宽, 高），以及渲染文字使用的字体文件（留空则使用 Pillow 默认字体）
+SHARE_THUMBNAIL_SIZE = (400, 300)
+SHARE_THUMBNAIL_FONT = os.getenv('SHARE_THUMBNAIL_FONT') or None
+
+# 浏览量缓冲：每个进程内累计，满足任一条件时写入增量表，再由 flush_view_counts 合并到分享
+VIEW_COUNTER_SPILL_INTERVAL = 10  # 秒
+VIEW_COUNTER_SPILL_THRESHOLD = 200  # 次
+# 浏览去重：每代布隆过滤器的位数和记满轮换前的分享数（见 shares/viewdedup.py），修改后旧 Cookie 失效
+VIEW_DEDUP_BITS = 512
+VIEW_DEDUP_CAPACITY = 48  # 不超过 255
+
+# 缓存：设置 REDIS_URL 时使用 Redis，所有进程共享缓存，整页缓存的失效对所有进程立即生效；
+# 否则使用进程内缓存，失效只作用于当前进程，只适合单进程部署
+# （多进程时 manage.py check --deploy 报 shares.E001，单进程部署可加入 SILENCED_SYSTEM_CHECKS）
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# 匿名访问整页缓存：PAGE_CACHE_TTL 秒内直接命中，过期后重建期间最多返回 PAGE_CACHE_STALE_TTL 秒内的旧页面
+PAGE_CACHE_TTL = 60
+PAGE_CACHE_STALE_TTL = 600
+# 没有会话的匿名请求跳过会话、登录用户和提示消息中间件（见 shares/anonymous.py）
+ANONYMOUS_FAST_PATH = True
+# 快速路径上的匿名整页缓存页面允许共享缓存（CDN / 反向代理）缓存的秒数，0 表示不允许
+PAGE_CACHE_HTTP_MAX_AGE = int(os.getenv('PAGE_CACHE_HTTP_MAX_AGE', '30'))
+
+# 分享卡片片段缓存的有效期（秒），缓存键包含 updated_at，编辑后自动换新键
+SHARE_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# 分享 ID 分配：ID 由计数器经以 SHARE_ID_KEY 为密钥的置换得到，上线后不要修改该密钥，
+# 否则新 ID 会与已有 ID 冲突（会自动重试，但冲突率上升）；每个进程每次从数据库预留 SHARE_ID_BLOCK_SIZE 个序号
+SHARE_ID_KEY = os.getenv('SHARE_ID_KEY', SECRET_KEY)
+SHARE_ID_BLOCK_SIZE = 64
+
+# 请求性能统计（Server-Timing 响应头、慢请求日志、/staff/profiling/），默认关闭
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING') == '1'
+REQUEST_PROFILING_SLOW_MS = 500
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
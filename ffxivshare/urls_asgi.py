@@ -0,0 +1,21 @@
+"""
+ASGI 部署使用的 URL 配置
+
+热点只读页面换成 shares.async_views 中的异步版本（URL 名称不变），其余与 ffxivshare.urls 相同。
+ffxivshare/asgi.py 通过 DJANGO_ROOT_URLCONF 环境变量启用本配置。
+"""
+from django.urls import path, re_path
+
+from shares import async_views
+
+from . import urls as sync_urls
+
+urlpatterns = [
+    path('', async_views.index, name='index'),
+    re_path(r'^s/(?P<share_id>[^/]+)(?:/.*)?$', async_views.share_detail, name='share_detail'),
+    path('search/', async_views.search, name='search'),
+    path('u/<str:username>/', async_views.user_public_profile, name='user_public_profile'),
+    path('collections/<int:collection_id>/', async_views.collection_detail, name='collection_detail'),
+] + sync_urls.urlpatterns
+
+handler404 = sync_urls.handler404
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ffxivshare.settings')
 
 application = get_wsgi_application()
+
+# 访问量低时浏览量缓冲也会按 VIEW_COUNTER_SPILL_INTERVAL 定时写出
+from shares import viewcounter
+
+viewcounter.enable_timer()
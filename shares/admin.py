@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Share, UserProfile, Announcement
+from .models import Share, UserProfile, Announcement, DerivativeJob
 
 
 @admin.register(Announcement)
@@ -12,11 +12,21 @@ class AnnouncementAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(DerivativeJob)
+class DerivativeJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'share', 'kind', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    search_fields = ['share__share_id', 'last_error']
+    raw_id_fields = ['share']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at']
+    list_select_related = ['share']
+
+
 @admin.register(Share)
 class ShareAdmin(admin.ModelAdmin):
     list_display = ['title', 'share_id', 'get_author_display', 'visibility', 'views', 'created_at']
     list_filter = ['visibility', 'created_at', 'author']
-    search_fields = ['title', 'share_id', 'description', 'author__username', 'author__profile__nickname']
+    search_fields = ['title', 'share_id', 'description', 'author__username', 'author__profile__nickname', '=content_hash']
     readonly_fields = ['share_id', 'created_at', 'updated_at', 'views']
     date_hierarchy = 'created_at'
     list_per_page = 20
@@ -86,10 +96,11 @@ admin.site.register(User, UserAdmin)
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ['user', 'nickname', 'get_share_count', 'created_at', 'updated_at']
+    list_display = ['user', 'nickname', 'public_share_count', 'total_views', 'created_at', 'updated_at']
     search_fields = ['user__username', 'nickname', 'bio']
     list_filter = ['created_at']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['public_share_count', 'total_views', 'created_at', 'updated_at']
+    list_select_related = ['user']
     
     fieldsets = (
         ('用户信息', {
@@ -98,13 +109,11 @@ class UserProfileAdmin(admin.ModelAdmin):
         ('个人资料', {
             'fields': ('nickname', 'bio')
         }),
+        ('统计信息', {
+            'fields': ('public_share_count', 'total_views')
+        }),
         ('时间信息', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
-    
-    def get_share_count(self, obj):
-        """显示分享数量"""
-        return obj.user.shares.count()
-    get_share_count.short_description = '分享数量'
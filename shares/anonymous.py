@@ -0,0 +1,93 @@
+"""
+匿名读请求的快速路径
+
+没有会话 Cookie 的 GET / HEAD 请求一定来自匿名访客：会话为空，用户是 AnonymousUser。
+settings.MIDDLEWARE 中用本模块的三个子类替代 Django 自带的会话、登录用户和提示消息中间件，
+对这类请求：
+
+- 不执行它们的 process_request：request.user 直接是 AnonymousUser，request.session 是空会话，
+  不读取会话存储（ASGI 下也省去了每个钩子一次的线程切换）
+- 只有视图确实写入了会话、添加或读取了提示消息时才执行对应的 process_response，
+  其余响应不会产生 Set-Cookie；响应始终带有 Vary: Cookie，共享缓存不会把匿名页面返回给登录用户
+- 设置 request.guest_fast_path，整页缓存据此为匿名页面加上 Cache-Control: public（见 PAGE_CACHE_HTTP_MAX_AGE）
+
+带有会话 Cookie 的请求和其他请求方法照常经过 Django 自带的处理。
+ANONYMOUS_FAST_PATH = False 时三个中间件的行为与 Django 自带的完全相同。
+``manage.py bench_anonymous`` 对比开启前后匿名请求的数据库查询、Set-Cookie 和共享缓存命中。
+"""
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware as BaseAuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware as BaseMessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+from django.utils.cache import patch_vary_headers
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def is_guest_read(request):
+    return (
+        settings.ANONYMOUS_FAST_PATH
+        and request.method in SAFE_METHODS
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+class GuestFastPathMixin:
+    """匿名读请求用 prepare_guest 代替 process_request，needs_response 为真时才执行 process_response"""
+
+    def __call__(self, request):
+        if not is_guest_read(request):
+            return super().__call__(request)
+        self.prepare_guest(request)
+        if iscoroutinefunction(self):
+            return self._guest_acall(request)
+        response = self.get_response(request)
+        if self.needs_response(request):
+            response = self.process_response(request, response)
+        return self.finish_guest(response)
+
+    async def _guest_acall(self, request):
+        response = await self.get_response(request)
+        if self.needs_response(request):
+            response = await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+        return self.finish_guest(response)
+
+    def prepare_guest(self, request):
+        """代替 process_request，默认什么也不做"""
+
+    def needs_response(self, request):
+        return False
+
+    def finish_guest(self, response):
+        return response
+
+
+class SessionMiddleware(GuestFastPathMixin, BaseSessionMiddleware):
+    def prepare_guest(self, request):
+        request.guest_fast_path = True
+        # 没有会话键的空会话，读取时不会访问会话存储
+        request.session = self.SessionStore()
+
+    def needs_response(self, request):
+        return request.session.modified
+
+    def finish_guest(self, response):
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+class AuthenticationMiddleware(GuestFastPathMixin, BaseAuthenticationMiddleware):
+    def prepare_guest(self, request):
+        request.user = AnonymousUser()
+
+
+class MessageMiddleware(GuestFastPathMixin, BaseMessageMiddleware):
+    def prepare_guest(self, request):
+        # 只创建存储对象，不读取任何数据
+        self.process_request(request)
+
+    def needs_response(self, request):
+        storage = request._messages
+        return storage.used or storage.added_new
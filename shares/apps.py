@@ -5,3 +5,38 @@ class SharesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shares'
     verbose_name = '分享管理'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_init, post_save
+        # checks 在导入时注册部署检查
+        from . import cache, checks, counters, search, sqlite
+        from .models import Announcement, Collection, CollectionItem, Share, UserProfile
+
+        # SQLite 连接初始化（WAL、busy_timeout 等）
+        connection_created.connect(sqlite.configure_connection, dispatch_uid='sqlite_configure_connection')
+
+        # 全文搜索索引同步
+        post_save.connect(search.share_saved, sender=Share, dispatch_uid='search_share_saved')
+        post_delete.connect(search.share_deleted, sender=Share, dispatch_uid='search_share_deleted')
+        post_save.connect(search.author_saved, sender=User, dispatch_uid='search_user_saved')
+        post_save.connect(search.author_saved, sender=UserProfile, dispatch_uid='search_profile_saved')
+
+        # 整页缓存失效
+        post_init.connect(cache.share_initialized, sender=Share, dispatch_uid='cache_share_init')
+        post_init.connect(cache.profile_initialized, sender=UserProfile, dispatch_uid='cache_profile_init')
+        for signal in (post_save, post_delete):
+            name = 'saved' if signal is post_save else 'deleted'
+            signal.connect(cache.share_changed, sender=Share, dispatch_uid=f'cache_share_{name}')
+            signal.connect(cache.announcement_changed, sender=Announcement, dispatch_uid=f'cache_announcement_{name}')
+            signal.connect(cache.collection_changed, sender=Collection, dispatch_uid=f'cache_collection_{name}')
+            signal.connect(cache.collection_changed, sender=CollectionItem, dispatch_uid=f'cache_item_{name}')
+        post_save.connect(cache.profile_changed, sender=UserProfile, dispatch_uid='cache_profile_saved')
+
+        # 冗余计数
+        post_init.connect(counters.share_initialized, sender=Share, dispatch_uid='counters_share_init')
+        post_save.connect(counters.share_saved, sender=Share, dispatch_uid='counters_share_saved')
+        post_delete.connect(counters.share_deleted, sender=Share, dispatch_uid='counters_share_deleted')
+        post_save.connect(counters.collection_item_saved, sender=CollectionItem, dispatch_uid='counters_item_saved')
+        post_delete.connect(counters.collection_item_deleted, sender=CollectionItem, dispatch_uid='counters_item_deleted')
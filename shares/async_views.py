@@ -0,0 +1,161 @@
+"""
+热点只读页面的异步视图
+
+主页、分享详情、搜索、作者主页和合集详情在 ASGI 部署下使用这里的异步版本
+（见 ffxivshare/urls_asgi.py 和 ffxivshare/asgi.py），与 views.py 中的同步版本共用
+查询构造、卡片缓存和整页缓存，页面内容相同：
+
+- 查询使用异步 ORM（aget / afirst / acount / async for），缓存使用 aget_many / aset_many 等异步接口
+- 读取会话、登录用户、模板渲染和浏览量写出等只有同步实现的部分通过 sync_to_async 在线程中执行
+
+Django 4.2 的异步 ORM 本身仍在线程中执行 SQL，异步视图的收益在于等待数据库、
+缓存和慢速客户端时不占用工作线程，同一进程可以保持更多并发连接。
+``manage.py bench_asgi`` 对比 WSGI 和 ASGI 在相同机器上的并发能力。
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from .cache import author_namespace, cache_anonymous_page, public_for_guests
+from .cards import aattach_cards
+from .models import Collection, Share
+from .pagination import apaginate
+from .replicas import read_from_replica
+from .search import SEARCH_ORDERING, search_shares
+from .views import (
+    COLLECTION_ITEM_ORDERING, _can_open_by_id, _collection_card_options, _collection_items, _count_view,
+    _index_queryset, _latest_announcement, _listed_shares, _public_collections, _related_collections,
+    _set_viewed_cookie, _share_access_error, _user_collections,
+)
+
+arender = sync_to_async(render)
+
+
+async def _load_user(request):
+    """在线程中加载 request.user（需要读取会话），之后在异步代码中可以直接访问"""
+    if not getattr(request, 'guest_fast_path', False):
+        await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def _share_cards_fragment(request, shares):
+    response = await arender(request, 'shares/_share_cards.html', {'shares': shares})
+    response['X-Next-Page'] = shares.next_url
+    return response
+
+
+@cache_anonymous_page(
+    'index', params=['category', 'hide_spoiler', 'hide_nsfw', 'cursor', 'fragment'],
+    namespaces=lambda request: ['index'],
+)
+@read_from_replica
+async def index(request):
+    """主页 - 显示所有公开且已通过审核的分享"""
+    shares_list, context = _index_queryset(request)
+    shares = await apaginate(request, shares_list, 12)
+    await aattach_cards(shares, 'index')
+    if request.GET.get('fragment'):
+        return await _share_cards_fragment(request, shares)
+
+    context['latest_announcement'] = await _latest_announcement().afirst()
+    context['shares'] = shares
+    return await arender(request, 'shares/index.html', context)
+
+
+async def share_detail(request, share_id):
+    """分享详情页"""
+    try:
+        share = await Share.objects.select_related('author__profile').aget(share_id=share_id)
+    except Share.DoesNotExist:
+        return await arender(request, '404.html', status=404)
+
+    user = await _load_user(request)
+    error = _share_access_error(user, share)
+    if error:
+        messages.error(request, error)
+        return redirect('index')
+
+    # 浏览量缓冲区可能需要写出到数据库
+    viewed = await sync_to_async(_count_view)(request, share)
+
+    user_collections = []
+    if user.is_authenticated and share.author_id == user.id:
+        user_collections = [collection async for collection in _user_collections(user)]
+
+    response = await arender(request, 'shares/detail.html', {
+        'share': share,
+        'related_collections': [collection async for collection in _related_collections(share, user)],
+        'user_collections': user_collections,
+    })
+    _set_viewed_cookie(response, viewed)
+    return response
+
+
+@public_for_guests
+@read_from_replica
+async def search(request):
+    """搜索分享"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return redirect('index')
+
+    share = await Share.objects.filter(share_id=query).only('share_id', 'author_id', 'visibility').afirst()
+    if share and _can_open_by_id(await _load_user(request), share):
+        return redirect('share_detail', share_id=share.share_id)
+
+    shares = await apaginate(request, search_shares(_listed_shares(), query), 12, ordering=SEARCH_ORDERING)
+    await aattach_cards(shares, 'index')
+    if request.GET.get('fragment'):
+        return await _share_cards_fragment(request, shares)
+
+    return await arender(request, 'shares/index.html', {
+        'shares': shares,
+        'search_query': query
+    })
+
+
+@cache_anonymous_page(
+    'user_public_profile', params=['cursor'],
+    namespaces=lambda request, username: [author_namespace(username)],
+)
+@read_from_replica
+async def user_public_profile(request, username):
+    """用户公开个人主页"""
+    try:
+        author = await User.objects.select_related('profile').aget(username=username)
+    except User.DoesNotExist:
+        raise Http404
+
+    shares = await apaginate(request, _listed_shares().filter(author=author), 12)
+    await aattach_cards(shares, 'profile')
+
+    return await arender(request, 'shares/user_public_profile.html', {
+        'author': author,
+        'shares': shares,
+        'collections': [collection async for collection in _public_collections(author)],
+    })
+
+
+@public_for_guests
+@read_from_replica
+async def collection_detail(request, collection_id):
+    """合集详情页"""
+    try:
+        collection = await Collection.objects.select_related('author__profile').aget(id=collection_id)
+    except Collection.DoesNotExist:
+        raise Http404
+
+    user = await _load_user(request)
+    if not collection.is_public and collection.author != user:
+        messages.error(request, '该合集不存在或您没有权限访问')
+        return redirect('index')
+
+    items = await apaginate(request, _collection_items(collection, user), 12, ordering=COLLECTION_ITEM_ORDERING)
+    await aattach_cards(items, **_collection_card_options(request, collection), start=items.start_index())
+
+    return await arender(request, 'shares/collection_detail.html', {
+        'collection': collection,
+        'items': items,
+    })
@@ -0,0 +1,305 @@
+"""
+匿名访问的整页缓存
+
+主页（含“加载更多”片段）和用户主页的匿名 GET 请求按规范化后的查询参数缓存整页 HTML。
+
+失效：每个页面属于若干命名空间（主页为 ``index``，用户主页为 ``author:<用户名>``），
+缓存条目记录生成时各命名空间的版本号。Share / Announcement / Collection 等模型的
+保存和删除信号只递增受影响命名空间的版本号，对应页面随即过期，其他页面不受影响。
+
+过期后允许短时间返回旧内容（stale-while-revalidate）：第一个发现过期的请求抢到
+重建锁并重新渲染，其余请求在重建完成前继续拿到旧页面，新分享发布后的访问高峰
+不会同时压到数据库上。
+
+没有会话的匿名请求（见 anonymous.py）命中或生成的页面还会带上 Cache-Control: public，
+允许共享缓存缓存 PAGE_CACHE_HTTP_MAX_AGE 秒；不做整页缓存的匿名只读页面（搜索、合集详情）
+用 public_for_guests 获得同样的响应头。
+
+浏览量由 flush_view_counts 批量写回，不触发失效，卡片上的浏览量最多滞后 PAGE_CACHE_TTL 秒。
+版本号保存在 CACHES['default'] 中，失效只对共享这个缓存的进程立即生效：多进程部署需要共享后端
+（设置 REDIS_URL），使用进程内缓存时 ``manage.py check --deploy`` 报错（见 checks.py）。
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+
+KEY_PREFIX = 'pagecache'
+LOCK_TIMEOUT = 30
+
+
+def _generation_key(namespace):
+    return f'{KEY_PREFIX}:gen:{namespace}'
+
+
+def generations(namespaces):
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    values = cache.get_many(keys)
+    return tuple(values.get(key, 0) for key in keys)
+
+
+async def agenerations(namespaces):
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    values = await cache.aget_many(keys)
+    return tuple(values.get(key, 0) for key in keys)
+
+
+def invalidate(*namespaces):
+    """递增命名空间版本号，使其下所有缓存页面过期"""
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # 刚好被淘汰，重新写入即可（任何非 0 值都与已缓存页面记录的版本不同）
+            cache.set(key, int(time.time()), None)
+
+
+def author_namespace(username):
+    return f'author:{username}'
+
+
+def _has_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def _cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def _from_entry(entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Page-Cache'] = state
+    return response
+
+
+def _personalized(request):
+    """已登录用户和带有提示消息的请求不使用缓存（读取 request.user 和消息可能查询会话）"""
+    return request.user.is_authenticated or _has_messages(request)
+
+
+def _shared(request, response):
+    """
+    快速路径上的匿名页面不涉及会话和 Cookie，允许共享缓存（CDN / 反向代理）缓存 PAGE_CACHE_HTTP_MAX_AGE 秒
+    （响应带有 Vary: Cookie，登录用户不会拿到共享缓存中的页面）
+    """
+    if (getattr(request, 'guest_fast_path', False) and settings.PAGE_CACHE_HTTP_MAX_AGE
+            and _cacheable(response) and not _has_messages(request)):
+        patch_cache_control(response, public=True, max_age=settings.PAGE_CACHE_HTTP_MAX_AGE)
+    return response
+
+
+def public_for_guests(view):
+    """没有整页缓存、但对所有匿名访客内容相同的只读页面：快速路径上的响应同样允许共享缓存缓存"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            return _shared(request, await view(request, *args, **kwargs))
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return _shared(request, view(request, *args, **kwargs))
+    return wrapper
+
+
+def _page_key(view_name, params, request, args, kwargs):
+    query = [(name, request.GET.get(name)) for name in params if request.GET.get(name)]
+    raw_key = repr((view_name, args, sorted(kwargs.items()), query))
+    return f'{KEY_PREFIX}:page:{hashlib.md5(raw_key.encode("utf-8")).hexdigest()}'
+
+
+def _is_fresh(entry, current):
+    return entry['generations'] == current and time.time() - entry['created'] < settings.PAGE_CACHE_TTL
+
+
+def _to_entry(response, current):
+    return {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': list(response.items()),
+        'generations': current,
+        'created': time.time(),
+    }
+
+
+def cache_anonymous_page(view_name, params, namespaces):
+    """
+    为视图加上匿名整页缓存
+
+    params: 参与缓存键的查询参数名；其他参数被忽略
+    namespaces: 函数 (request, *args, **kwargs) -> 页面所属的命名空间列表
+
+    也可以装饰异步视图，此时缓存读写使用异步接口，与同步视图共用同一份缓存。
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return _async_page_cache(view, view_name, params, namespaces)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _personalized(request):
+                return view(request, *args, **kwargs)
+
+            key = _page_key(view_name, params, request, args, kwargs)
+            lock_key = f'{key}:lock'
+            current = generations(namespaces(request, *args, **kwargs))
+
+            entry = cache.get(key)
+            locked = False
+            if entry is not None:
+                if _is_fresh(entry, current):
+                    return _shared(request, _from_entry(entry, 'HIT'))
+                # 已过期：只有抢到锁的请求负责重建，其余请求先返回旧内容
+                locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+                if not locked:
+                    return _from_entry(entry, 'STALE')
+
+            try:
+                response = view(request, *args, **kwargs)
+                if _cacheable(response) and not _has_messages(request):
+                    cache.set(key, _to_entry(response, current), settings.PAGE_CACHE_STALE_TTL)
+                    _shared(request, response)
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _async_page_cache(view, view_name, params, namespaces):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await view(request, *args, **kwargs)
+        # 快速路径上的请求没有会话，判断是否个性化不会访问存储，不必切换到线程
+        if getattr(request, 'guest_fast_path', False):
+            personalized = _personalized(request)
+        else:
+            personalized = await sync_to_async(_personalized)(request)
+        if personalized:
+            return await view(request, *args, **kwargs)
+
+        key = _page_key(view_name, params, request, args, kwargs)
+        lock_key = f'{key}:lock'
+        current = await agenerations(namespaces(request, *args, **kwargs))
+
+        entry = await cache.aget(key)
+        locked = False
+        if entry is not None:
+            if _is_fresh(entry, current):
+                return _shared(request, _from_entry(entry, 'HIT'))
+            locked = await cache.aadd(lock_key, 1, LOCK_TIMEOUT)
+            if not locked:
+                return _from_entry(entry, 'STALE')
+
+        try:
+            response = await view(request, *args, **kwargs)
+            if _cacheable(response) and not _has_messages(request):
+                await cache.aset(key, _to_entry(response, current), settings.PAGE_CACHE_STALE_TTL)
+                _shared(request, response)
+        finally:
+            if locked:
+                await cache.adelete(lock_key)
+        response['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+# ---- 信号处理：精确失效 ----
+
+def _is_listed(share):
+    return share.visibility == 'public' and share.status == 'approved'
+
+
+def _author_username(share):
+    if not share.author_id:
+        return None
+    from django.contrib.auth.models import User
+    if 'author' in share._state.fields_cache:
+        return share.author.username
+    return User.objects.filter(pk=share.author_id).values_list('username', flat=True).first()
+
+
+def share_initialized(sender, instance, **kwargs):
+    # 记录加载时是否出现在公开列表中，保存时据此判断是否需要使主页失效
+    loaded = instance.__dict__
+    if 'visibility' in loaded and 'status' in loaded:
+        instance._was_listed = _is_listed(instance)
+
+
+def share_changed(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    namespaces = []
+    if _is_listed(instance) or getattr(instance, '_was_listed', False):
+        namespaces.append('index')
+    username = _author_username(instance)
+    if username:
+        namespaces.append(author_namespace(username))
+    invalidate(*namespaces)
+    instance._was_listed = _is_listed(instance)
+
+
+def shares_changed(share_ids):
+    """批量更新（queryset.update）后手动调用，例如缩略图生成完成"""
+    from .models import Share
+    rows = Share.objects.filter(pk__in=share_ids).values_list('author__username', 'visibility', 'status')
+    namespaces = set()
+    for username, visibility, status in rows:
+        if visibility == 'public' and status == 'approved':
+            namespaces.add('index')
+        if username:
+            namespaces.add(author_namespace(username))
+    invalidate(*namespaces)
+
+
+def announcement_changed(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        invalidate('index')
+
+
+def collection_changed(sender, instance, **kwargs):
+    """合集或合集项变化时使合集作者的主页失效（主页显示合集及其内容数量）"""
+    if kwargs.get('raw'):
+        return
+    from django.contrib.auth.models import User
+    from .models import CollectionItem
+    if isinstance(instance, CollectionItem):
+        users = User.objects.filter(collections__id=instance.collection_id)
+    else:
+        users = User.objects.filter(pk=instance.author_id)
+    username = users.values_list('username', flat=True).first()
+    if username:
+        invalidate(author_namespace(username))
+
+
+def profile_initialized(sender, instance, **kwargs):
+    loaded = instance.__dict__
+    if 'nickname' in loaded and 'bio' in loaded:
+        instance._cached_display = (instance.nickname, instance.bio)
+
+
+def profile_changed(sender, instance, **kwargs):
+    # 每次登录都会保存资料，只有昵称或简介变化时才失效
+    if kwargs.get('raw') or getattr(instance, '_cached_display', None) == (instance.nickname, instance.bio):
+        return
+    instance._cached_display = (instance.nickname, instance.bio)
+    from django.contrib.auth.models import User
+    username = User.objects.filter(pk=instance.user_id).values_list('username', flat=True).first()
+    invalidate('index', *([author_namespace(username)] if username else []))
@@ -0,0 +1,107 @@
+"""
+分享卡片的片段缓存
+
+列表页（主页、用户主页、合集详情）里的每张卡片只取决于分享本身，在分享被编辑之前
+渲染结果不变，而渲染一张卡片要做 URL 反查、描述去标签截断等工作。
+这里按 (卡片类型, 分享 id, updated_at, 其他显示字段) 缓存每张卡片的 HTML，一页的
+卡片用一次 get_many 取回，只渲染未命中的卡片，再用一次 set_many 写回。
+
+缩略图和作者昵称的变化不会更新 Share.updated_at，因此它们也计入缓存键。浏览量变化频繁，
+不计入缓存键（否则每次合并浏览量都会换新键、留下大量无用的旧条目）：卡片模板输出占位符，
+取回 HTML 后再替换为当前浏览量。
+合集作者看到的卡片带有 CSRF 表单，不缓存。异步视图使用 aattach_cards，缓存读写走异步接口。
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# 卡片模板的结构变化时（例如复制码改为按需请求）递增，避免继续使用旧模板渲染的缓存
+KEY_VERSION = 4
+KEY_PREFIX = f'sharecard:v{KEY_VERSION}'
+# 卡片模板中浏览量（card_views）的占位符
+VIEWS_SLOT = '__card_views__'
+
+CARD_TEMPLATES = {
+    'index': 'shares/_share_card.html',
+    'profile': 'shares/_profile_share_card.html',
+    'collection': 'shares/_collection_item_card.html',
+}
+
+
+def _author_name(share):
+    """与模板一致：作者没有 UserProfile 时使用用户名"""
+    if not share.author_id:
+        return ''
+    profile = getattr(share.author, 'profile', None)
+    return profile.get_display_name() if profile else share.author.username
+
+
+def _card_key(variant, share, extra):
+    flags = repr((share.thumbnail_key, _author_name(share), extra))
+    digest = hashlib.md5(flags.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{variant}:{share.share_id}:{share.updated_at.timestamp()}:{digest}'
+
+
+def attach_cards(objects, variant, share=None, extra=None, context=None, request=None, cached=True, start=1):
+    """
+    为 objects 中的每个对象渲染卡片，结果放在对象的 card_html 属性上
+
+    share: 函数 obj -> Share，默认对象本身就是分享（合集页传入 CollectionItem）
+    extra: 函数 (obj, 序号) -> 元组，除分享外影响卡片内容的值，会计入缓存键
+    context: 所有卡片共用的模板变量
+    cached: 为 False 时直接渲染（需要 request 上下文的卡片，例如带 CSRF 表单）
+    start: 第一个对象的序号（分页时传入本页的起始序号）
+    """
+    objects = list(objects)
+    entries = _entries(objects, variant, share, extra, start)
+    found = cache.get_many([key for _, _, _, key in entries]) if cached else {}
+    missing = _render_missing(entries, found, variant, context, request, cached)
+    if cached and missing:
+        cache.set_many(missing, settings.SHARE_CARD_CACHE_TIMEOUT)
+    return objects
+
+
+async def aattach_cards(objects, variant, share=None, extra=None, context=None, request=None, cached=True, start=1):
+    """attach_cards 的异步版本：缓存读写使用异步接口，未命中的卡片在线程中渲染"""
+    objects = list(objects)
+    entries = _entries(objects, variant, share, extra, start)
+    found = await cache.aget_many([key for _, _, _, key in entries]) if cached else {}
+    if len(found) < len(entries):
+        missing = await sync_to_async(_render_missing)(entries, found, variant, context, request, cached)
+    else:
+        missing = _render_missing(entries, found, variant, context, request, cached)
+    if cached and missing:
+        await cache.aset_many(missing, settings.SHARE_CARD_CACHE_TIMEOUT)
+    return objects
+
+
+def _entries(objects, variant, share, extra, start):
+    entries = []
+    for position, obj in enumerate(objects, start):
+        item_share = share(obj) if share else obj
+        card_extra = extra(obj, position) if extra else ()
+        entries.append((obj, item_share, position, _card_key(variant, item_share, card_extra)))
+    return entries
+
+
+def _render_missing(entries, found, variant, context, request, cached):
+    """把卡片 HTML 放到对象上，返回新渲染的卡片（缓存键 -> HTML）"""
+    template = CARD_TEMPLATES[variant]
+    context = context or {}
+    missing = {}
+    for obj, item_share, position, key in entries:
+        html = found.get(key)
+        if html is None:
+            html = render_to_string(
+                template, {
+                    **context, 'share': item_share, 'item': obj, 'position': position, 'card_views': VIEWS_SLOT,
+                },
+                request=None if cached else request,
+            )
+            missing[key] = html
+        obj.card_html = mark_safe(html.replace(VIEWS_SLOT, str(item_share.views)))
+    return missing
@@ -0,0 +1,21 @@
+"""
+部署检查（``manage.py check --deploy``）
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches, deploy=True)
+def check_page_cache_backend(app_configs, **kwargs):
+    """整页缓存靠缓存中的版本号失效，进程内缓存的失效无法通知其他进程"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend != LOCAL_CACHE_BACKEND:
+        return []
+    return [Error(
+        f'整页缓存使用进程内缓存（{backend}），分享修改后其他进程最多继续返回 '
+        f'{settings.PAGE_CACHE_TTL + settings.PAGE_CACHE_STALE_TTL} 秒旧页面',
+        hint='设置 REDIS_URL 使用共享缓存；确实只运行单个进程时把 shares.E001 加入 SILENCED_SYSTEM_CHECKS',
+        id='shares.E001',
+    )]
@@ -0,0 +1,139 @@
+"""
+冗余计数
+
+作者主页、我的分享和后台列表需要显示合集内容数、用户公开分享数和总浏览量，
+以前每次渲染都要 COUNT / SUM 聚合。这里把它们保存在模型字段中：
+
+- Collection.item_count：合集项增删时由信号 +1 / -1
+- UserProfile.public_share_count：分享进入或离开公开列表（公开且已通过审核）、
+  更换作者或删除时由信号调整；批量审核等 queryset.update 之后调用 shares_published()
+- UserProfile.total_views：作者所有分享的浏览量之和，由 viewcounter.flush() 按作者汇总后
+  每个作者执行一条 UPDATE；分享删除时减去它的浏览量
+
+所有调整都是 ``UPDATE ... SET x = MAX(x + n, 0)``，不读取旧值，并发修改不会互相覆盖。
+``manage.py recompute_counters`` 按源数据全量重算，修正可能的偏差。
+"""
+from collections import Counter
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+
+def _adjust(queryset, field, delta):
+    if delta:
+        queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def adjust_profiles(field, deltas):
+    """按作者增减资料中的计数，deltas 为 user_id -> 增量"""
+    from .models import UserProfile
+    for user_id, delta in deltas.items():
+        if user_id:
+            _adjust(UserProfile.objects.filter(user_id=user_id), field, delta)
+
+
+def _listed_author(share):
+    """分享出现在公开列表中时返回作者 id，否则返回 None"""
+    if share.visibility == 'public' and share.status == 'approved':
+        return share.author_id
+    return None
+
+
+def share_initialized(sender, instance, **kwargs):
+    # 记录加载时计入了哪个作者的公开分享数，保存时据此增减
+    loaded = instance.__dict__
+    if 'visibility' in loaded and 'status' in loaded and 'author_id' in loaded:
+        instance._counted_author = _listed_author(instance)
+
+
+def share_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if created:
+        before = None
+    elif hasattr(instance, '_counted_author'):
+        before = instance._counted_author
+    else:
+        # 加载时没有读取可见性或状态，无法知道原来是否计入，直接重算该作者
+        instance._counted_author = _listed_author(instance)
+        recompute_profiles([instance.author_id])
+        return
+    after = _listed_author(instance)
+    if before != after:
+        deltas = Counter()
+        deltas[before] -= 1
+        deltas[after] += 1
+        adjust_profiles('public_share_count', deltas)
+    instance._counted_author = after
+
+
+def share_deleted(sender, instance, **kwargs):
+    if not instance.author_id:
+        return
+    deltas = {'total_views': -instance.views}
+    if getattr(instance, '_counted_author', _listed_author(instance)):
+        deltas['public_share_count'] = -1
+    for field, delta in deltas.items():
+        adjust_profiles(field, {instance.author_id: delta})
+
+
+def shares_published(share_ids):
+    """批量把分享改为已通过审核后调用（queryset.update 不触发信号）"""
+    from .models import Share
+    rows = (
+        Share.objects.filter(pk__in=share_ids, visibility='public', status='approved')
+        .exclude(author=None).values_list('author_id').annotate(total=Count('id')).order_by()
+    )
+    adjust_profiles('public_share_count', dict(rows))
+
+
+def adjust_item_count(collection_id, delta):
+    """增减合集内容数（bulk_create 等不触发信号的批量操作之后调用）"""
+    from .models import Collection
+    _adjust(Collection.objects.filter(pk=collection_id), 'item_count', delta)
+
+
+def collection_item_saved(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        adjust_item_count(instance.collection_id, 1)
+
+
+def collection_item_deleted(sender, instance, **kwargs):
+    adjust_item_count(instance.collection_id, -1)
+
+
+def recompute_profiles(user_ids=None):
+    """按分享表重算资料中的计数，返回被修正的资料"""
+    from django.db.models import Q, Sum
+    from .models import UserProfile
+
+    profiles = UserProfile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=[pk for pk in user_ids if pk])
+    listed = Q(user__shares__visibility='public', user__shares__status='approved')
+    expected = profiles.annotate(
+        expected_shares=Count('user__shares', filter=listed),
+        expected_views=Sum('user__shares__views', default=0),
+    ).only('id', 'user_id', 'public_share_count', 'total_views')
+    drifted = []
+    for profile in expected:
+        if (profile.public_share_count, profile.total_views) != (profile.expected_shares, profile.expected_views):
+            profile.public_share_count = profile.expected_shares
+            profile.total_views = profile.expected_views
+            drifted.append(profile)
+    UserProfile.objects.bulk_update(drifted, ['public_share_count', 'total_views'], batch_size=500)
+    return drifted
+
+
+def recompute_collections():
+    """按合集项重算合集内容数，返回被修正的合集"""
+    from .models import Collection
+
+    expected = Collection.objects.annotate(expected=Count('collectionitem')).only('id', 'title', 'item_count')
+    drifted = []
+    for collection in expected:
+        if collection.item_count != collection.expected:
+            collection.item_count = collection.expected
+            drifted.append(collection)
+    Collection.objects.bulk_update(drifted, ['item_count'], batch_size=500)
+    return drifted
@@ -0,0 +1,136 @@
+"""
+派生数据任务队列
+
+缩略图等由分享码派生的数据不在请求中生成，而是写入 DerivativeJob 表，
+由 ``manage.py run_derivative_worker`` 在进程池中批量处理。
+
+每种任务由两部分组成：
+- compute(code): 纯计算，在子进程中执行，不访问数据库
+- apply(share_id, code, result): 在主进程中把结果写回数据库
+"""
+import os
+import socket
+from datetime import timedelta
+
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from . import cache, thumbnails
+from .models import DerivativeJob, Share
+
+
+def _apply_thumbnail(share_id, code, key):
+    # 仅当分享码未再次变化时写回，避免旧任务覆盖新结果
+    if Share.objects.filter(id=share_id, strategy_code=code).update(thumbnail_key=key):
+        cache.shares_changed([share_id])
+
+
+TASKS = {
+    DerivativeJob.Kind.THUMBNAIL: (thumbnails.ensure_thumbnail, _apply_thumbnail),
+}
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def compute(kind, code):
+    """在子进程中执行任务的计算部分"""
+    return TASKS[kind][0](code)
+
+
+def claim(batch_size, locked_by):
+    """领取一批可执行的任务并标记为处理中，返回 (任务, 分享码) 列表"""
+    now = timezone.now()
+    ids = list(
+        DerivativeJob.objects.filter(status=DerivativeJob.Status.PENDING, run_after__lte=now)
+        .order_by('id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    # 条件更新保证多个 worker 不会领取到同一任务
+    DerivativeJob.objects.filter(id__in=ids, status=DerivativeJob.Status.PENDING).update(
+        status=DerivativeJob.Status.RUNNING, locked_by=locked_by, locked_at=now,
+    )
+    jobs = DerivativeJob.objects.filter(
+        id__in=ids, status=DerivativeJob.Status.RUNNING, locked_by=locked_by
+    ).select_related('share').only('id', 'kind', 'attempts', 'share_id', 'share__strategy_code')
+    return [(job, job.share.strategy_code) for job in jobs]
+
+
+def complete(job, code, result):
+    TASKS[job.kind][1](job.share_id, code, result)
+    DerivativeJob.objects.filter(id=job.id).update(
+        status=DerivativeJob.Status.DONE, finished_at=timezone.now(), last_error='',
+    )
+
+
+def fail(job, error, max_attempts, retry_delay):
+    """记录失败；未超过最大次数时按指数退避重新入队"""
+    attempts = job.attempts + 1
+    now = timezone.now()
+    if attempts >= max_attempts:
+        fields = {'status': DerivativeJob.Status.FAILED, 'finished_at': now}
+    else:
+        fields = {
+            'status': DerivativeJob.Status.PENDING,
+            'run_after': now + timedelta(seconds=retry_delay * 2 ** (attempts - 1)),
+        }
+    DerivativeJob.objects.filter(id=job.id).update(
+        attempts=attempts, last_error=str(error)[:2000], locked_by='', locked_at=None, **fields
+    )
+
+
+def reclaim_stale(timeout):
+    """把领取后超时未完成的任务（worker 异常退出）放回队列"""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return DerivativeJob.objects.filter(
+        status=DerivativeJob.Status.RUNNING, locked_at__lt=cutoff
+    ).update(status=DerivativeJob.Status.PENDING, locked_by='', locked_at=None)
+
+
+def prune_finished(keep):
+    """删除完成超过 keep 秒的任务，返回删除数；失败的任务保留以便排查"""
+    cutoff = timezone.now() - timedelta(seconds=keep)
+    deleted, _ = DerivativeJob.objects.filter(
+        status=DerivativeJob.Status.DONE, finished_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+def enqueue_stale_shares(batch_size, after_id=0):
+    """
+    扫描一批分享，为缩略图过期的分享入队
+
+    按主键分批扫描，返回 (本批最后一个分享 ID, 新入队数)；扫描结束时 ID 为 None。
+    """
+    batch = list(
+        Share.objects.filter(id__gt=after_id).order_by('id')
+        .only('id', 'strategy_code', 'thumbnail_key')[:batch_size]
+    )
+    if not batch:
+        return None, 0
+    stale = [share.id for share in batch if share._thumbnail_is_stale()]
+    return batch[-1].id, DerivativeJob.enqueue(stale)
+
+
+def queue_stats(window=60):
+    """队列深度与最近 window 秒内的吞吐量"""
+    now = timezone.now()
+    counts = {
+        (row['kind'], row['status']): row['total']
+        for row in DerivativeJob.objects.values('kind', 'status').annotate(total=Count('id'))
+    }
+    pending = DerivativeJob.objects.filter(status=DerivativeJob.Status.PENDING)
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    finished = DerivativeJob.objects.filter(
+        status=DerivativeJob.Status.DONE, finished_at__gte=now - timedelta(seconds=window)
+    ).count()
+    return {
+        'counts': counts,
+        'depth': pending.count(),
+        'ready': pending.filter(run_after__lte=now).count(),
+        'oldest_pending_age': (now - oldest).total_seconds() if oldest else 0,
+        'throughput': finished / window,
+    }
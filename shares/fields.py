@@ -0,0 +1,52 @@
+from django import forms
+from django.db import models
+
+from . import stgy
+
+
+class StrategyCodeField(models.BinaryField):
+    """
+    以紧凑二进制格式（见 stgy.pack_code）存储的分享码
+
+    在 Python 侧始终是原样的分享码字符串，表单、查询条件（例如 strategy_code=code）
+    和 only()/defer() 的用法与普通 TextField 相同。
+    """
+    description = '战术板分享码（紧凑存储）'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop('editable', None)
+        return name, path, args, kwargs
+
+    def get_default(self):
+        default = super().get_default()
+        return '' if default == b'' else default
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return stgy.unpack_code(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return stgy.unpack_code(value)
+        return value
+
+    def get_prep_value(self, value):
+        if isinstance(value, str):
+            return stgy.pack_code(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.CharField,
+            'widget': forms.Textarea,
+            **kwargs,
+        })
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from shares import stgy
+from shares.models import Share
+
+
+class Command(BaseCommand):
+    help = '分批为所有分享计算内容哈希，并列出内容重复的分享'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的分享数量')
+        parser.add_argument('--report-only', action='store_true', help='不重新计算，只输出重复报告')
+        parser.add_argument('--top', type=int, default=20, help='报告中列出的重复组数量')
+
+    def handle(self, *args, **options):
+        if not options['report_only']:
+            self._backfill(options['chunk_size'])
+        self._report(options['top'])
+
+    def _backfill(self, chunk_size):
+        scanned = updated = invalid = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Share.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'strategy_code', 'content_hash')[:chunk_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            boards = stgy.decode_many([share.strategy_code.strip() for share in batch])
+            changed = []
+            for share, board in zip(batch, boards):
+                new_hash = stgy.content_hash(board) if board else ''
+                if not board:
+                    invalid += 1
+                if share.content_hash != new_hash:
+                    share.content_hash = new_hash
+                    changed.append(share)
+            # bulk_update 不触发 save()，不会重复入队缩略图任务
+            Share.objects.bulk_update(changed, ['content_hash'])
+
+            scanned += len(batch)
+            updated += len(changed)
+            self.stdout.write(f'已扫描 {scanned} 个分享（至 #{last_id}），更新 {updated} 个')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'完成：扫描 {scanned} 个分享，更新 {updated} 个，无法解码 {invalid} 个'
+        ))
+
+    def _report(self, top):
+        clusters = (
+            Share.objects.exclude(content_hash='')
+            .values('content_hash')
+            .annotate(total=Count('id'))
+            .filter(total__gt=1)
+            .order_by('-total', 'content_hash')
+        )
+        cluster_count = clusters.count()
+        if not cluster_count:
+            self.stdout.write('没有发现重复的战术板')
+            return
+
+        duplicates = sum(row['total'] - 1 for row in clusters)
+        self.stdout.write(f'发现 {cluster_count} 组重复战术板，共 {duplicates} 个多余的分享')
+        for row in clusters[:top]:
+            shares = Share.objects.filter(content_hash=row['content_hash']).order_by('created_at')
+            self.stdout.write(f"\n{row['content_hash']}（{row['total']} 个）")
+            for share in shares.only('share_id', 'title', 'created_at'):
+                self.stdout.write(f"  {share.share_id}  {share.created_at:%Y-%m-%d}  {share.title}")
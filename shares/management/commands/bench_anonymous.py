@@ -0,0 +1,122 @@
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.cache import get_max_age
+
+from .bench_asgi import seed, temporary_database
+
+
+class SharedCache:
+    """按 Cache-Control / Vary: Cookie 缓存响应的共享缓存（模拟 CDN 或反向代理）"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def _key(self, path, cookie_header, vary):
+        return path, cookie_header if 'cookie' in vary.lower() else ''
+
+    def get(self, path, cookie_header):
+        for vary in ('', 'Cookie'):
+            stored = self.entries.get(self._key(path, cookie_header, vary))
+            if stored and stored[0] == vary and time.monotonic() < stored[1]:
+                return True
+        return False
+
+    def store(self, path, cookie_header, response):
+        max_age = get_max_age(response)
+        if not max_age or 'public' not in response.get('Cache-Control', '') or response.cookies:
+            return False
+        vary = response.get('Vary', '')
+        self.entries[self._key(path, cookie_header, vary)] = (vary, time.monotonic() + max_age)
+        return True
+
+
+class Command(BaseCommand):
+    help = '模拟匿名访客浏览热点页面，对比关闭和开启匿名快速路径时的数据库查询、会话访问、Set-Cookie 和共享缓存命中'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=300, help='访客数量')
+        parser.add_argument('--pages', type=int, default=6, help='每个访客浏览的页面数')
+        parser.add_argument('--stale-ratio', type=float, default=0.1, help='带着已过期会话 Cookie 到来的访客比例')
+        parser.add_argument('--rows', type=int, default=200, help='预先生成的分享数量')
+        parser.add_argument('--repeat', type=int, default=500, help='测量整页缓存命中耗时的请求次数')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            paths = seed(options['rows'])
+            results = {}
+            with override_settings(ALLOWED_HOSTS=['*'], DATABASE_REPLICAS=[]):
+                for label, enabled in (('关闭快速路径', False), ('开启快速路径', True)):
+                    with override_settings(ANONYMOUS_FAST_PATH=enabled):
+                        results[label] = self._run(paths, options)
+        for label, stats in results.items():
+            self._report(label, stats)
+        before, after = (stats['queries'] / stats['requests'] for stats in results.values())
+        self.stdout.write(self.style.SUCCESS(f'\n每个匿名请求的数据库查询：{before:.2f} -> {after:.2f}'))
+
+    def _run(self, paths, options):
+        cache.clear()
+        shared = SharedCache()
+        rng = random.Random(0)
+        stats = Counter()
+        elapsed = 0.0
+        for _ in range(options['visitors']):
+            client = Client()
+            if rng.random() < options['stale_ratio']:
+                client.cookies[settings.SESSION_COOKIE_NAME] = f'expired{rng.getrandbits(64):016x}'
+            for path in rng.choices(paths, k=options['pages']):
+                stats['requests'] += 1
+                cookie_header = _cookie_header(client, path)
+                if shared.get(path, cookie_header):
+                    stats['shared_hits'] += 1
+                    continue
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(path)
+                    elapsed += time.perf_counter() - started
+                stats['origin'] += 1
+                stats['queries'] += len(queries)
+                stats['session_queries'] += sum('django_session' in query['sql'] for query in queries)
+                stats['session_accessed'] += response.wsgi_request.session.accessed
+                stats['set_cookie'] += bool(response.cookies)
+                stats['shareable'] += shared.store(path, cookie_header, response)
+        stats['origin_ms'] = elapsed * 1000 / max(stats['origin'], 1)
+
+        # 中间件本身的开销：同一访客反复请求命中整页缓存的主页（不查询数据库）
+        client = Client()
+        client.get('/')
+        started = time.perf_counter()
+        for _ in range(options['repeat']):
+            client.get('/')
+        stats['hit_ms'] = (time.perf_counter() - started) * 1000 / options['repeat']
+        return stats
+
+    def _report(self, label, stats):
+        origin = max(stats['origin'], 1)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {label} =='))
+        self.stdout.write(
+            f"请求 {stats['requests']} 次，共享缓存命中 {stats['shared_hits']} 次，到达源站 {stats['origin']} 次"
+        )
+        self.stdout.write(
+            f"源站：每个请求 {stats['queries'] / origin:.2f} 次查询（会话 {stats['session_queries']} 次），"
+            f"平均 {stats['origin_ms']:.2f} ms；整页缓存命中 {stats['hit_ms']:.3f} ms"
+        )
+        self.stdout.write(
+            f"访问会话 {stats['session_accessed']} 次，带 Set-Cookie 的响应 {stats['set_cookie']} 个，"
+            f"允许共享缓存的响应 {stats['shareable']} 个"
+        )
+
+
+def _cookie_header(client, path):
+    """浏览器实际发送的 Cookie：只包含 path 与请求地址匹配的"""
+    return '; '.join(
+        f'{name}={morsel.value}' for name, morsel in client.cookies.items()
+        if path.startswith(morsel['path'] or '/')
+    )
@@ -0,0 +1,220 @@
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from shares import viewcounter
+from shares.models import Collection, CollectionItem, Share
+
+from .bench_sqlite_writes import _percentile
+
+
+class Command(BaseCommand):
+    help = (
+        '在同一台机器上用进程内模拟的慢速客户端压测热点只读页面，'
+        '比较 WSGI（固定数量的工作线程）和 ASGI（异步视图）在不同并发连接数下的吞吐和延迟'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='8,32,128,256', help='并发连接数，逗号分隔')
+        parser.add_argument('--requests', type=int, default=600, help='每种并发下的请求总数')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI 工作线程数（相当于 gunicorn --threads）')
+        parser.add_argument('--client-delay', type=float, default=50, help='客户端接收响应耗时（毫秒），模拟慢速网络')
+        parser.add_argument('--slo', type=float, default=1000, help='p99 延迟上限（毫秒），用于计算可承载的并发数')
+        parser.add_argument('--rows', type=int, default=200, help='预先生成的分享数量')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            paths = seed(options['rows'])
+            with override_settings(DATABASE_REPLICAS=[], ALLOWED_HOSTS=['*']):
+                results = self._run_all(paths, options)
+        self._report(results, options)
+
+    def _run_all(self, paths, options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        settings_dict = connection.settings_dict
+        max_age = settings_dict['CONN_MAX_AGE']
+        results = []
+        try:
+            for level in levels:
+                settings_dict['CONN_MAX_AGE'] = max_age
+                with override_settings(ROOT_URLCONF='ffxivshare.urls'):
+                    results.append(('WSGI', level, self._run('wsgi', paths, level, options)))
+                # 与 asgi.py 相同：ASGI 下不复用连接
+                settings_dict['CONN_MAX_AGE'] = 0
+                with override_settings(ROOT_URLCONF='ffxivshare.urls_asgi'):
+                    results.append(('ASGI', level, self._run('asgi', paths, level, options)))
+        finally:
+            settings_dict['CONN_MAX_AGE'] = max_age
+        return results
+
+    def _run(self, mode, paths, concurrency, options):
+        cache.clear()
+        delay = options['client_delay'] / 1000
+        if mode == 'wsgi':
+            app = WSGIHandler()
+            pool = ThreadPoolExecutor(max_workers=options['threads'])
+
+            async def request(path):
+                return await asyncio.get_running_loop().run_in_executor(pool, _wsgi_request, app, path, delay)
+        else:
+            app = ASGIHandler()
+
+            async def request(path):
+                return await _asgi_request(app, path, delay)
+
+        try:
+            return asyncio.run(_drive(request, paths, concurrency, options['requests']))
+        finally:
+            if mode == 'wsgi':
+                pool.shutdown()
+
+    def _report(self, results, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\nWSGI {options['threads']} 个工作线程；客户端接收耗时 {options['client_delay']:.0f} ms"
+        ))
+        self.stdout.write(f"{'模式':<6}{'并发':>6}{'吞吐(次/秒)':>14}{'p50(ms)':>10}{'p99(ms)':>10}{'失败':>6}{'线程峰值':>10}")
+        capacity = {}
+        for mode, level, result in results:
+            p99 = _percentile(result['latencies'], 0.99) * 1000
+            self.stdout.write(
+                f"{mode:<6}{level:>6}{len(result['latencies']) / result['elapsed']:>14.0f}"
+                f"{_percentile(result['latencies'], 0.5) * 1000:>10.1f}{p99:>10.1f}"
+                f"{result['errors']:>6}{result['threads']:>10}"
+            )
+            if p99 <= options['slo'] and not result['errors']:
+                capacity[mode] = max(capacity.get(mode, 0), level)
+        for mode in ('WSGI', 'ASGI'):
+            self.stdout.write(self.style.SUCCESS(
+                f"{mode}：p99 不超过 {options['slo']:.0f} ms 时最多承载 {capacity.get(mode, 0)} 个并发连接"
+            ))
+
+
+@contextmanager
+def temporary_database():
+    """在临时数据库中压测，不影响正式数据"""
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = path
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        # 压测期间缓冲的浏览量写入临时数据库，不留到退出时写入正式数据库
+        viewcounter.spill()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed(rows):
+    """生成一个作者、rows 个公开分享和一个合集，返回热点页面的地址"""
+    author = User.objects.create_user('bench', password=None)
+    Share.objects.bulk_create([
+        Share(
+            share_id=f'bench{i:08d}', title=f'bench {i}', description='压测 ' * 50, strategy_code='',
+            author=author, visibility='public', status='approved',
+        )
+        for i in range(rows)
+    ])
+    call_command('rebuild_search_index', verbosity=0)
+    collection = Collection.objects.create(title='bench', author=author)
+    shares = list(Share.objects.order_by('id')[:24])
+    CollectionItem.objects.bulk_create([
+        CollectionItem(collection=collection, share=share, order=i * 1024) for i, share in enumerate(shares)
+    ])
+    return ['/', '/u/bench/', f'/collections/{collection.pk}/', '/search/?q=bench'] + [
+        share.get_absolute_url() for share in shares[:8]
+    ]
+
+
+async def _drive(request, paths, concurrency, total):
+    """concurrency 个客户端依次发出请求，共 total 个，返回延迟、失败数和线程数峰值"""
+    latencies = []
+    counter = iter(range(total))
+    result = {'errors': 0, 'threads': threading.active_count()}
+
+    async def client():
+        for index in counter:
+            started = time.perf_counter()
+            status = await request(paths[index % len(paths)])
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                result['errors'] += 1
+
+    async def sample_threads():
+        while True:
+            result['threads'] = max(result['threads'], threading.active_count())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample_threads())
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    result['elapsed'] = time.perf_counter() - started
+    sampler.cancel()
+    result['latencies'] = latencies
+    return result
+
+
+def _split(path):
+    path, _, query = path.partition('?')
+    return path, query
+
+
+def _wsgi_request(app, path, delay):
+    path, query = _split(path)
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'bench', 'SERVER_PORT': '80', 'HTTP_HOST': 'bench', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+    }
+    status = []
+    body = app(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        for _ in body:
+            # 慢速客户端：写出响应期间工作线程被占用
+            time.sleep(delay)
+    finally:
+        body.close()
+    return status[0]
+
+
+async def _asgi_request(app, path, delay):
+    path, query = _split(path)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'bench')], 'client': ('127.0.0.1', 50000), 'server': ('bench', 80),
+    }
+    status = []
+    finished = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif not message.get('more_body'):
+            # 慢速客户端：等待发送缓冲区排空，不占用线程
+            await asyncio.sleep(delay)
+            finished.set()
+
+    await app(scope, receive, send)
+    return status[0]
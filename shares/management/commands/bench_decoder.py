@@ -0,0 +1,110 @@
+import time
+import zlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shares import stgy
+from shares.models import Share
+
+
+# 预览器自带的示例分享码，数据库为空时使用
+SAMPLE_CODES = [
+    '[stgy:a0+k-wvprSQA8rHpf1cY9Fk5R6ZNO5n7lvBSj9+rmE3OpbNbquadZFNuf34LKtB6Vvu+VwRuRlBjVWYHUviSUm70CoiZFyhI4mL2zvz2dqd2H+n24dmIzgMnUiI7BIEsAjEu6Yw8QNW73V4PV9for2+LXvcEt7lWK15eZwHDQojZm4juqzJiypDd5BkvBnZNs5j2tK]',
+    '[stgy:a2mW7zYpGVGucnON7LpkuDJH66enQBnNYQkCKKUR6lrKMrVuduwvMbQ5lYPO7cdfHNJexQfOqhOOYwu6DnluGxbRieZQbd41xysoX6g-8ue0Z14MAXSqNr+xsHeqFlaZ6P3ng1n6dc1xLH]',
+    '[stgy:aLcnpxPulnsNdEvWZVSOgAvmgt4MN3i9kxbOQjW9HfobttiBlZ8KfzMlzhcEk98N2r7y-2D5Z3nZrh195ZnRNWORCB4XMwidyV2CX5k0S+ow+VNeEzhWhhfseFIH5ekbMGLBlcsD+2iKQBv1qbQyJ9TRRogiQHDlGXdycaI0qJwN7Ue3Ypz6bfC31Y4pBudPZ8Q7Rw8W1XL0Gfk6+Tavla1gPyvrs]',
+]
+
+# 生成变体时使用的密钥字符和 zlib 压缩策略
+KEY_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-+'
+ZLIB_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED, zlib.Z_HUFFMAN_ONLY, zlib.Z_RLE, zlib.Z_FIXED)
+
+
+class Command(BaseCommand):
+    help = '战术板代码解码器微基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='不同分享码的个数')
+        parser.add_argument('--repeat', type=int, default=10, help='热测试中每个分享码重复的次数')
+        parser.add_argument('--from-db', action='store_true', help='使用数据库中的分享码（最多取 --count 条）')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = max(1, options['repeat'])
+        bases = []
+        if options['from_db']:
+            bases = list(Share.objects.values_list('strategy_code', flat=True).distinct()[:count])
+        codes = self._corpus(bases or SAMPLE_CODES, count)
+        if len(codes) < count:
+            # 语料不足时测得的速度与要求的规模不符，直接报错
+            raise CommandError(f'只能生成 {len(codes)} 个不同的分享码，少于 --count {count}')
+        self.stdout.write(f'样本: {len(codes)} 个不同分享码')
+
+        # 冷：每个分享码只出现一次，decode_many 的去重命中不到，测的是真实解码速度
+        self.stdout.write('冷（分享码各不相同）')
+        self._run('decode', self._decode_each, codes)
+        self._run('decode_many', stgy.decode_many, codes)
+
+        # 热：同一批分享码重复出现，重复的部分命中 decode_many 调用内的去重字典
+        self.stdout.write(f'热（每个分享码重复 {repeat} 次，共 {len(codes) * repeat} 个）')
+        self._run('decode_many', stgy.decode_many, codes * repeat)
+
+    def _run(self, label, func, codes):
+        start = time.perf_counter()
+        results = func(codes)
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for board in results if board is None)
+        self.stdout.write(
+            f'  {label:<12} {elapsed * 1000:9.1f} ms  {len(codes) / elapsed:10.0f} 个/秒  '
+            f'失败 {failed}'
+        )
+
+    @classmethod
+    def _corpus(cls, bases, count):
+        """取 count 个不同的分享码：先用原样的，不够时轮流从每个分享码生成变体"""
+        codes = dict.fromkeys(bases)
+        variants = [cls._variants(code) for code in bases]
+        while len(codes) < count and variants:
+            for generator in list(variants):
+                code = next(generator, None)
+                if code is None:
+                    variants.remove(generator)
+                    continue
+                codes[code] = None
+                if len(codes) >= count:
+                    break
+        return list(codes)[:count]
+
+    @staticmethod
+    def _variants(code):
+        """
+        用不同的压缩参数和密钥字符重新编码 code
+
+        内容不变，字符串和压缩数据各不相同，每个都要完整解码。示例分享码约能生成 2.9 万个。
+        """
+        try:
+            raw = stgy.decode_raw(code)
+            data = zlib.decompress(raw[6:], 47)
+        except (stgy.StrategyCodeError, zlib.error):
+            return
+        seen = set()
+        for wbits in range(15, 8, -1):
+            for level in range(1, 10):
+                for mem_level in range(9, 0, -1):
+                    for strategy in ZLIB_STRATEGIES:
+                        compressor = zlib.compressobj(level, zlib.DEFLATED, wbits, mem_level, strategy)
+                        stream = compressor.compress(data) + compressor.flush()
+                        if stream in seen:
+                            continue
+                        seen.add(stream)
+                        for key_char in KEY_CHARS:
+                            yield stgy.encode_raw(key_char, raw[:6] + stream)
+
+    @staticmethod
+    def _decode_each(codes):
+        results = []
+        for code in codes:
+            try:
+                results.append(stgy.decode(code))
+            except stgy.StrategyCodeError:
+                results.append(None)
+        return results
@@ -0,0 +1,101 @@
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shares.models import Share
+from shares.pagination import CursorPaginator
+from shares.views import _list_columns
+
+BENCH_DB = 'bench'
+
+
+def _row_bytes(share):
+    """一行分享实际从数据库取回的字段值大小（字节）"""
+    loaded = share.get_deferred_fields()
+    total = 0
+    for field in share._meta.concrete_fields:
+        if field.attname in loaded:
+            continue
+        value = getattr(share, field.attname)
+        total += len(str(value).encode('utf-8')) if value is not None else 0
+    excerpt = getattr(share, 'description_excerpt', None)
+    if excerpt:
+        total += len(excerpt.encode('utf-8'))
+    return total
+
+
+class Command(BaseCommand):
+    help = '在临时数据库中生成带真实大小分享码和描述的分享，比较列表查询加载整行与只加载卡片字段的开销'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='生成的分享数量')
+        parser.add_argument('--code-size', type=int, default=3000, help='每个分享码的长度（字符）')
+        parser.add_argument('--description-size', type=int, default=2000, help='每个描述的长度（字符）')
+        parser.add_argument('--page-size', type=int, default=12, help='每页条目数')
+        parser.add_argument('--repeat', type=int, default=50, help='每个查询的重复次数')
+
+    def handle(self, *args, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        connections.settings[BENCH_DB] = {**connections.settings['default'], 'NAME': path}
+        try:
+            call_command('migrate', database=BENCH_DB, verbosity=0)
+            self._seed(options)
+            public = Share.objects.using(BENCH_DB).filter(
+                visibility=Share.Visibility.PUBLIC, status=Share.Status.APPROVED
+            ).select_related('author__profile')
+            variants = {
+                '整行': public,
+                '卡片字段': _list_columns(public),
+            }
+            results = {name: self._measure(queryset, options) for name, queryset in variants.items()}
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== 对比（每页） =='))
+            for name, (size, peak, elapsed) in results.items():
+                self.stdout.write(
+                    f'{name:<8} 取回 {size / 1024:>8.1f} KiB  内存峰值 {peak / 1024:>8.1f} KiB  {elapsed:>7.3f} ms'
+                )
+        finally:
+            connections[BENCH_DB].close()
+            del connections.settings[BENCH_DB]
+            os.remove(path)
+
+    def _seed(self, options):
+        rows = options['rows']
+        self.stdout.write(f"生成 {rows} 个分享（分享码 {options['code_size']} 字符，描述 {options['description_size']} 字符）...")
+        users = User.objects.using(BENCH_DB).bulk_create([User(username=f'bench{i}') for i in range(50)])
+        rng = random.Random(0)
+        alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+        paragraph = '<p>' + '副本机制说明，' * (options['description_size'] // 7) + '</p>'
+        batch = []
+        for i in range(rows):
+            code = ''.join(rng.choice(alphabet) for _ in range(options['code_size']))
+            batch.append(Share(
+                share_id=f'p{i:08d}', title=f'bench {i}', author_id=rng.choice(users).id,
+                strategy_code=f'[stgy:a{code}]', description=paragraph[:options['description_size']],
+            ))
+            if len(batch) >= 1000:
+                Share.objects.using(BENCH_DB).bulk_create(batch)
+                batch = []
+        Share.objects.using(BENCH_DB).bulk_create(batch)
+
+    def _measure(self, queryset, options):
+        paginator = CursorPaginator(queryset, options['page_size'])
+
+        tracemalloc.start()
+        page = paginator.get_page('')
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = sum(_row_bytes(share) for share in page)
+
+        started = time.perf_counter()
+        for _ in range(options['repeat']):
+            list(paginator.get_page(''))
+        elapsed = (time.perf_counter() - started) * 1000 / options['repeat']
+        return size, peak, elapsed
@@ -0,0 +1,83 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from shares import shareids
+from shares.models import Share
+
+BENCH_DB = 'bench'
+
+
+def _legacy_id(exists):
+    """旧实现：随机生成，检查黑名单后逐个查询是否已存在"""
+    while True:
+        new_id = ''.join(
+            random.choice(shareids.DIGITS if i % 2 == 0 else shareids.LETTERS) for i in range(8)
+        )
+        if shareids.is_blacklisted(new_id):
+            continue
+        if not exists(new_id):
+            return new_id
+
+
+class Command(BaseCommand):
+    help = '比较随机生成 + 查询去重与计数器置换两种分享 ID 分配方式的吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='预先生成的分享数量')
+        parser.add_argument('--count', type=int, default=5000, help='每种方式分配的 ID 数量')
+
+    def handle(self, *args, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        connections.settings[BENCH_DB] = {**connections.settings['default'], 'NAME': path}
+        try:
+            call_command('migrate', database=BENCH_DB, verbosity=0)
+            self._seed(options['rows'])
+            count = options['count']
+
+            shares = Share.objects.using(BENCH_DB)
+            results = {
+                'random + exists()': self._time(
+                    lambda: _legacy_id(lambda share_id: shares.filter(share_id=share_id).exists()), count
+                ),
+                'permute only': self._time(lambda: shareids.format_id(shareids.permute(
+                    random.randrange(shareids.SPACE))), count),
+            }
+            for block_size in (1, 16, 256):
+                shareids.discard_reserved()
+                with override_settings(SHARE_ID_BLOCK_SIZE=block_size):
+                    results[f'allocate (block={block_size})'] = self._time(lambda: shareids.allocate(BENCH_DB), count)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== 分配 {count} 个 ID（已有 {options['rows']} 个分享） =="))
+            for name, elapsed in results.items():
+                self.stdout.write(f'{name:<24} {count / elapsed:>10.0f} 个/秒  {elapsed * 1e6 / count:>8.1f} µs/个')
+        finally:
+            shareids.discard_reserved()
+            connections[BENCH_DB].close()
+            del connections.settings[BENCH_DB]
+            os.remove(path)
+
+    def _seed(self, rows):
+        self.stdout.write(f'生成 {rows} 个分享 ...')
+        seen = set()
+        batch = []
+        for i in range(rows):
+            share_id = _legacy_id(seen.__contains__)
+            seen.add(share_id)
+            batch.append(Share(share_id=share_id, title=f'bench {i}', strategy_code=''))
+            if len(batch) >= 5000:
+                Share.objects.using(BENCH_DB).bulk_create(batch)
+                batch = []
+        Share.objects.using(BENCH_DB).bulk_create(batch)
+
+    def _time(self, func, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            func()
+        return time.perf_counter() - started
@@ -0,0 +1,137 @@
+import os
+import random
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shares.models import Share
+from shares.pagination import CursorPaginator
+
+BENCH_DB = 'bench'
+
+
+def _queries(db, author_id):
+    """与列表视图相同形状的查询（名称 -> 返回 queryset 的函数）"""
+    shares = Share.objects.using(db)
+    public = shares.filter(visibility=Share.Visibility.PUBLIC, status=Share.Status.APPROVED)
+    return {
+        'index': lambda: public,
+        'index_category': lambda: public.filter(category=Share.Category.COMBAT),
+        'index_hide_spoiler_nsfw': lambda: public.filter(is_spoiler=False, is_nsfw=False),
+        'user_public_profile': lambda: public.filter(author_id=author_id),
+        'my_shares': lambda: shares.filter(author_id=author_id),
+        'admin_review_list': lambda: shares.filter(status=Share.Status.PENDING),
+    }
+
+
+class Command(BaseCommand):
+    help = '在临时数据库中生成大量分享，比较列表查询在添加索引前后的查询计划和耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='生成的分享数量')
+        parser.add_argument('--authors', type=int, default=2000, help='生成的作者数量')
+        parser.add_argument('--repeat', type=int, default=20, help='每个查询的重复次数')
+        parser.add_argument('--depth', type=int, default=50, help='深翻页测试的页数')
+
+    def handle(self, *args, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        connections.settings[BENCH_DB] = {**connections.settings['default'], 'NAME': path}
+        try:
+            call_command('migrate', database=BENCH_DB, verbosity=0)
+            author_id = self._seed(options['rows'], options['authors'])
+            queries = _queries(BENCH_DB, author_id)
+            indexes = [index for index in Share._meta.indexes]
+
+            with connections[BENCH_DB].schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Share, index)
+            self._analyze()
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== 无列表索引 =='))
+            before = self._run(queries, options)
+
+            with connections[BENCH_DB].schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Share, index)
+            self._analyze()
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== 有列表索引 =='))
+            after = self._run(queries, options)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== 对比（毫秒/次） =='))
+            for name in before:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f'{name:<32} {before[name]:>9.3f} -> {after[name]:>9.3f}  ({speedup:.1f}x)')
+        finally:
+            connections[BENCH_DB].close()
+            del connections.settings[BENCH_DB]
+            os.remove(path)
+
+    def _seed(self, rows, authors):
+        self.stdout.write(f'生成 {authors} 个作者、{rows} 个分享 ...')
+        started = time.perf_counter()
+        users = User.objects.using(BENCH_DB).bulk_create(
+            [User(username=f'bench{i}') for i in range(authors)], batch_size=1000
+        )
+        rng = random.Random(0)
+        visibilities = [Share.Visibility.PUBLIC] * 8 + [Share.Visibility.UNLISTED, Share.Visibility.PRIVATE]
+        statuses = [Share.Status.APPROVED] * 18 + [Share.Status.PENDING, Share.Status.REJECTED]
+        batch = []
+        for i in range(rows):
+            batch.append(Share(
+                share_id=f'b{i:08d}', title=f'bench {i}', strategy_code='[stgy:a]',
+                author_id=rng.choice(users).id,
+                visibility=rng.choice(visibilities), status=rng.choice(statuses),
+                category=rng.choice(Share.Category.values),
+                is_spoiler=rng.random() < 0.1, is_nsfw=rng.random() < 0.05,
+            ))
+            if len(batch) >= 5000:
+                Share.objects.using(BENCH_DB).bulk_create(batch)
+                batch = []
+        Share.objects.using(BENCH_DB).bulk_create(batch)
+        # auto_now_add 会覆盖 bulk_create 传入的值，这里按 id 把创建时间分散到过去 rows 秒内
+        with connections[BENCH_DB].cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Share._meta.db_table} SET created_at = "
+                f"strftime('%%Y-%%m-%%d %%H:%%M:%%f', 'now', '-' || (%s - id) || ' seconds')",
+                [rows],
+            )
+        self.stdout.write(f'生成完成，耗时 {time.perf_counter() - started:.1f}s')
+        return users[0].id
+
+    def _analyze(self):
+        with connections[BENCH_DB].cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _run(self, queries, options):
+        results = {}
+        for name, make in queries.items():
+            paginator = CursorPaginator(make(), 12)
+            first = paginator.get_page('')
+            self.stdout.write(f'\n[{name}]')
+            for line in paginator.queryset.order_by('-created_at', '-id')[:13].explain().splitlines():
+                self.stdout.write(f'  {line}')
+
+            results[name] = self._time(lambda: paginator.get_page(''), options['repeat'])
+
+            # 深翻页：沿游标连续前进 depth 页，取最后一页的耗时
+            page = first
+            for _ in range(options['depth']):
+                if not page.has_next():
+                    break
+                page = paginator.get_page(page.next_cursor)
+            cursor = page.next_cursor or ''
+            results[f'{name} (deep)'] = self._time(lambda: paginator.get_page(cursor), options['repeat'])
+            self.stdout.write(
+                f"  第 1 页 {results[name]:.3f} ms，深翻页 {results[f'{name} (deep)']:.3f} ms"
+            )
+        return results
+
+    def _time(self, func, repeat):
+        func()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) * 1000 / repeat
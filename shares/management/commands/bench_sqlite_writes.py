@@ -0,0 +1,129 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from shares import sqlite
+from shares.models import Share, ViewCountDelta
+
+PROFILES = {
+    # Django 默认：回滚日志模式，写入时读者被阻塞，写锁冲突直接报错
+    'default': {'pragmas': {}, 'serialize': False},
+    'tuned': {'pragmas': settings.SQLITE_PRAGMAS, 'serialize': True},
+}
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Command(BaseCommand):
+    help = '在默认配置和 WAL + 串行写入配置下并发读写临时数据库，比较锁错误数和延迟分位数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='并发线程数')
+        parser.add_argument('--ops', type=int, default=300, help='每个线程执行的操作数')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='写操作所占比例')
+        parser.add_argument('--rows', type=int, default=2000, help='预先生成的分享数量')
+
+    def handle(self, *args, **options):
+        for name, profile in PROFILES.items():
+            alias = f'bench_{name}'
+            path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+            connections.settings[alias] = {
+                **connections.settings['default'], 'NAME': path, 'PRAGMAS': profile['pragmas'], 'CONN_MAX_AGE': 0,
+            }
+            try:
+                call_command('migrate', database=alias, verbosity=0)
+                pks = self._seed(alias, options['rows'])
+                with override_settings(SQLITE_SERIALIZE_WRITES=profile['serialize']):
+                    results = self._run(alias, pks, profile['serialize'], options)
+                self._report(name, alias, results)
+            finally:
+                connections[alias].close()
+                del connections.settings[alias]
+                os.remove(path)
+
+    def _seed(self, alias, rows):
+        Share.objects.using(alias).bulk_create(
+            [Share(share_id=f'bench{i:08d}', title=f'bench {i}', strategy_code='') for i in range(rows)],
+            batch_size=1000,
+        )
+        return list(Share.objects.using(alias).values_list('pk', flat=True))
+
+    def _run(self, alias, pks, serialize, options):
+        results = {'read': [], 'write': [], 'errors': 0}
+        lock = threading.Lock()
+
+        def read():
+            list(
+                Share.objects.using(alias).filter(visibility='public')
+                .order_by('-created_at').values_list('id', 'title')[:12]
+            )
+
+        def write():
+            # 先读后写：默认的 DEFERRED 事务在升级为写锁时最容易遇到 "database is locked"
+            def work():
+                pk = random.choice(pks)
+                Share.objects.using(alias).filter(pk=pk).values_list('views', flat=True).first()
+                ViewCountDelta.objects.using(alias).create(share_id=pk, count=1)
+
+            if serialize:
+                sqlite.write(work, using=alias)
+            else:
+                with transaction.atomic(using=alias):
+                    work()
+
+        def worker():
+            timings = {'read': [], 'write': []}
+            errors = 0
+            try:
+                for _ in range(options['ops']):
+                    kind = 'write' if random.random() < options['write_ratio'] else 'read'
+                    started = time.perf_counter()
+                    try:
+                        (write if kind == 'write' else read)()
+                    except OperationalError:
+                        errors += 1
+                        continue
+                    timings[kind].append(time.perf_counter() - started)
+            finally:
+                connections[alias].close()
+            with lock:
+                results['read'] += timings['read']
+                results['write'] += timings['write']
+                results['errors'] += errors
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - started
+        return results
+
+    def _report(self, name, alias, results):
+        journal = sqlite.pragma('journal_mode', using=alias)
+        done = len(results['read']) + len(results['write'])
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {name}（journal_mode={journal}） =='))
+        self.stdout.write(
+            f"完成 {done} 次操作，锁错误 {results['errors']} 次，吞吐 {done / results['elapsed']:.0f} 次/秒"
+        )
+        for kind, label in (('read', '读'), ('write', '写')):
+            samples = results[kind]
+            self.stdout.write(
+                f'{label}  {len(samples):>6} 次  '
+                f'p50 {_percentile(samples, 0.5) * 1000:>8.2f} ms  '
+                f'p99 {_percentile(samples, 0.99) * 1000:>8.2f} ms'
+            )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shares import viewcounter
+
+
+class Command(BaseCommand):
+    help = '把缓冲的浏览量增量合并到分享的浏览量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='持续运行，每隔 --interval 秒合并一次')
+        parser.add_argument('--interval', type=float, default=30, help='持续运行时的合并间隔（秒）')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            shares, views = viewcounter.flush()
+            if views or not options['loop']:
+                elapsed = (time.perf_counter() - started) * 1000
+                self.stdout.write(f'合并 {views} 次浏览到 {shares} 个分享，耗时 {elapsed:.1f}ms')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
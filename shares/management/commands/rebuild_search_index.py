@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shares import search
+from shares.models import Share
+
+
+class Command(BaseCommand):
+    help = '全量重建分享全文搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每批写入的分享数量')
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            raise CommandError('全文索引仅支持 SQLite（FTS5）')
+
+        started = time.perf_counter()
+        chunk_size = options['chunk_size']
+        total = 0
+        last_id = 0
+        with transaction.atomic():
+            search.clear_index()
+            while True:
+                batch = list(
+                    Share.objects.filter(id__gt=last_id).order_by('id')
+                    .select_related('author__profile')
+                    .only('id', 'title', 'description', 'author__username', 'author__profile__nickname')
+                    [:chunk_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                search.index_shares(batch)
+                total += len(batch)
+                self.stdout.write(f'已索引 {total} 个分享')
+        search.optimize_index()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'索引重建完成：{total} 个分享，耗时 {elapsed:.1f}s'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shares import counters
+
+
+class Command(BaseCommand):
+    help = '按源数据重新统计合集内容数、用户公开分享数和总浏览量，修正冗余计数的偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只列出偏差，不修改')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            collections = counters.recompute_collections()
+            profiles = counters.recompute_profiles()
+            for collection in collections:
+                self.stdout.write(f'合集 {collection.pk} {collection.title}: 内容数 -> {collection.item_count}')
+            for profile in profiles:
+                self.stdout.write(
+                    f'用户 {profile.user_id}: 公开分享数 -> {profile.public_share_count}，'
+                    f'总浏览量 -> {profile.total_views}'
+                )
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        drifted = len(collections) + len(profiles)
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('冗余计数没有偏差'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{drifted} 条记录的计数有偏差（未修改）'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已修正 {drifted} 条记录的计数'))
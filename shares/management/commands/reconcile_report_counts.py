@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from shares.models import Report, Share
+
+
+class Command(BaseCommand):
+    help = '按举报表重新统计每个分享的待处理举报数，修正 Share.pending_report_count 的偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只列出偏差，不修改')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            pending = Report.objects.filter(status=Report.Status.PENDING)
+            actual = dict(pending.values_list('share_id').annotate(total=Count('id')))
+            # 只需检查计数不为 0 的分享和确实有待处理举报的分享
+            candidates = (
+                Share.objects.filter(Q(pending_report_count__gt=0) | Q(pk__in=pending.values('share_id')))
+                .only('id', 'share_id', 'pending_report_count')
+            )
+            drifted = []
+            for share in candidates:
+                expected = actual.get(share.pk, 0)
+                if share.pending_report_count != expected:
+                    self.stdout.write(f'{share.share_id}: {share.pending_report_count} -> {expected}')
+                    share.pending_report_count = expected
+                    drifted.append(share)
+            if drifted and not options['dry_run']:
+                Share.objects.bulk_update(drifted, ['pending_report_count'], batch_size=500)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('待处理举报数没有偏差'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} 个分享的待处理举报数有偏差（未修改）'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已修正 {len(drifted)} 个分享的待处理举报数'))
@@ -0,0 +1,57 @@
+import zlib
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shares import stgy
+from shares.models import Share
+
+
+class Command(BaseCommand):
+    help = '统计分享码以文本和紧凑二进制格式存储时的大小，估算数据库和备份缩小的比例'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批读取的分享数量')
+
+    def handle(self, *args, **options):
+        rows = packed_rows = text_size = packed_size = 0
+        # 备份通常会再压缩一遍，分别估算两种格式压缩后的大小
+        text_backup = zlib.compressobj(6)
+        packed_backup = zlib.compressobj(6)
+        text_backup_size = packed_backup_size = 0
+
+        codes = Share.objects.order_by('id').values_list('strategy_code', flat=True)
+        for code in codes.iterator(chunk_size=options['chunk_size']):
+            code = code or ''
+            text = code.encode('utf-8')
+            packed = stgy.pack_code(code)
+            rows += 1
+            packed_rows += packed[:1] == bytes([stgy.PACKED_BOARD])
+            text_size += len(text)
+            packed_size += len(packed)
+            text_backup_size += len(text_backup.compress(text))
+            packed_backup_size += len(packed_backup.compress(packed))
+        text_backup_size += len(text_backup.flush())
+        packed_backup_size += len(packed_backup.flush())
+
+        self.stdout.write(f'分享 {rows} 个，其中 {packed_rows} 个以原始字节存储，{rows - packed_rows} 个保留原文')
+        self._compare('分享码列', text_size, packed_size)
+        self._compare('压缩备份中的分享码', text_backup_size, packed_backup_size)
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+                page_count = cursor.execute('PRAGMA page_count').fetchone()[0]
+                free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+            self.stdout.write(
+                f'数据库文件 {page_size * page_count / 1024:.1f} KiB，'
+                f'其中空闲页 {page_size * free_pages / 1024:.1f} KiB'
+            )
+            # 迁移转换和删除旧列释放的空间只会成为空闲页，文件大小不变
+            self.stdout.write('数据库文件只有在执行 VACUUM 后才会变小（空闲页还给文件系统），备份文件随之变小')
+
+    def _compare(self, label, before, after):
+        ratio = after / before if before else 1
+        self.stdout.write(
+            f'{label}：文本 {before / 1024:.1f} KiB -> 紧凑 {after / 1024:.1f} KiB（{ratio:.0%}）'
+        )
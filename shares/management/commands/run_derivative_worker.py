@@ -0,0 +1,102 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from shares import derivatives
+
+
+class Command(BaseCommand):
+    help = '处理缩略图等派生数据任务队列'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='进程池大小')
+        parser.add_argument('--batch-size', type=int, default=50, help='每次领取的任务数量')
+        parser.add_argument('--max-attempts', type=int, default=5, help='单个任务的最大尝试次数')
+        parser.add_argument('--retry-delay', type=float, default=30, help='首次重试的等待秒数（之后指数递增）')
+        parser.add_argument('--poll-interval', type=float, default=5, help='队列为空时的轮询间隔（秒）')
+        parser.add_argument('--lock-timeout', type=int, default=600, help='处理中任务超过该秒数视为 worker 已退出')
+        parser.add_argument(
+            '--keep-done', type=int, default=3600, help='已完成任务保留的秒数（不少于 60，--stats 按最近 60 秒统计吞吐量）'
+        )
+        parser.add_argument('--once', action='store_true', help='处理完当前队列后退出')
+        parser.add_argument('--backfill', action='store_true', help='为所有缩略图过期的现有分享分批入队并处理')
+        parser.add_argument('--stats', action='store_true', help='仅输出队列深度和吞吐量')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats()
+            return
+
+        self.options = options
+        self.locked_by = derivatives.worker_id()
+        self.processed = 0
+        self.started = time.perf_counter()
+
+        reclaimed = derivatives.reclaim_stale(options['lock_timeout'])
+        if reclaimed:
+            self.stdout.write(f'已回收 {reclaimed} 个超时任务')
+        self._prune()
+
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=django.setup) as executor:
+            if options['backfill']:
+                self._backfill(executor)
+            self._drain(executor, forever=not options['once'] and not options['backfill'])
+
+        self._report()
+
+    def _backfill(self, executor):
+        """分批入队，每批处理完再扫描下一批，避免队列无限增长"""
+        last_id = 0
+        while last_id is not None:
+            last_id, created = derivatives.enqueue_stale_shares(self.options['batch_size'] * 10, last_id)
+            if created:
+                self.stdout.write(f'补齐: 新入队 {created} 个任务（扫描到分享 #{last_id}）')
+                self._drain(executor, forever=False)
+
+    def _drain(self, executor, forever):
+        while True:
+            jobs = derivatives.claim(self.options['batch_size'], self.locked_by)
+            if not jobs:
+                self._prune()
+                if not forever:
+                    return
+                time.sleep(self.options['poll_interval'])
+                continue
+            self._run_batch(executor, jobs)
+
+    def _prune(self):
+        pruned = derivatives.prune_finished(max(self.options['keep_done'], 60))
+        if pruned:
+            self.stdout.write(f'已清理 {pruned} 个已完成任务')
+
+    def _run_batch(self, executor, jobs):
+        started = time.perf_counter()
+        futures = [(job, code, executor.submit(derivatives.compute, job.kind, code)) for job, code in jobs]
+        failed = 0
+        for job, code, future in futures:
+            try:
+                derivatives.complete(job, code, future.result())
+            except Exception as exc:
+                failed += 1
+                derivatives.fail(job, exc, self.options['max_attempts'], self.options['retry_delay'])
+        elapsed = time.perf_counter() - started
+        self.processed += len(jobs)
+        self.stdout.write(
+            f'处理 {len(jobs)} 个任务（失败 {failed}），耗时 {elapsed:.2f}s，{len(jobs) / elapsed:.1f} 个/秒'
+        )
+
+    def _report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'共处理 {self.processed} 个任务，平均 {rate:.1f} 个/秒'))
+
+    def _print_stats(self):
+        stats = derivatives.queue_stats()
+        self.stdout.write(f"队列深度: {stats['depth']}（可执行 {stats['ready']}）")
+        self.stdout.write(f"最早等待任务: {stats['oldest_pending_age']:.0f} 秒前入队")
+        self.stdout.write(f"最近 60 秒吞吐量: {stats['throughput']:.2f} 个/秒")
+        for (kind, status), total in sorted(stats['counts'].items()):
+            self.stdout.write(f'  {kind:<12} {status:<8} {total}')
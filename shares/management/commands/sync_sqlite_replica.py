@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = '用 SQLite 在线备份把主库复制到 DATABASE_REPLICAS 中的 SQLite 副本（本地测试读写分离用）'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('没有配置只读副本，请设置 DATABASE_REPLICA_PATHS')
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('主库不是 SQLite，请使用数据库自身的复制功能')
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections.databases[alias]
+            if connections[alias].vendor != 'sqlite':
+                self.stdout.write(self.style.WARNING(f'{alias} 不是 SQLite，跳过'))
+                continue
+            connections[alias].close()
+            # 备份在读事务中逐页复制，期间主库仍可写入
+            target = sqlite3.connect(str(replica['NAME']))
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f'已复制到 {alias}（{replica["NAME"]}）'))
@@ -0,0 +1,170 @@
+"""
+请求性能统计中间件
+
+设置 REQUEST_PROFILING = True 后启用（否则 Django 会跳过本中间件，没有任何开销）。
+每个请求统计 SQL 查询数、SQL 总耗时、模板渲染耗时、视图耗时和总耗时：
+
+- 写入 ``Server-Timing`` 响应头，浏览器开发者工具的 Network 面板可直接查看
+- 总耗时超过 REQUEST_PROFILING_SLOW_MS 毫秒的请求记录到 shares.profiling 日志
+- 按 URL 名称聚合为耗时直方图，管理员可在 /staff/profiling/ 查看（每个进程单独统计）
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('shares.profiling')
+
+# 直方图桶的上界（毫秒），最后一个桶收集其余请求
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+class RequestProfile:
+    __slots__ = ('queries', 'sql_time', 'template_time', 'template_depth', 'view_started', 'view_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.view_started = None
+        self.view_time = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def _patch_template_render():
+    """统计 Django 模板后端的顶层渲染耗时（include 的子模板计入父模板）"""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_profiled', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return original(self, context, request)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - started
+
+    render._profiled = True
+    Template.render = render
+
+
+def record(url_name, total_ms, queries, sql_ms):
+    with _stats_lock:
+        entry = _stats.get(url_name)
+        if entry is None:
+            entry = _stats[url_name] = {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'sql_ms': 0.0,
+                'queries': 0, 'max_queries': 0, 'buckets': [0] * (len(HISTOGRAM_BUCKETS) + 1),
+            }
+        entry['count'] += 1
+        entry['total_ms'] += total_ms
+        entry['max_ms'] = max(entry['max_ms'], total_ms)
+        entry['sql_ms'] += sql_ms
+        entry['queries'] += queries
+        entry['max_queries'] = max(entry['max_queries'], queries)
+        for index, bound in enumerate(HISTOGRAM_BUCKETS):
+            if total_ms <= bound:
+                break
+        else:
+            index = len(HISTOGRAM_BUCKETS)
+        entry['buckets'][index] += 1
+
+
+def snapshot():
+    """按 URL 名称汇总的统计（均值和直方图）"""
+    labels = [f'<={bound}ms' for bound in HISTOGRAM_BUCKETS] + [f'>{HISTOGRAM_BUCKETS[-1]}ms']
+    with _stats_lock:
+        return {
+            url_name: {
+                'count': entry['count'],
+                'avg_ms': round(entry['total_ms'] / entry['count'], 2),
+                'max_ms': round(entry['max_ms'], 2),
+                'avg_sql_ms': round(entry['sql_ms'] / entry['count'], 2),
+                'avg_queries': round(entry['queries'] / entry['count'], 2),
+                'max_queries': entry['max_queries'],
+                'histogram': dict(zip(labels, entry['buckets'])),
+            }
+            for url_name, entry in sorted(_stats.items())
+        }
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
+
+
+class RequestProfilingMiddleware:
+    """统计每个请求的 SQL、模板和视图耗时"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500)
+        _patch_template_render()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+        if profile.view_started is not None:
+            profile.view_time = time.perf_counter() - profile.view_started
+
+        total_ms = total * 1000
+        sql_ms = profile.sql_time * 1000
+        template_ms = profile.template_time * 1000
+        view_ms = profile.view_time * 1000
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={sql_ms:.1f};desc="{profile.queries} queries"',
+            f'tpl;dur={template_ms:.1f}',
+            f'view;dur={view_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.view_name if match else '') or '<unresolved>'
+        record(url_name, total_ms, profile.queries, sql_ms)
+        if total_ms >= self.slow_ms:
+            logger.warning(
+                '慢请求 %s %s (%s): %.1fms, %d 次查询 %.1fms, 模板 %.1fms',
+                request.method, request.path, url_name, total_ms, profile.queries, sql_ms, template_ms,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
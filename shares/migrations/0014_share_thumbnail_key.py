@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0013_auto_20260104_1345'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='share',
+            name='thumbnail_key',
+            field=models.CharField(blank=True, editable=False, max_length=40, verbose_name='缩略图'),
+        ),
+    ]
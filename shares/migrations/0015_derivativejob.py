@@ -0,0 +1,37 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0014_share_thumbnail_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DerivativeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('thumbnail', '缩略图')], default='thumbnail', max_length=20, verbose_name='类型')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '处理中'), ('done', '已完成'), ('failed', '已失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='尝试次数')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='可执行时间')),
+                ('locked_by', models.CharField(blank=True, max_length=64, verbose_name='处理进程')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='领取时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('share', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivative_jobs', to='shares.share', verbose_name='分享')),
+            ],
+            options={
+                'verbose_name': '派生任务',
+                'verbose_name_plural': '派生任务',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='derivjob_status_run_after'), models.Index(fields=['status', 'finished_at'], name='derivjob_status_finished')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0015_derivativejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='share',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, verbose_name='内容哈希'),
+        ),
+    ]
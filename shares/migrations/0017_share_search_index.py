@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from shares.search import TABLE, tokenize
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        f"USING fts5(title, description, author, tokenize='unicode61')"
+    )
+    Share = apps.get_model('shares', 'Share')
+    rows = []
+    db_alias = schema_editor.connection.alias
+    for share in Share.objects.using(db_alias).select_related('author__profile').iterator(chunk_size=1000):
+        author = ''
+        if share.author_id:
+            profile = getattr(share.author, 'profile', None)
+            author = f"{profile.nickname if profile else ''} {share.author.username}"
+        rows.append((share.id, ' '.join(tokenize(share.title)),
+                     ' '.join(tokenize(share.description)), ' '.join(tokenize(author))))
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, title, description, author) VALUES (%s, %s, %s, %s)', rows
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from shares.search import TABLE
+
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0016_share_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
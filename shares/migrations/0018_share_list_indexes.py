@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0017_share_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('status', 'approved'), ('visibility', 'public')), fields=['-created_at', '-id'], name='share_public_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('status', 'approved'), ('visibility', 'public')), fields=['category', '-created_at', '-id'], name='share_public_category_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='share_author_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-created_at', '-id'], name='share_pending_review'),
+        ),
+    ]
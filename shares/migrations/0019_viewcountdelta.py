@@ -0,0 +1,28 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0018_share_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewCountDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(verbose_name='增量')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='记录时间')),
+                ('share', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shares.share', verbose_name='分享')),
+            ],
+            options={
+                'verbose_name': '浏览量增量',
+                'verbose_name_plural': '浏览量增量',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+from django.db import migrations, models, transaction
+
+import shares.fields
+
+# 每批在单独的事务中转换，写锁只在一批内持有
+CHUNK_SIZE = 500
+
+
+def pack_codes(apps, schema_editor):
+    Share = apps.get_model('shares', 'Share')
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            # 按 id 顺序前进；旧版本代码在迁移期间新建的分享同样 strategy_data 为空，会在后面的批次中处理
+            batch = list(
+                Share.objects.using(db_alias).filter(id__gt=last_id, strategy_data__isnull=True)
+                .order_by('id').only('id', 'strategy_code')[:CHUNK_SIZE]
+            )
+            if not batch:
+                break
+            for share in batch:
+                share.strategy_data = share.strategy_code
+            Share.objects.using(db_alias).bulk_update(batch, ['strategy_data'])
+        last_id = batch[-1].id
+
+
+def clear_old_codes(apps, schema_editor):
+    """
+    删除旧列之前分批清空其中的文本
+
+    SQLite 的 DROP COLUMN 会在一次写锁内重写整张表，无法分批；旧列清空后每行只剩很短的记录，
+    重写要复制的数据少得多，持锁时间随之缩短。这一批中仍未转换的分享（旧版本代码在转换之后新建的）先转换再清空。
+    """
+    Share = apps.get_model('shares', 'Share')
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            batch = list(
+                Share.objects.using(db_alias).filter(id__gt=last_id)
+                .order_by('id').only('id', 'strategy_code', 'strategy_data')[:CHUNK_SIZE]
+            )
+            if not batch:
+                break
+            for share in batch:
+                if share.strategy_data is None:
+                    share.strategy_data = share.strategy_code
+                share.strategy_code = ''
+            Share.objects.using(db_alias).bulk_update(batch, ['strategy_data', 'strategy_code'])
+        last_id = batch[-1].id
+
+
+def unpack_codes(apps, schema_editor):
+    Share = apps.get_model('shares', 'Share')
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            batch = list(
+                Share.objects.using(db_alias).filter(id__gt=last_id)
+                .order_by('id').only('id', 'strategy_data')[:CHUNK_SIZE]
+            )
+            if not batch:
+                break
+            for share in batch:
+                share.strategy_code = share.strategy_data or ''
+            Share.objects.using(db_alias).bulk_update(batch, ['strategy_code'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    # 分批提交，不把整个转换放进一个事务
+    atomic = False
+
+    dependencies = [
+        ('shares', '0019_viewcountdelta'),
+    ]
+
+    operations = [
+        # 可为 NULL 且无默认值的列在 SQLite 上是 ALTER TABLE ADD COLUMN，不会重建表
+        migrations.AddField(
+            model_name='share',
+            name='strategy_data',
+            field=shares.fields.StrategyCodeField(null=True, verbose_name='战术板代码'),
+        ),
+        migrations.RunPython(pack_codes, unpack_codes),
+        # 回滚时旧列由 unpack_codes 重新填充
+        migrations.RunPython(clear_old_codes, migrations.RunPython.noop),
+        # 只修改迁移状态：回滚时重新加回旧列需要一个默认值
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='share',
+                name='strategy_code',
+                field=models.TextField(default='', verbose_name='战术板代码'),
+            ),
+        ]),
+        # 整表重写（见 clear_old_codes），迁移中唯一一步不能分批的操作
+        migrations.RemoveField(
+            model_name='share',
+            name='strategy_code',
+        ),
+        migrations.RenameField(
+            model_name='share',
+            old_name='strategy_data',
+            new_name='strategy_code',
+        ),
+    ]
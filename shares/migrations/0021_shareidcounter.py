@@ -0,0 +1,24 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0020_share_strategy_code_packed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShareIdCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0, verbose_name='已分配序号数')),
+            ],
+            options={
+                'verbose_name': '分享 ID 计数器',
+                'verbose_name_plural': '分享 ID 计数器',
+            },
+        ),
+    ]
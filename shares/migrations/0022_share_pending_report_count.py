@@ -0,0 +1,36 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:51
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_pending_reports(apps, schema_editor):
+    Share = apps.get_model('shares', 'Share')
+    Report = apps.get_model('shares', 'Report')
+    db_alias = schema_editor.connection.alias
+    counts = (
+        Report.objects.using(db_alias).filter(status='pending')
+        .values_list('share_id').annotate(total=Count('id'))
+    )
+    for share_id, total in counts:
+        Share.objects.using(db_alias).filter(pk=share_id).update(pending_report_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0021_shareidcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='share',
+            name='pending_report_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='待处理举报数'),
+        ),
+        migrations.RunPython(count_pending_reports, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('pending_report_count__gt', 0)), fields=['-pending_report_count', '-updated_at'], name='share_reported'),
+        ),
+    ]
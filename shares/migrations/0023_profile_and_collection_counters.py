@@ -0,0 +1,54 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:55
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_counters(apps, schema_editor):
+    Collection = apps.get_model('shares', 'Collection')
+    Share = apps.get_model('shares', 'Share')
+    UserProfile = apps.get_model('shares', 'UserProfile')
+    db_alias = schema_editor.connection.alias
+    item_counts = (
+        Collection.objects.using(db_alias)
+        .annotate(total=Count('collectionitem')).filter(total__gt=0).values_list('pk', 'total')
+    )
+    for pk, total in item_counts:
+        Collection.objects.using(db_alias).filter(pk=pk).update(item_count=total)
+    author_totals = (
+        Share.objects.using(db_alias).exclude(author=None).values_list('author_id')
+        .annotate(
+            public=Count('id', filter=Q(visibility='public', status='approved')),
+            views=Sum('views'),
+        ).order_by()
+    )
+    for user_id, public, views in author_totals:
+        UserProfile.objects.using(db_alias).filter(user_id=user_id).update(
+            public_share_count=public, total_views=views,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0022_share_pending_report_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='内容数量'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='public_share_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='公开分享数'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_views',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='总浏览量'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
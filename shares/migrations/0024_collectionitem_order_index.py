@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0023_profile_and_collection_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collectionitem',
+            index=models.Index(fields=['collection', 'order', 'added_at', 'id'], name='collection_item_order'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0024_collectionitem_order_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='share',
+            name='thumbnail_key',
+            field=models.CharField(blank=True, editable=False, max_length=48, verbose_name='缩略图'),
+        ),
+    ]
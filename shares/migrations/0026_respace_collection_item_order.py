@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-18 18:20
+
+from django.db import migrations
+
+# 与 shares.ordering.ORDER_GAP 相同；迁移中固定写出，不随以后的修改变化
+ORDER_GAP = 1024
+
+
+def respace_orders(apps, schema_editor):
+    """把旧数据的连续排序键（1, 2, 3…）按 ORDER_GAP 重新编号，保持原有顺序"""
+    CollectionItem = apps.get_model('shares', 'CollectionItem')
+    items = CollectionItem.objects.using(schema_editor.connection.alias)
+    collection_ids = items.values_list('collection_id', flat=True).distinct().order_by()
+    for collection_id in collection_ids:
+        rows = items.filter(collection_id=collection_id).order_by('order', 'added_at', 'id').values_list('id', 'order')
+        updated = [
+            CollectionItem(id=item_id, order=ORDER_GAP * i)
+            for i, (item_id, order) in enumerate(rows, 1) if order != ORDER_GAP * i
+        ]
+        items.bulk_update(updated, ['order'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0025_share_thumbnail_key_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(respace_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.8 on 2026-10-18 17:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0026_respace_collection_item_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShareSearchEntry',
+            fields=[
+                ('share', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='shares.share')),
+            ],
+            options={
+                'db_table': 'share_search',
+                'managed': False,
+            },
+        ),
+    ]
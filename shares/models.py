@@ -1,9 +1,27 @@
-from django.db import models
-from django.contrib.auth.models import User
+from django.db import IntegrityError, models, router, transaction
+from django.contrib.auth.models import AnonymousUser, User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.html import strip_tags
 from ckeditor.fields import RichTextField
-import random
+from . import shareids
+from .fields import StrategyCodeField
+import re
+
+
+def _skip_counter_fields(instance, kwargs, counters):
+    """
+    完整保存已有记录时不写回计数字段
+
+    计数只通过 F() 表达式增减（见 counters.py），内存中的值可能已经过时。
+    """
+    if kwargs.get('update_fields') is None and not instance._state.adding:
+        skipped = {*counters, *instance.get_deferred_fields()}
+        kwargs['update_fields'] = [
+            field.attname for field in instance._meta.concrete_fields
+            if not field.primary_key and field.attname not in skipped
+        ]
 
 
 class UserProfile(models.Model):
@@ -11,6 +29,8 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name='用户')
     nickname = models.CharField(max_length=50, blank=True, verbose_name='昵称')
     bio = models.TextField(blank=True, verbose_name='个人简介')
+    public_share_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='公开分享数')
+    total_views = models.PositiveBigIntegerField(default=0, editable=False, verbose_name='总浏览量')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
@@ -21,6 +41,11 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} 的资料"
 
+    def save(self, *args, **kwargs):
+        # 每次登录都会完整保存资料，不能用内存中的旧计数覆盖信号和浏览量合并写入的值
+        _skip_counter_fields(self, kwargs, ['public_share_count', 'total_views'])
+        super().save(*args, **kwargs)
+
     def get_display_name(self):
         """获取显示名称（优先使用昵称）"""
         return self.nickname if self.nickname else self.user.username
@@ -40,11 +65,19 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
 
 
+class ShareQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """user 在列表中能看到的分享（见 Share.visible_filter）"""
+        return self.filter(Share.visible_filter(user))
+
+
 class Share(models.Model):
     """战术板分享模型"""
     share_id = models.CharField(max_length=21, unique=True, editable=False, db_index=True)
     title = models.CharField(max_length=200, verbose_name='标题')
-    strategy_code = models.TextField(verbose_name='战术板代码')
+    # 以压缩后的原始字节存储（见 StrategyCodeField）；允许 NULL 只是为了迁移时能直接 ADD COLUMN，
+    # 不必重建整张表
+    strategy_code = StrategyCodeField(null=True, verbose_name='战术板代码')
     description = models.TextField(blank=True, verbose_name='描述')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='shares', verbose_name='作者', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
@@ -91,47 +124,159 @@ class Share(models.Model):
 
     views = models.IntegerField(default=0, verbose_name='浏览量')
 
+    # 当前缩略图对应的分享码哈希，与 strategy_code 不一致时需要重新渲染；
+    # 分享码无法解码时带 thumbnails.INVALID_PREFIX 前缀
+    thumbnail_key = models.CharField(max_length=48, blank=True, editable=False, verbose_name='缩略图')
+    # 解码后战术板内容的规范哈希，用于发现重复分享；分享码无法解码时为空
+    content_hash = models.CharField(max_length=40, blank=True, editable=False, db_index=True, verbose_name='内容哈希')
+    # 待处理举报数，随举报的提交和处理用 UPDATE ... SET n = n ± k 维护（见 reconcile_report_counts）
+    pending_report_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='待处理举报数')
+
+    objects = ShareQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = '战术板分享'
         verbose_name_plural = '战术板分享'
+        # 按列表页的实际查询设计（见 manage.py bench_share_queries）：
+        # 公开列表只扫描公开且已通过的行，并直接按 (created_at, id) 顺序读取，无需排序
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='share_public_feed',
+                condition=models.Q(visibility='public', status='approved'),
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], name='share_public_category_feed',
+                condition=models.Q(visibility='public', status='approved'),
+            ),
+            models.Index(fields=['author', '-created_at', '-id'], name='share_author_feed'),
+            models.Index(
+                fields=['-created_at', '-id'], name='share_pending_review',
+                condition=models.Q(status='pending'),
+            ),
+            # 举报处理页只读取有待处理举报的分享
+            models.Index(
+                fields=['-pending_report_count', '-updated_at'], name='share_reported',
+                condition=models.Q(pending_report_count__gt=0),
+            ),
+        ]
+
+    @classmethod
+    def visible_filter(cls, user, prefix=''):
+        """
+        user 在列表中能看到的分享对应的查询条件
+
+        公开且已通过审核的对所有人可见；作者能看到自己的全部分享，管理员能看到全部分享。
+        prefix 用于通过关联查询分享的情况，例如 CollectionItem 传入 'share__'。
+        """
+        if user.is_authenticated and (user.is_staff or user.is_superuser):
+            return models.Q()
+        condition = models.Q(**{
+            f'{prefix}visibility': cls.Visibility.PUBLIC, f'{prefix}status': cls.Status.APPROVED,
+        })
+        if user.is_authenticated:
+            condition |= models.Q(**{f'{prefix}author': user})
+        return condition
+
+    def allocate_share_id(self):
+        """
+        预先分配 ID
+
+        在写事务之外调用时可以使用进程内预留的序号块（见 shareids.allocate）；
+        save() 中才分配时往往已在事务中，每次都要单独预留一个序号。
+        """
+        self.share_id = shareids.allocate(router.db_for_write(Share, instance=self))
+        self._share_id_allocated = True
 
     def save(self, *args, **kwargs):
+        allocated = not self.share_id or getattr(self, '_share_id_allocated', False)
         if not self.share_id:
-            self.share_id = self._generate_unique_id()
-        super().save(*args, **kwargs)
-
-    def _generate_unique_id(self):
-        """生成符合规则的唯一ID"""
-        # 规则：8位，数字和字母交替，数字不含01，字母不含oil
-        digits = '23456789'
-        letters = 'abcdefghjkmnpqrstuvwxyz'
-        blacklist = ['b2b', 'c4', 'j8', 'm9', '3p', '8x8']
-        
-        while True:
-            # 生成8位字符：数字-字母-数字-字母-数字-字母-数字-字母
-            chars = []
-            for i in range(8):
-                if i % 2 == 0:
-                    chars.append(random.choice(digits))
-                else:
-                    chars.append(random.choice(letters))
-            
-            new_id = ''.join(chars)
-            
-            # 检查黑名单
-            is_valid = True
-            for bad_word in blacklist:
-                if bad_word in new_id:
-                    is_valid = False
-                    break
-            
-            if not is_valid:
-                continue
-                
-            # 检查唯一性
-            if not Share.objects.filter(share_id=new_id).exists():
-                return new_id
+            self.share_id = shareids.allocate(kwargs.get('using') or router.db_for_write(Share, instance=self))
+        update_fields = kwargs.get('update_fields')
+        code_updated = update_fields is None or 'strategy_code' in update_fields
+        if code_updated and 'strategy_code' not in self.get_deferred_fields():
+            self.content_hash = self.compute_content_hash(self.strategy_code)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        code_changed = code_updated and self._thumbnail_is_stale()
+        _skip_counter_fields(self, kwargs, ['views', 'pending_report_count'])
+        if allocated:
+            self._insert_with_fresh_id(*args, **kwargs)
+            self._share_id_allocated = False
+        else:
+            super().save(*args, **kwargs)
+        if code_changed:
+            # 缩略图等派生数据交给后台任务队列生成，避免阻塞请求
+            DerivativeJob.enqueue([self.pk])
+
+    def _insert_with_fresh_id(self, *args, **kwargs):
+        """
+        保存新分配了 ID 的分享
+
+        新分配的 ID 之间不会重复，只可能与迁移前随机生成的旧 ID 相同；
+        这时（唯一约束冲突后才查询一次）换一个新 ID 重试。
+        """
+        using = kwargs.get('using') or router.db_for_write(Share, instance=self)
+        for _ in range(10):
+            try:
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if not Share.objects.using(using).filter(share_id=self.share_id).exists():
+                    raise
+                self.share_id = shareids.allocate(using)
+        raise IntegrityError(f'无法为分享分配不重复的 ID: {self.share_id}')
+
+    def _thumbnail_is_stale(self):
+        """分享码是否已变化（缩略图需要重新生成）"""
+        if 'strategy_code' in self.get_deferred_fields():
+            return False
+        from .thumbnails import is_current
+        return not is_current(self.thumbnail_key, self.strategy_code)
+
+    @staticmethod
+    def compute_content_hash(strategy_code):
+        """计算分享码对应的内容哈希，无法解码时返回空字符串"""
+        from .stgy import StrategyCodeError, content_hash, decode
+        try:
+            return content_hash(decode(strategy_code.strip()))
+        except StrategyCodeError:
+            return ''
+
+    def find_duplicate(self, user=None):
+        """
+        查找内容相同的已有分享（按内容哈希索引查询）
+
+        只返回 user 在列表中能看到的分享（见 visible_filter），user 为空时按匿名访客处理。
+        """
+        if not self.content_hash:
+            return None
+        return (
+            Share.objects.visible_to(user or AnonymousUser())
+            .filter(content_hash=self.content_hash)
+            .exclude(pk=self.pk)
+            .only('share_id', 'title')
+            .order_by('created_at')
+            .first()
+        )
+
+    @property
+    def description_preview(self):
+        """
+        列表卡片显示的纯文本描述
+
+        列表查询只截取描述开头（description_excerpt 注解），截断处可能落在 HTML 标签中间，
+        先去掉末尾未闭合的标签再去除标签。
+        """
+        text = getattr(self, 'description_excerpt', None)
+        if text is None:
+            text = self.description
+        return strip_tags(re.sub(r'<[^>]*$', '', text or '')).strip()
+
+    @property
+    def thumbnail_url(self):
+        from .thumbnails import thumbnail_url
+        return thumbnail_url(self.thumbnail_key)
 
     def __str__(self):
         return f"{self.title} ({self.share_id})"
@@ -198,6 +343,7 @@ class Collection(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     is_public = models.BooleanField(default=True, verbose_name='是否公开')
     shares = models.ManyToManyField(Share, through='CollectionItem', related_name='collections', verbose_name='包含的分享')
+    item_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='内容数量')
 
     class Meta:
         ordering = ['-updated_at']
@@ -207,6 +353,10 @@ class Collection(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        _skip_counter_fields(self, kwargs, ['item_count'])
+        super().save(*args, **kwargs)
+
 
 class CollectionItem(models.Model):
     """合集项模型（中间表）"""
@@ -220,3 +370,98 @@ class CollectionItem(models.Model):
         verbose_name = '合集项'
         verbose_name_plural = '合集项'
         unique_together = ('collection', 'share')
+        # 合集详情页按 (order, added_at, id) 游标分页，只读取当前页的行
+        indexes = [models.Index(fields=['collection', 'order', 'added_at', 'id'], name='collection_item_order')]
+
+
+class DerivativeJob(models.Model):
+    """派生数据任务（缩略图等），由 run_derivative_worker 命令消费"""
+
+    class Kind(models.TextChoices):
+        THUMBNAIL = 'thumbnail', '缩略图'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', '等待中'
+        RUNNING = 'running', '处理中'
+        DONE = 'done', '已完成'
+        FAILED = 'failed', '已失败'
+
+    share = models.ForeignKey(Share, on_delete=models.CASCADE, related_name='derivative_jobs', verbose_name='分享')
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.THUMBNAIL, verbose_name='类型')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name='状态')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='尝试次数')
+    last_error = models.TextField(blank=True, verbose_name='最近错误')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='可执行时间')
+    locked_by = models.CharField(max_length=64, blank=True, verbose_name='处理进程')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='领取时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = '派生任务'
+        verbose_name_plural = '派生任务'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='derivjob_status_run_after'),
+            models.Index(fields=['status', 'finished_at'], name='derivjob_status_finished'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.share_id} - {self.get_status_display()}"
+
+    @classmethod
+    def enqueue(cls, share_ids, kinds=None):
+        """为分享创建等待中的任务，已有等待中任务的分享不会重复入队；返回新建任务数"""
+        share_ids = list(share_ids)
+        kinds = kinds or [cls.Kind.THUMBNAIL]
+        created = 0
+        for kind in kinds:
+            queued = set(cls.objects.filter(
+                share_id__in=share_ids, kind=kind, status=cls.Status.PENDING
+            ).values_list('share_id', flat=True))
+            jobs = [cls(share_id=share_id, kind=kind) for share_id in share_ids if share_id not in queued]
+            cls.objects.bulk_create(jobs)
+            created += len(jobs)
+        return created
+
+
+class ShareIdCounter(models.Model):
+    """分享 ID 分配计数器（只有一行），见 shareids"""
+    value = models.BigIntegerField(default=0, verbose_name='已分配序号数')
+
+    class Meta:
+        verbose_name = '分享 ID 计数器'
+        verbose_name_plural = '分享 ID 计数器'
+
+    def __str__(self):
+        return str(self.value)
+
+
+class ViewCountDelta(models.Model):
+    """缓冲中的浏览量增量，由 flush_view_counts 合并到 Share.views"""
+    share = models.ForeignKey(Share, on_delete=models.CASCADE, related_name='+', verbose_name='分享')
+    count = models.PositiveIntegerField(verbose_name='增量')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='记录时间')
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = '浏览量增量'
+        verbose_name_plural = '浏览量增量'
+
+    def __str__(self):
+        return f"{self.share_id} +{self.count}"
+
+
+class ShareSearchEntry(models.Model):
+    """
+    全文搜索索引中的一行（FTS5 虚拟表，由迁移 0017 创建，见 search 模块）
+
+    只用于在查询中连接索引表：rowid 即 Share.id，索引内容由 search 模块直接用 SQL 维护。
+    """
+    share = models.OneToOneField(
+        Share, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search_entry',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'share_search'
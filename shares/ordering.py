@@ -0,0 +1,148 @@
+"""
+合集内容的排序键
+
+CollectionItem.order 使用稀疏整数：追加时在当前最大值后留出 ORDER_GAP 的间隔，
+移动时在目标位置两侧的键之间均匀取值，只改写被移动的行。
+两侧之间的空隙不够时，才把整个合集按 ORDER_GAP 重新编号（rebalance）。
+
+所有修改都在一个事务中完成：先更新合集的 updated_at 取得写锁，再读取现有的键，
+因此同一合集的并发排序不会基于过时的键计算。
+"""
+from django.db import transaction
+from django.utils import timezone
+
+ORDER_GAP = 1024
+
+
+class OrderingError(ValueError):
+    """排序请求无效（例如锚点不在合集中）"""
+
+
+def _lock(collection):
+    from .models import Collection
+    Collection.objects.filter(pk=collection.pk).update(updated_at=timezone.now())
+
+
+def next_keys(collection, count):
+    """合集末尾之后的 count 个排序键（须在 _lock 之后的同一事务中调用，否则并发追加会得到相同的键）"""
+    from .models import CollectionItem
+    last = (
+        CollectionItem.objects.filter(collection=collection)
+        .order_by('-order').values_list('order', flat=True).first()
+    ) or 0
+    return [last + ORDER_GAP * i for i in range(1, count + 1)]
+
+
+def add(collection, share):
+    """
+    把一个分享追加到合集末尾，返回新建的合集项
+
+    与 append 不同，这里用 create 保存，照常触发计数和缓存失效的信号。
+    """
+    from .models import CollectionItem
+
+    with transaction.atomic():
+        _lock(collection)
+        return CollectionItem.objects.create(collection=collection, share=share, order=next_keys(collection, 1)[0])
+
+
+def append(collection, shares):
+    """
+    把 shares 追加到合集末尾，已在合集中的分享跳过，返回新建的合集项
+
+    一次 bulk_create 插入所有行（不触发信号），合集内容数在这里一并调整。
+    """
+    from . import counters
+    from .models import CollectionItem
+
+    with transaction.atomic():
+        _lock(collection)
+        existing = set(
+            CollectionItem.objects.filter(collection=collection, share__in=shares).values_list('share_id', flat=True)
+        )
+        new_shares = []
+        for share in shares:
+            if share.pk not in existing:
+                existing.add(share.pk)
+                new_shares.append(share)
+        keys = next_keys(collection, len(new_shares))
+        items = CollectionItem.objects.bulk_create([
+            CollectionItem(collection=collection, share=share, order=key)
+            for share, key in zip(new_shares, keys)
+        ])
+        counters.adjust_item_count(collection.pk, len(items))
+    return items
+
+
+def _keys_between(lower, upper, count):
+    """(lower, upper) 之间均匀分布的 count 个整数键，upper 为 None 表示末尾；空隙不够时返回 None"""
+    if upper is None:
+        return [lower + ORDER_GAP * i for i in range(1, count + 1)]
+    step = (upper - lower) // (count + 1)
+    if step < 1:
+        return None
+    return [lower + step * i for i in range(1, count + 1)]
+
+
+def move(collection, share_ids, after=None, before=None):
+    """
+    把 share_ids 对应的合集项按给出的顺序连续排在 after 之后（或 before 之前）
+
+    after 和 before 都为空时排在合集开头；传入合集的全部分享即为完整的重新排序。
+    通常只读取锚点两侧的键并改写被移动的行，返回实际改写的行数。
+    """
+    from .models import CollectionItem
+
+    if after is not None and before is not None:
+        raise OrderingError('after 和 before 只能指定一个')
+    share_ids = list(dict.fromkeys(share_ids))
+    if not share_ids:
+        return 0
+
+    with transaction.atomic():
+        _lock(collection)
+        items = CollectionItem.objects.filter(collection=collection)
+        moving = {
+            share_id: (item_id, order) for share_id, item_id, order in
+            items.filter(share__share_id__in=share_ids).values_list('share__share_id', 'id', 'order')
+        }
+        missing = [share_id for share_id in share_ids if share_id not in moving]
+        if missing:
+            raise OrderingError(f'分享不在合集中：{", ".join(missing)}')
+        anchor = after if after is not None else before
+        rest = items.exclude(id__in=[item_id for item_id, _ in moving.values()])
+        orders = rest.order_by('order').values_list('order', flat=True)
+        if anchor is None:
+            lower, upper = 0, orders.first()
+        else:
+            anchor_order = rest.filter(share__share_id=anchor).values_list('order', flat=True).first()
+            if anchor_order is None:
+                raise OrderingError('锚点必须是合集中未被移动的分享')
+            if after is not None:
+                lower, upper = anchor_order, orders.filter(order__gt=anchor_order).first()
+            else:
+                lower = rest.filter(order__lt=anchor_order).order_by('-order').values_list('order', flat=True).first()
+                lower, upper = lower or 0, anchor_order
+
+        keys = _keys_between(lower, upper, len(share_ids))
+        if keys is not None:
+            changes = {moving[share_id][0]: key for share_id, key in zip(share_ids, keys)}
+            current = {item_id: order for item_id, order in moving.values()}
+        else:
+            # 空隙不够：按新的顺序把整个合集重新编号（只读取 id 和键两列）
+            rows = list(rest.order_by('order', 'added_at', 'id').values_list('id', 'order'))
+            index = sum(1 for _, order in rows if order <= lower)
+            placed = (
+                [item_id for item_id, _ in rows[:index]]
+                + [moving[share_id][0] for share_id in share_ids]
+                + [item_id for item_id, _ in rows[index:]]
+            )
+            changes = {item_id: ORDER_GAP * i for i, item_id in enumerate(placed, 1)}
+            current = {**dict(rows), **{item_id: order for item_id, order in moving.values()}}
+
+        updated = [
+            CollectionItem(id=item_id, order=key)
+            for item_id, key in changes.items() if current[item_id] != key
+        ]
+        CollectionItem.objects.bulk_update(updated, ['order'], batch_size=500)
+    return len(updated)
@@ -0,0 +1,233 @@
+"""
+游标（keyset）分页
+
+Paginator 每页都要 COUNT(*)，并用 OFFSET 跳过前面的行，越往后翻越慢。
+这里按排序键（默认 created_at, id）记住当前页首尾两条记录，下一页只需
+``WHERE (created_at, id) < (...) ORDER BY ... LIMIT n``，任意深度的页面开销都与第一页相同。
+
+游标是不透明的 base64 字符串，内容为方向、排序键的值和该记录在列表中的序号，末尾附 8 字节截断的 HMAC；
+序号用于显示编号（合集页），翻页时不需要 COUNT 前面的行。无法解析或签名不符的游标视为第一页。
+
+搜索结果按 (search_rank, id) 分页，search_rank 是放大取整后的 bm25。每页仍要先找出全部命中并计算相关度
+（与第一页相同），但不需要用 OFFSET 跳过前面的行。bm25 依赖全文索引的统计量，
+翻页期间有分享新增、修改或删除时，已有结果的相关度会略有变化，页边界附近可能重复或漏掉个别结果；
+取整后相关度相同的结果按 id 排序。
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.functional import cached_property
+
+
+CURSOR_PARAM = 'cursor'
+DEFAULT_ORDERING = ('-created_at', '-id')
+MAC_SIZE = 8
+
+
+def _sign(payload):
+    return salted_hmac('shares.pagination', payload, algorithm='sha256').digest()[:MAC_SIZE]
+
+
+def encode_cursor(direction, values, position=0):
+    """position：values 对应记录的序号（从 1 开始），0 表示未知"""
+    payload = json.dumps([direction, values, position], separators=(',', ':'), default=_json_default)
+    payload = payload.encode('utf-8')
+    return base64.urlsafe_b64encode(payload + _sign(payload)).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """返回 (方向, 排序键值列表, 序号)，格式错误或签名不符时返回 None"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if not constant_time_compare(mac, _sign(payload)):
+            return None
+        direction, values, position = json.loads(payload)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list) or not isinstance(position, int):
+        return None
+    return direction, values, position
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'无法编码 {type(value).__name__}')
+
+
+class CursorPage:
+    """一页结果，接口与 Paginator 的 Page 相近（没有总页数）"""
+
+    def __init__(self, object_list, has_next, has_previous, paginator, query, start=1):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.paginator = paginator
+        self.query = query
+        self._start = start
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def start_index(self):
+        """本页第一条记录的序号（从 1 开始），由游标携带，不查询数据库
+
+        翻页期间前面插入或删除了记录时序号会有偏差，回到第一页后恢复准确。
+        """
+        if not self._has_previous:
+            return 1
+        return self._start
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return ''
+        position = self.start_index() + len(self.object_list) - 1
+        return encode_cursor('next', self.paginator.key_values(self.object_list[-1]), position)
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return ''
+        return encode_cursor('prev', self.paginator.key_values(self.object_list[0]), self.start_index())
+
+    def _url(self, cursor):
+        query = self.query.copy()
+        query.pop(CURSOR_PARAM, None)
+        query.pop('page', None)
+        if cursor:
+            query[CURSOR_PARAM] = cursor
+        encoded = query.urlencode()
+        return f'?{encoded}' if encoded else '?'
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor) if self._has_next else ''
+
+    @property
+    def previous_url(self):
+        return self._url(self.previous_cursor) if self._has_previous else ''
+
+    @property
+    def first_url(self):
+        return self._url('')
+
+
+class CursorPaginator:
+    """
+    按 ordering 中的字段做 keyset 分页
+
+    ordering 的最后一个字段必须唯一（通常是 id），可以包含注解字段（例如搜索的 search_rank）。
+    """
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def key_values(self, obj):
+        return [getattr(obj, name) for name, _ in self.fields]
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def _after(self, values, reverse):
+        """构造“排在 values 之后”的条件：(a > x) OR (a = x AND b > y) OR ..."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # 冗余的首字段范围条件，便于数据库直接利用索引做范围扫描
+        name, descending = self.fields[0]
+        bound = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{bound}': values[0]}) & condition
+
+    def _prepare(self, cursor):
+        """返回 (本页的查询, 游标是否有效, 是否向前翻页, 游标记录的序号)"""
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded and len(decoded[1]) != len(self.fields):
+            decoded = None
+
+        direction = 'next'
+        position = 0
+        queryset = self.queryset
+        if decoded:
+            direction, raw_values, position = decoded
+            try:
+                values = [self._to_python(name, value) for (name, _), value in zip(self.fields, raw_values)]
+            except (ValidationError, ValueError, TypeError):
+                values = None
+            if values is not None:
+                queryset = queryset.filter(self._after(values, reverse=direction == 'prev'))
+            else:
+                decoded, direction, position = None, 'next', 0
+
+        reverse = direction == 'prev'
+        ordering = [
+            name if descending == reverse else f'-{name}'
+            for name, descending in self.fields
+        ]
+        return queryset.order_by(*ordering)[:self.per_page + 1], bool(decoded), reverse, position
+
+    def _page(self, rows, decoded, reverse, position, query):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = bool(rows), has_more
+            # 游标指向下一页的第一条
+            start = position - len(rows)
+        else:
+            has_next, has_previous = has_more, decoded and bool(rows)
+            # 游标指向上一页的最后一条
+            start = position + 1
+        return CursorPage(
+            rows, has_next, has_previous, self, query if query is not None else QueryDict(), start=max(start, 1),
+        )
+
+    def get_page(self, cursor, query=None):
+        queryset, decoded, reverse, position = self._prepare(cursor)
+        return self._page(list(queryset), decoded, reverse, position, query)
+
+    async def aget_page(self, cursor, query=None):
+        """get_page 的异步版本，使用异步 ORM 读取"""
+        queryset, decoded, reverse, position = self._prepare(cursor)
+        return self._page([row async for row in queryset], decoded, reverse, position, query)
+
+
+def paginate(request, queryset, per_page=12, ordering=DEFAULT_ORDERING):
+    """按请求中的游标参数取一页"""
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    return paginator.get_page(request.GET.get(CURSOR_PARAM, ''), request.GET)
+
+
+async def apaginate(request, queryset, per_page=12, ordering=DEFAULT_ORDERING):
+    """paginate 的异步版本"""
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    return await paginator.aget_page(request.GET.get(CURSOR_PARAM, ''), request.GET)
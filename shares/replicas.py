@@ -0,0 +1,144 @@
+"""
+只读副本路由
+
+DATABASE_REPLICAS 中列出的数据库别名是主库的只读副本（复制由数据库或部署工具完成，
+本地可以用 ``manage.py sync_sqlite_replica`` 把主库复制到副本文件）。
+
+- 只有用 @read_from_replica 装饰的只读视图（首页、搜索、作者主页、合集详情）才从副本读取，
+  其他视图和所有写入都使用主库。request.user 是惰性加载的，装饰器在切换到副本之前先加载它，
+  会话和登录用户始终从主库读取，刚登录的用户不会因为复制延迟被当成匿名访客
+- 读己之写：PinPrimaryMiddleware 在每个非 GET/HEAD 请求之后设置 PIN_COOKIE，
+  REPLICA_PIN_SECONDS 秒内该访客的请求全部读主库，不会因为复制延迟看不到自己刚做的修改
+- 故障转移：副本查询出错时把该副本标记为不可用 REPLICA_RETRY_AFTER 秒，
+  并改用主库重新执行视图（只读视图可以安全地重新执行）
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_read_alias = contextvars.ContextVar('replica_read_alias', default=None)
+_lock = threading.Lock()
+_down_until = {}
+
+
+def healthy_replicas():
+    now = time.monotonic()
+    with _lock:
+        return [alias for alias in settings.DATABASE_REPLICAS if _down_until.get(alias, 0) <= now]
+
+
+def mark_down(alias):
+    with _lock:
+        _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_AFTER
+
+
+def reset():
+    """清除不可用标记（测试用）"""
+    with _lock:
+        _down_until.clear()
+
+
+def choose_replica(request):
+    """为本次请求选择一个副本，需要读主库时返回 None"""
+    if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+        return None
+    candidates = healthy_replicas()
+    return random.choice(candidates) if candidates else None
+
+
+def _load_user(request):
+    """加载会话和登录用户（访问一次属性即完成 request.user 的惰性加载）"""
+    return getattr(request, 'user', None) is not None and request.user.is_authenticated
+
+
+def read_from_replica(view):
+    """只读视图的装饰器：视图中的查询发往一个可用的副本，出错时回退到主库（支持异步视图）"""
+    if iscoroutinefunction(view):
+        return _async_read_from_replica(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = choose_replica(request)
+        if alias is None:
+            return view(request, *args, **kwargs)
+        _load_user(request)
+        token = _read_alias.set(alias)
+        try:
+            return view(request, *args, **kwargs)
+        except DatabaseError:
+            mark_down(alias)
+            logger.exception('只读副本 %s 查询失败，%s 秒内改用主库', alias, settings.REPLICA_RETRY_AFTER)
+        finally:
+            _read_alias.reset(token)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _async_read_from_replica(view):
+    # 异步 ORM 在线程中执行查询，sync_to_async 会把 _read_alias 复制到执行线程
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        alias = choose_replica(request)
+        if alias is None:
+            return await view(request, *args, **kwargs)
+        if not getattr(request, 'guest_fast_path', False):
+            await sync_to_async(_load_user)(request)
+        token = _read_alias.set(alias)
+        try:
+            return await view(request, *args, **kwargs)
+        except DatabaseError:
+            mark_down(alias)
+            logger.exception('只读副本 %s 查询失败，%s 秒内改用主库', alias, settings.REPLICA_RETRY_AFTER)
+        finally:
+            _read_alias.reset(token)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """在 read_from_replica 范围内把读取发往副本；写入永远不会发往副本"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class PinPrimaryMiddleware(MiddlewareMixin):
+    """写请求之后的一段时间内让该访客读主库（没有配置副本时不启用；同时支持同步和异步请求）"""
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,197 @@
+"""
+分享全文搜索
+
+在 SQLite 上使用 FTS5 虚拟表 ``share_search`` 建立倒排索引（rowid 即 Share.id），
+索引标题、描述和作者名（昵称 + 用户名）。FTS5 自带的 unicode61 分词器不会切分中文，
+因此写入索引和查询前先在 Python 中分词：
+
+- 中日韩文字按重叠的二元组切分，每段末尾再补一个单字，保证单字查询也能前缀匹配
+- 其他文字按单词切分并转为小写
+
+索引由模型信号保持同步，``manage.py rebuild_search_index`` 可全量重建。
+非 SQLite 数据库回退为 icontains 查询。
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, IntegerField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+TABLE = 'share_search'
+
+# title, description, author 三列的 bm25 权重
+RANK_WEIGHTS = (10.0, 1.0, 5.0)
+
+# bm25 乘以该倍数后取整作为 search_rank，浮点值不适合在游标中做等值比较
+RANK_SCALE = 1000000
+
+# 搜索结果的排序（同时作为游标分页的键）：相关度，相同时新的在前
+SEARCH_ORDERING = ('search_rank', '-id')
+
+_CJK = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+_TOKEN_RE = re.compile(f'([{_CJK}]+)|([^\\W{_CJK}]+)')
+
+
+def is_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _cjk_tokens(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def tokenize(text):
+    """把文本切分为索引词列表"""
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(text or ''):
+        if cjk:
+            tokens.extend(_cjk_tokens(cjk))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def build_match(query):
+    """
+    把用户输入转换为 FTS5 MATCH 表达式，所有词都必须出现
+
+    中文按二元组精确匹配（单字用前缀匹配），其他单词用前缀匹配。
+    没有可搜索的词时返回空字符串。
+    """
+    terms = []
+    for cjk, word in _TOKEN_RE.findall(query):
+        if cjk and len(cjk) > 1:
+            # 查询时不需要末尾单字，二元组已经覆盖
+            terms.extend(f'"{cjk[i:i + 2]}"' for i in range(len(cjk) - 1))
+        else:
+            terms.append(f'"{(cjk or word.lower())}"*')
+    return ' '.join(terms)
+
+
+def _document(share):
+    author = ''
+    if share.author_id:
+        profile = getattr(share.author, 'profile', None)
+        nickname = profile.nickname if profile else ''
+        author = f'{nickname} {share.author.username}'
+    return (
+        share.id,
+        ' '.join(tokenize(share.title)),
+        ' '.join(tokenize(share.description)),
+        ' '.join(tokenize(author)),
+    )
+
+
+def index_shares(shares):
+    """写入（或覆盖）若干分享的索引；shares 需预先 select_related('author__profile')"""
+    if not is_enabled():
+        return
+    rows = [_document(share) for share in shares]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, title, description, author) VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def remove_shares(share_ids):
+    if not is_enabled() or not share_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(pk,) for pk in share_ids])
+
+
+def clear_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+
+
+def optimize_index():
+    """合并 FTS5 的 b-tree 段，重建后调用可提升查询速度"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def search_shares(queryset, query):
+    """
+    在 queryset 中搜索 query，返回按相关度排序的 queryset
+
+    结果带有 search_rank 注解（bm25 乘以 RANK_SCALE 取整，越小越相关），按 SEARCH_ORDERING 排序，
+    可以直接用于游标分页。查询直接连接索引表（ShareSearchEntry），MATCH 只执行一次。
+    """
+    if not is_enabled():
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(author__profile__nickname__icontains=query) |
+            Q(author__username__icontains=query)
+        ).distinct().annotate(search_rank=Value(0, output_field=IntegerField()))
+
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    # 连接索引表后 MATCH 和 bm25 引用的都是连接中的这一行
+    return queryset.filter(
+        RawSQL(f'{TABLE} MATCH %s', (match,), output_field=BooleanField()),
+        search_entry__isnull=False,
+    ).annotate(
+        search_rank=RawSQL(
+            f'CAST(ROUND(bm25({TABLE}, {weights}) * {RANK_SCALE}) AS INTEGER)', (), output_field=IntegerField(),
+        ),
+    ).order_by(*SEARCH_ORDERING)
+
+
+# ---- 信号处理：保持索引与模型同步 ----
+
+def share_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'title', 'description', 'author'} & set(update_fields):
+        return
+    from .models import Share
+    index_shares(Share.objects.filter(pk=instance.pk).select_related('author__profile'))
+
+
+def share_deleted(sender, instance, **kwargs):
+    remove_shares([instance.pk])
+
+
+def author_saved(sender, instance, raw=False, **kwargs):
+    """
+    用户名或昵称变化时重建该用户所有分享的索引
+
+    User 和 UserProfile 在每次登录时都会保存，先比较已索引的作者名，未变化则跳过。
+    """
+    if raw or not is_enabled():
+        return
+    from .models import Share, UserProfile
+    if isinstance(instance, UserProfile):
+        user, nickname = instance.user, instance.nickname
+    else:
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'username' not in update_fields:
+            return
+        user = instance
+        profile = UserProfile.objects.filter(user=user).only('nickname').first()
+        nickname = profile.nickname if profile else ''
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT author FROM {TABLE} WHERE rowid = '
+            f'(SELECT id FROM {Share._meta.db_table} WHERE author_id = %s LIMIT 1)',
+            [user.pk],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] == ' '.join(tokenize(f'{nickname} {user.username}')):
+        return
+    shares = Share.objects.filter(author_id=user.pk)
+    index_shares(shares.select_related('author__profile').only(
+        'id', 'title', 'description', 'author__username', 'author__profile__nickname'
+    ))
@@ -0,0 +1,116 @@
+"""
+分享 ID 分配
+
+分享 ID 为 8 位，数字和字母交替（数字不含 01，字母不含 oil），共 8^4 * 23^4 ≈ 11.5 亿个。
+以前随机生成后逐个查询是否已存在，ID 越多重试越多，并发创建仍可能撞上唯一约束。
+
+这里改为：
+
+1. ShareIdCounter 单行计数器按块预留连续的序号（一条 UPDATE ... SET value = value + n），
+   进程内用完一块再取下一块，不同进程拿到的序号不会重叠
+2. 序号经过以 SHARE_ID_KEY 为密钥的平衡 Feistel 网络映射到 [0, 33856^2)，
+   33856^2 恰好等于 ID 空间大小，因此是一一映射：不同序号一定得到不同 ID，
+   且外部无法从 ID 推出创建顺序
+3. 结果按位拆成数字和字母；含黑名单片段的 ID 直接跳过，换用下一个序号
+
+整个过程不需要查询 ID 是否已存在。迁移前随机生成的旧 ID 可能恰好与新 ID 相同，
+概率约为 旧 ID 数 / 11.5 亿，由 Share.save() 在唯一约束冲突时换一个 ID 重试。
+"""
+import hashlib
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+
+DIGITS = '23456789'
+LETTERS = 'abcdefghjkmnpqrstuvwxyz'
+BLACKLIST = ('b2b', 'c4', 'j8', 'm9', '3p', '8x8')
+
+# Feistel 每一半的取值范围：8^2 * 23^2，两半合起来正好覆盖 8^4 * 23^4 个 ID
+HALF = len(DIGITS) ** 2 * len(LETTERS) ** 2
+SPACE = HALF * HALF
+ROUNDS = 6
+
+_lock = threading.Lock()
+_reserved = deque()
+
+
+def _round_key():
+    return hashlib.sha256(f'share-id:{settings.SHARE_ID_KEY}'.encode('utf-8')).digest()
+
+
+def permute(index, key=None):
+    """把 [0, SPACE) 内的序号一一映射到 [0, SPACE) 内的另一个数"""
+    key = key or _round_key()
+    left, right = divmod(index, HALF)
+    for round_number in range(ROUNDS):
+        digest = hashlib.blake2b(
+            right.to_bytes(4, 'little'), digest_size=8, key=key, person=bytes([round_number]) * 16,
+        ).digest()
+        left, right = right, (left + int.from_bytes(digest, 'little')) % HALF
+    return left * HALF + right
+
+
+def format_id(number):
+    """把 [0, SPACE) 内的数按位转换为数字、字母交替的 8 位 ID"""
+    letters, digits = divmod(number, len(DIGITS) ** 4)
+    chars = []
+    for _ in range(4):
+        digits, digit = divmod(digits, len(DIGITS))
+        letters, letter = divmod(letters, len(LETTERS))
+        chars.append(DIGITS[digit])
+        chars.append(LETTERS[letter])
+    return ''.join(chars)
+
+
+def is_blacklisted(share_id):
+    return any(word in share_id for word in BLACKLIST)
+
+
+def reserve(count, using=DEFAULT_DB_ALIAS):
+    """在数据库计数器中预留 count 个连续序号，返回 range"""
+    from .models import ShareIdCounter
+
+    counters = ShareIdCounter.objects.using(using)
+    with transaction.atomic(using=using):
+        # UPDATE 会先取得写锁，同一事务内读到的值不会被其他进程改动
+        if not counters.filter(pk=1).update(value=F('value') + count):
+            try:
+                with transaction.atomic(using=using):
+                    counters.create(pk=1, value=0)
+            except IntegrityError:
+                pass
+            counters.filter(pk=1).update(value=F('value') + count)
+        end = counters.values_list('value', flat=True).get(pk=1)
+    if end > SPACE:
+        raise RuntimeError('分享 ID 已用尽')
+    return range(end - count, end)
+
+
+def allocate(using=DEFAULT_DB_ALIAS):
+    """分配一个新的分享 ID"""
+    key = _round_key()
+    while True:
+        with _lock:
+            index = _reserved.popleft() if _reserved else None
+        if index is None:
+            if transaction.get_connection(using).in_atomic_block:
+                # 外层事务回滚时计数器也会回滚，其他进程可能再次领到同一块序号，
+                # 因此只预留当前要用的一个，不留在进程内
+                index = reserve(1, using)[0]
+            else:
+                block = reserve(settings.SHARE_ID_BLOCK_SIZE, using)
+                index = block[0]
+                with _lock:
+                    _reserved.extend(block[1:])
+        share_id = format_id(permute(index, key))
+        if not is_blacklisted(share_id):
+            return share_id
+
+
+def discard_reserved():
+    """丢弃本进程预留但未使用的序号（测试用）"""
+    with _lock:
+        _reserved.clear()
@@ -0,0 +1,73 @@
+"""
+SQLite 生产配置
+
+1. 连接初始化：每个新连接执行 DATABASES[alias]['PRAGMAS'] 中的 PRAGMA（见 settings.SQLITE_PRAGMAS）：
+
+   - journal_mode=WAL：读不阻塞写、写不阻塞读（设置会保存在数据库文件中）
+   - busy_timeout：遇到写锁时等待而不是立即报 "database is locked"
+   - synchronous=NORMAL：WAL 模式下只在检查点时 fsync，断电最多丢失最近的事务，不会损坏数据库
+   - mmap_size / cache_size：用内存映射和更大的页缓存减少读系统调用
+
+   配合 CONN_MAX_AGE 复用连接，PRAGMA 只在建立连接时执行一次。
+
+2. 串行写入：write(func) 在事务中执行 func。SQLITE_SERIALIZE_WRITES 为 True 时同一进程内的写事务
+   排队依次执行，线程之间不再争抢写锁；遇到其他进程持有写锁（OperationalError: database is locked）
+   时按指数退避重试。已在外层事务中时无法单独重试，直接执行。
+
+``manage.py bench_sqlite_writes`` 在默认配置和本配置下做并发读写压测，比较锁错误数和延迟分位数。
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_write_lock = threading.Lock()
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created 信号处理：为新的 SQLite 连接执行 PRAGMA"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def pragma(name, using=DEFAULT_DB_ALIAS):
+    """读取连接当前的 PRAGMA 值"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+def is_locked_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def write(func, using=DEFAULT_DB_ALIAS):
+    """在写事务中执行 func 并返回其结果，遇到锁冲突时退避重试"""
+    if transaction.get_connection(using).in_atomic_block:
+        return func()
+    retries = settings.SQLITE_WRITE_RETRIES
+    delay = settings.SQLITE_WRITE_BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            if settings.SQLITE_SERIALIZE_WRITES:
+                with _write_lock, transaction.atomic(using=using):
+                    return func()
+            with transaction.atomic(using=using):
+                return func()
+        except OperationalError as e:
+            if attempt == retries or not is_locked_error(e):
+                raise
+            logger.warning('写入遇到锁冲突，%.0f ms 后第 %d 次重试', delay * 1000, attempt + 1)
+        # 加入随机抖动，避免多个进程同时重试再次冲突
+        time.sleep(delay * random.uniform(0.5, 1.5))
+        delay *= 2
@@ -0,0 +1,492 @@
+"""
+战术板代码解析
+
+将游戏导出的 ``[stgy:a...]`` 分享码解码为对象列表，流程与前端预览器使用的
+xiv-strat-board 保持一致：替换密码 -> base64 -> 跳过 6 字节头 -> zlib 解压 -> 二进制解析。
+"""
+import base64
+import hashlib
+import struct
+import zlib
+from collections import namedtuple
+
+
+CODE_PREFIX = '[stgy:a'
+CODE_SUFFIX = ']'
+MAX_CODE_LENGTH = 10000
+
+# 密钥字符 -> 明文字符（按字符码索引，0 表示非法）
+_KEY_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 78, 0, 80, 0, 0,
+    120, 103, 48, 75, 56, 83, 74, 50, 115, 90, 0, 0, 0, 0, 0, 0, 0, 68, 70, 116,
+    84, 54, 69, 97, 86, 99, 112, 76, 77, 109, 101, 106, 57, 88, 66, 52, 82, 89, 55, 95,
+    110, 79, 98, 0, 0, 0, 0, 0, 0, 105, 45, 118, 72, 67, 65, 114, 87, 111, 100, 73,
+    113, 104, 85, 108, 107, 51, 102, 121, 53, 71, 119, 49, 117, 122, 81, 0, 0, 0, 0, 0,
+)
+
+# 密文字符 -> 明文字符
+_SUBSTITUTION = {
+    '+': 'N', '-': 'P', '0': 'x', '1': 'g', '2': '0', '3': 'K', '4': '8', '5': 'S',
+    '6': 'J', '7': '2', '8': 's', '9': 'Z', 'A': 'D', 'B': 'F', 'C': 't', 'D': 'T',
+    'E': '6', 'F': 'E', 'G': 'a', 'H': 'V', 'I': 'c', 'J': 'p', 'K': 'L', 'L': 'M',
+    'M': 'm', 'N': 'e', 'O': 'j', 'P': '9', 'Q': 'X', 'R': 'B', 'S': '4', 'T': 'R',
+    'U': 'Y', 'V': '7', 'W': '_', 'X': 'n', 'Y': 'O', 'Z': 'b', 'a': 'i', 'b': '-',
+    'c': 'v', 'd': 'H', 'e': 'C', 'f': 'A', 'g': 'r', 'h': 'W', 'i': 'o', 'j': 'd',
+    'k': 'I', 'l': 'q', 'm': 'h', 'n': 'U', 'o': 'l', 'p': 'k', 'q': '3', 'r': 'f',
+    's': 'y', 't': '5', 'u': 'G', 'v': 'w', 'w': '1', 'x': 'u', 'y': 'z', 'z': 'Q',
+}
+
+_BASE64URL = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+_BASE64URL_VALUE = {char: index for index, char in enumerate(_BASE64URL)}
+_BASE64URL_BYTES = _BASE64URL.encode('ascii')
+_VALID_CHARS = frozenset(_BASE64URL + '+')
+
+# 密文字符 -> 替换后的 6 位值；未收录的字符按 'A' 处理，与前端一致
+_CIPHER_VALUE = [0] * 128
+for _char, _plain in _SUBSTITUTION.items():
+    _CIPHER_VALUE[ord(_char)] = _BASE64URL_VALUE[_plain]
+
+# 替换后的 6 位值 -> 密文字符（重新编码用）
+_VALUE_CIPHER = {_BASE64URL_VALUE[_plain]: _char for _char, _plain in _SUBSTITUTION.items()}
+
+# 紧凑存储格式的首字节
+PACKED_TEXT = 0
+PACKED_BOARD = 1
+
+# 对象类型 ID -> 类型名（与 xiv-strat-board 的命名一致）
+OBJECT_TYPES = {
+    4: 'checkered_circle', 8: 'checkered_square', 124: 'grey_circle', 125: 'grey_square',
+    9: 'circle_aoe', 10: 'fan_aoe', 11: 'line_aoe', 12: 'line', 13: 'gaze', 14: 'stack',
+    15: 'line_stack', 16: 'proximity', 17: 'donut', 106: 'stack_multi', 107: 'proximity_player',
+    108: 'tankbuster', 109: 'radial_knockback', 110: 'linear_knockback', 111: 'tower',
+    112: 'targeting', 126: 'moving_circle_aoe', 127: '1person_aoe', 128: '2person_aoe',
+    129: '3person_aoe', 130: '4person_aoe',
+    18: 'gladiator', 19: 'pugilist', 20: 'marauder', 21: 'lancer', 22: 'archer', 23: 'conjurer',
+    24: 'thaumaturge', 25: 'arcanist', 26: 'rogue', 27: 'paladin', 28: 'monk', 29: 'warrior',
+    30: 'dragoon', 31: 'bard', 32: 'white_mage', 33: 'black_mage', 34: 'summoner', 35: 'scholar',
+    36: 'ninja', 37: 'machinist', 38: 'dark_knight', 39: 'astrologian', 40: 'samurai',
+    41: 'red_mage', 42: 'blue_mage', 43: 'gunbreaker', 44: 'dancer', 45: 'reaper', 46: 'sage',
+    101: 'viper', 102: 'pictomancer',
+    47: 'tank', 48: 'tank_1', 49: 'tank_2', 50: 'healer', 51: 'healer_1', 52: 'healer_2',
+    53: 'dps', 54: 'dps_1', 55: 'dps_2', 56: 'dps_3', 57: 'dps_4', 118: 'melee_dps',
+    119: 'ranged_dps', 120: 'physical_ranged_dps', 121: 'magical_ranged_dps',
+    122: 'pure_healer', 123: 'barrier_healer',
+    60: 'small_enemy', 62: 'medium_enemy', 64: 'large_enemy',
+    65: 'attack_1', 66: 'attack_2', 67: 'attack_3', 68: 'attack_4', 69: 'attack_5',
+    115: 'attack_6', 116: 'attack_7', 117: 'attack_8', 70: 'bind_1', 71: 'bind_2', 72: 'bind_3',
+    73: 'ignore_1', 74: 'ignore_2', 75: 'square_marker', 76: 'circle_marker', 77: 'plus_marker',
+    78: 'triangle_marker', 79: 'waymark_a', 80: 'waymark_b', 81: 'waymark_c', 82: 'waymark_d',
+    83: 'waymark_1', 84: 'waymark_2', 85: 'waymark_3', 86: 'waymark_4',
+    87: 'shape_circle', 88: 'shape_x', 89: 'shape_triangle', 90: 'shape_square', 94: 'up_arrow',
+    100: 'text', 103: 'rotate', 135: 'highlighted_circle', 136: 'highlighted_x',
+    137: 'highlighted_square', 138: 'highlighted_triangle', 139: 'rotate_clockwise',
+    140: 'rotate_counterclockwise', 113: 'enhancement', 114: 'enfeeblement',
+    131: 'lockon_red', 132: 'lockon_blue', 133: 'lockon_purple', 134: 'lockon_green', 105: 'group',
+}
+
+BACKGROUNDS = {
+    1: 'none', 2: 'checkered', 3: 'checkered_circle', 4: 'checkered_square',
+    5: 'grey', 6: 'grey_circle', 7: 'grey_square',
+}
+
+TYPE_CIRCLE_AOE = 9
+TYPE_FAN_AOE = 10
+TYPE_LINE_AOE = 11
+TYPE_LINE = 12
+TYPE_LINE_STACK = 15
+TYPE_DONUT = 17
+TYPE_TEXT = 100
+TYPE_LINEAR_KNOCKBACK = 110
+
+# 只有这些类型会携带颜色
+_COLORED_TYPES = frozenset((TYPE_LINE_AOE, TYPE_LINE, TYPE_TEXT))
+
+FLAG_VISIBLE = 1
+FLAG_HORIZONTAL_FLIP = 2
+FLAG_VERTICAL_FLIP = 4
+FLAG_LOCKED = 8
+
+
+class StrategyCodeError(ValueError):
+    """分享码格式错误或无法解析"""
+
+
+_BoardObjectBase = namedtuple('BoardObject', [
+    'type', 'type_id', 'x', 'y', 'size', 'angle', 'color', 'transparency', 'text', 'flags',
+    'width', 'height', 'arc_angle', 'donut_radius', 'end_x', 'end_y',
+    'display_count', 'horizontal_count', 'vertical_count',
+], defaults=[100, 0, None, 0, None, FLAG_VISIBLE] + [None] * 9)
+
+
+class BoardObject(_BoardObjectBase):
+    """战术板上的单个对象（不可变，坐标单位与游戏内 512x384 画布一致）"""
+    __slots__ = ()
+
+    @property
+    def hidden(self):
+        return not self.flags & FLAG_VISIBLE
+
+    @property
+    def horizontal_flip(self):
+        return bool(self.flags & FLAG_HORIZONTAL_FLIP)
+
+    @property
+    def vertical_flip(self):
+        return bool(self.flags & FLAG_VERTICAL_FLIP)
+
+    @property
+    def locked(self):
+        return bool(self.flags & FLAG_LOCKED)
+
+
+StrategyBoard = namedtuple('StrategyBoard', ['version', 'name', 'background', 'objects'])
+
+
+def validate_code(code):
+    """检查分享码的外层格式，不合法时抛出 StrategyCodeError"""
+    if not isinstance(code, str):
+        raise StrategyCodeError('分享码必须是字符串')
+    if len(code) < 10:
+        raise StrategyCodeError('分享码过短')
+    if len(code) > MAX_CODE_LENGTH:
+        raise StrategyCodeError('分享码过长')
+    if not code.startswith(CODE_PREFIX):
+        raise StrategyCodeError('分享码必须以 "[stgy:a" 开头')
+    if not code.endswith(CODE_SUFFIX):
+        raise StrategyCodeError('分享码必须以 "]" 结尾')
+    body = code[len(CODE_PREFIX):-1]
+    if len(body) < 2:
+        raise StrategyCodeError('分享码内容过短')
+    if not _VALID_CHARS.issuperset(body):
+        bad = next(char for char in body if char not in _VALID_CHARS)
+        raise StrategyCodeError(f'分享码包含非法字符: "{bad}"')
+    return body
+
+
+def _decipher(body):
+    """去掉替换密码，返回 base64 解码后的原始字节（含 6 字节头）"""
+    key_plain = _KEY_TABLE[ord(body[0])] if ord(body[0]) < len(_KEY_TABLE) else 0
+    if not key_plain:
+        raise StrategyCodeError('分享码密钥字符非法')
+    key = _BASE64URL_VALUE[chr(key_plain)]
+    cipher_value = _CIPHER_VALUE
+    alphabet = _BASE64URL_BYTES
+    plain = bytes([
+        alphabet[(cipher_value[ord(char)] - index - key) & 63]
+        for index, char in enumerate(body[1:])
+    ])
+    plain += b'=' * (-len(plain) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(plain)
+    except (ValueError, TypeError) as exc:
+        raise StrategyCodeError(f'base64 解码失败: {exc}')
+    if len(raw) < 7:
+        raise StrategyCodeError('分享码数据过短')
+    return raw
+
+
+def decode_raw(code):
+    """返回分享码去掉替换密码后的原始字节（6 字节头 + zlib 数据流）"""
+    return _decipher(validate_code(code))
+
+
+def encode_raw(key_char, raw):
+    """decode_raw 的逆过程：用密钥字符 key_char 把原始字节重新编码为分享码"""
+    key = _BASE64URL_VALUE[chr(_KEY_TABLE[ord(key_char)])]
+    plain = base64.urlsafe_b64encode(raw).rstrip(b'=')
+    value_cipher = _VALUE_CIPHER
+    body = ''.join(
+        value_cipher[(_BASE64URL_VALUE[chr(char)] + index + key) & 63]
+        for index, char in enumerate(plain)
+    )
+    return f'{CODE_PREFIX}{key_char}{body}{CODE_SUFFIX}'
+
+
+def pack_code(code):
+    """
+    把分享码转换为紧凑的存储格式
+
+    能无损还原的分享码存为 PACKED_BOARD + 密钥字符 + 原始字节（6 字节头 + zlib 数据流），
+    约为文本形式的 3/4；无法解码或重新编码后与原文不完全一致的（例如带空白、
+    末尾填充位不为 0）存为 PACKED_TEXT + UTF-8 原文。
+    """
+    if not code:
+        return b''
+    try:
+        raw = decode_raw(code)
+    except StrategyCodeError:
+        raw = None
+    key_char = code[len(CODE_PREFIX):len(CODE_PREFIX) + 1]
+    if raw is not None and encode_raw(key_char, raw) == code:
+        return bytes([PACKED_BOARD]) + key_char.encode('ascii') + raw
+    return bytes([PACKED_TEXT]) + code.encode('utf-8')
+
+
+def unpack_code(data):
+    """pack_code 的逆过程，返回与原文完全相同的分享码"""
+    data = bytes(data)
+    if not data:
+        return ''
+    if data[0] == PACKED_BOARD:
+        return encode_raw(chr(data[1]), data[2:])
+    if data[0] == PACKED_TEXT:
+        return data[1:].decode('utf-8')
+    raise StrategyCodeError(f'未知的分享码存储格式: {data[0]}')
+
+
+def decode_payload(code):
+    """返回分享码解压后的战术板二进制数据"""
+    raw = decode_raw(code)
+    try:
+        # 47 = 自动识别 zlib/gzip 头，与前端 pako.inflate 的行为一致
+        return zlib.decompress(raw[6:], 47)
+    except zlib.error as exc:
+        raise StrategyCodeError(f'解压失败: {exc}')
+
+
+def _text(data):
+    return bytes(data).decode('utf-8', errors='replace').rstrip('\0')
+
+
+def parse_payload(data):
+    """解析解压后的二进制数据，返回 StrategyBoard"""
+    if len(data) < 28:
+        raise StrategyCodeError('战术板数据头不完整')
+    size = len(data)
+    unpack_from = struct.unpack_from
+    version = unpack_from('<I', data, 0)[0]
+    name_length = unpack_from('<H', data, 26)[0]
+    if size < 28 + name_length:
+        raise StrategyCodeError('战术板名称字段不完整')
+    name = _text(data[28:28 + name_length]).strip()
+    pos = 28 + name_length
+
+    type_ids = []
+    texts = []
+    # 第一段：对象类型列表与文本
+    while size - pos >= 4:
+        tag = unpack_from('<H', data, pos)[0]
+        pos += 2
+        if tag == 2:
+            type_ids.append(unpack_from('<H', data, pos)[0])
+            pos += 2
+        elif tag == 3:
+            length = unpack_from('<H', data, pos)[0]
+            pos += 2
+            if length > 1:
+                if size - pos < length:
+                    break
+                texts.append(_text(data[pos:pos + length]))
+                pos += length
+            else:
+                pos -= 4
+                break
+        else:
+            pos -= 2
+            break
+
+    count = len(type_ids)
+    positions = []
+    angles = []
+    sizes = []
+    colors = []
+    params1 = []
+    params2 = []
+    params3 = []
+    flags = []
+    background = 1
+
+    # 第二段：按字段分块存放的对象属性
+    while size - pos >= 2:
+        tag = unpack_from('<H', data, pos)[0]
+        pos += 2
+        if tag == 2:
+            if size - pos < 2:
+                break
+            type_ids.append(unpack_from('<H', data, pos)[0])
+            pos += 2
+            continue
+        if tag == 3:
+            if size - pos < 2:
+                break
+            length = unpack_from('<H', data, pos)[0]
+            pos += 2
+            if length == 1:
+                if size - pos < 4:
+                    break
+                background = unpack_from('<H', data, pos + 2)[0]
+                pos += 4
+                break
+            if size - pos < length:
+                break
+            texts.append(_text(data[pos:pos + length]))
+            pos += length
+            continue
+        if tag not in (4, 5, 6, 7, 8, 10, 11, 12):
+            break
+        if size - pos < 4:
+            break
+        length = unpack_from('<H', data, pos + 2)[0]
+        pos += 4
+        if tag == 4:
+            if length > 1:
+                if size - pos < length * 2:
+                    break
+                flags.extend(unpack_from(f'<{length}H', data, pos))
+                pos += length * 2
+            else:
+                if size - pos < 2:
+                    break
+                flags.append(unpack_from('<H', data, pos)[0])
+                pos += 2
+        elif tag == 5:
+            n = min(length, (size - pos) // 4)
+            values = unpack_from(f'<{n * 2}h', data, pos)
+            positions.extend(zip(values[0::2], values[1::2]))
+            pos += n * 4
+        elif tag == 8:
+            n = min(length, (size - pos) // 4)
+            colors.extend(tuple(data[i:i + 4]) for i in range(pos, pos + n * 4, 4))
+            pos += n * 4
+        elif tag == 7:
+            n = min(length, size - pos)
+            sizes.extend(data[pos:pos + n])
+            pos += n
+            if length % 2 == 1 and size - pos >= 1:
+                pos += 1
+        else:
+            n = min(length, (size - pos) // 2)
+            values = unpack_from(f'<{n}{"h" if tag == 6 else "H"}', data, pos)
+            pos += n * 2
+            if tag == 6:
+                angles.extend(values)
+            elif tag == 10:
+                params1.extend(values)
+            elif tag == 11:
+                params2.extend(values)
+            else:
+                params3.extend(values)
+
+    objects = []
+    text_iter = iter(texts)
+    for index in range(count):
+        type_id = type_ids[index]
+        fields = {}
+        if index < len(positions):
+            fields['x'] = positions[index][0] / 10
+            fields['y'] = positions[index][1] / 10
+        else:
+            fields['x'] = 0
+            fields['y'] = 0
+        object_size = sizes[index] if index < len(sizes) else 0
+        fields['size'] = object_size if type_id != TYPE_TEXT and object_size > 0 else 100
+        if type_id != TYPE_TEXT and index < len(angles) and angles[index]:
+            fields['angle'] = angles[index]
+        if index < len(colors):
+            red, green, blue, alpha = colors[index]
+            if type_id in _COLORED_TYPES:
+                fields['color'] = f'#{red:02x}{green:02x}{blue:02x}'
+            if alpha > 0:
+                fields['transparency'] = alpha
+
+        p1 = params1[index] if index < len(params1) else None
+        p2 = params2[index] if index < len(params2) else None
+        p3 = params3[index] if index < len(params3) else None
+        if type_id == TYPE_LINE_AOE:
+            if p1:
+                fields['width'] = p1
+            if p2:
+                fields['height'] = p2
+        elif type_id == TYPE_FAN_AOE:
+            if p1:
+                fields['arc_angle'] = p1
+        elif type_id == TYPE_LINE:
+            if p1 is not None:
+                fields['end_x'] = p1 / 10
+            if p2 is not None:
+                fields['end_y'] = p2 / 10
+            if p3:
+                fields['height'] = p3
+        elif type_id == TYPE_LINE_STACK:
+            if p2:
+                fields['display_count'] = p2
+        elif type_id == TYPE_LINEAR_KNOCKBACK:
+            if p1:
+                fields['horizontal_count'] = p1
+            if p2:
+                fields['vertical_count'] = p2
+        elif type_id == TYPE_DONUT:
+            if p1:
+                fields['arc_angle'] = p1
+            if p2 is not None:
+                fields['donut_radius'] = p2
+        else:
+            if p1:
+                fields['arc_angle'] = p1
+            if p2:
+                fields['donut_radius'] = p2
+
+        if type_id == TYPE_TEXT:
+            fields['text'] = next(text_iter, None)
+        if index < len(flags):
+            fields['flags'] = flags[index]
+
+        objects.append(BoardObject(
+            type=OBJECT_TYPES.get(type_id, f'unknown_{type_id}'),
+            type_id=type_id,
+            **fields
+        ))
+
+    return StrategyBoard(
+        version=version,
+        name=name or None,
+        background=BACKGROUNDS.get(background, 'none'),
+        objects=tuple(objects),
+    )
+
+
+def decode(code):
+    """解码分享码，返回 StrategyBoard；格式错误时抛出 StrategyCodeError"""
+    return parse_payload(decode_payload(code))
+
+
+def is_valid_code(code):
+    """分享码能否被完整解码"""
+    try:
+        decode(code)
+    except StrategyCodeError:
+        return False
+    return True
+
+
+def decode_many(codes):
+    """
+    批量解码分享码
+
+    返回与输入等长的列表，无法解码的位置为 None。相同的分享码只解码一次。
+    """
+    results = []
+    seen = {}
+    for code in codes:
+        if code in seen:
+            results.append(seen[code])
+            continue
+        try:
+            board = decode(code)
+        except StrategyCodeError:
+            board = None
+        seen[code] = board
+        results.append(board)
+    return results
+
+
+def content_hash(board):
+    """
+    战术板内容的规范哈希
+
+    只取背景和对象列表，忽略战术板名称和编码细节（密钥字符、压缩参数），
+    因此同一张战术板重新导出或改名后再次分享也会得到相同的哈希。
+    """
+    canonical = repr((board.background, tuple(board.objects)))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
@@ -1,3 +1,1703 @@
-from django.test import TestCase
+import base64
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.apps import apps as django_apps
+from django.core.cache import cache as django_cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.conf import settings
+from django.db import DatabaseError, OperationalError
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection, connections, router
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    cache, cards, checks, derivatives, middleware, ordering, pagination, replicas, search, shareids, sqlite, stgy,
+    thumbnails, viewcounter, viewdedup,
+)
+from .forms import ShareForm
+from .models import (
+    Collection, CollectionItem, DerivativeJob, Report, Share, ShareIdCounter, UserProfile, ViewCountDelta,
+)
+
+
+# 以下分享码及期望值取自前端预览器（xiv-strat-board）的解码结果
+CODE_SUS_STRATS = '[stgy:a0+k-wvprSQA8rHpf1cY9Fk5R6ZNO5n7lvBSj9+rmE3OpbNbquadZFNuf34LKtB6Vvu+VwRuRlBjVWYHUviSUm70CoiZFyhI4mL2zvz2dqd2H+n24dmIzgMnUiI7BIEsAjEu6Yw8QNW73V4PV9for2+LXvcEt7lWK15eZwHDQojZm4juqzJiypDd5BkvBnZNs5j2tK]'
+CODE_TEST4 = '[stgy:a2mW7zYpGVGucnON7LpkuDJH66enQBnNYQkCKKUR6lrKMrVuduwvMbQ5lYPO7cdfHNJexQfOqhOOYwu6DnluGxbRieZQbd41xysoX6g-8ue0Z14MAXSqNr+xsHeqFlaZ6P3ng1n6dc1xLH]'
+CODE_DEMO = '[stgy:aLcnpxPulnsNdEvWZVSOgAvmgt4MN3i9kxbOQjW9HfobttiBlZ8KfzMlzhcEk98N2r7y-2D5Z3nZrh195ZnRNWORCB4XMwidyV2CX5k0S+ow+VNeEzhWhhfseFIH5ekbMGLBlcsD+2iKQBv1qbQyJ9TRRogiQHDlGXdycaI0qJwN7Ue3Ypz6bfC31Y4pBudPZ8Q7Rw8W1XL0Gfk6+Tavla1gPyvrs]'
+
+
+def reencode(code, key_char='Z'):
+    """用另一个密钥字符重新编码分享码（内容不变，字符串完全不同）"""
+    raw = stgy.decode_raw(code)
+    raw = raw[:6] + zlib.compress(zlib.decompress(raw[6:]), 1)
+    plain = base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+    key = stgy._BASE64URL_VALUE[chr(stgy._KEY_TABLE[ord(key_char)])]
+    cipher = {stgy._BASE64URL_VALUE[plain]: char for char, plain in stgy._SUBSTITUTION.items()}
+    body = ''.join(
+        cipher[(stgy._BASE64URL_VALUE[char] + index + key) & 63] for index, char in enumerate(plain)
+    )
+    return f'{stgy.CODE_PREFIX}{key_char}{body}{stgy.CODE_SUFFIX}'
+
+
+class StrategyDecoderTests(SimpleTestCase):
+    """战术板代码解码器"""
+
+    def test_decode_aoe_board(self):
+        board = stgy.decode(CODE_SUS_STRATS)
+        self.assertEqual(board.version, 2)
+        self.assertEqual(board.name, 'Sus Strats')
+        self.assertEqual(board.background, 'none')
+        self.assertEqual(
+            [(o.type, o.x, o.y, o.size) for o in board.objects],
+            [
+                ('gaze', 300, 148.5, 165),
+                ('line_aoe', 247, 197.5, 100),
+                ('circle_aoe', 246.2, 136.9, 38),
+                ('line_aoe', 301.3, 280.4, 100),
+                ('line_aoe', 192.7, 280.1, 100),
+                ('circle_aoe', 175, 201.5, 27),
+            ],
+        )
+        line = board.objects[1]
+        self.assertEqual((line.color, line.width, line.height), ('#ff8000', 190, 128))
+        self.assertIsNone(board.objects[0].color)
+
+    def test_decode_roles_board(self):
+        board = stgy.decode(CODE_TEST4)
+        self.assertEqual(board.name, 'test4')
+        self.assertEqual(board.background, 'checkered_circle')
+        self.assertEqual([o.type for o in board.objects], ['tank', 'healer', 'dps', 'dps'])
+        self.assertEqual([o.type_id for o in board.objects], [47, 50, 53, 53])
+        self.assertFalse(any(o.hidden for o in board.objects))
+
+    def test_decode_text_and_waymarks(self):
+        board = stgy.decode(CODE_DEMO)
+        text = board.objects[0]
+        self.assertEqual((text.type, text.text, text.color), ('text', 'Hello there :3', '#ffffff'))
+        self.assertEqual(board.objects[1].type, 'large_enemy')
+        self.assertEqual(board.objects[1].size, 120)
+        self.assertEqual(
+            [o.type for o in board.objects[2:]],
+            ['waymark_a', 'waymark_b', 'waymark_c', 'waymark_d',
+             'waymark_1', 'waymark_2', 'waymark_3', 'waymark_4'],
+        )
+
+    def test_invalid_codes(self):
+        for code in ['', 'hello world', '[stgy:a]', CODE_TEST4[:-1], CODE_TEST4.replace('W', '!'),
+                     '[stgy:a' + 'A' * 20 + ']', CODE_TEST4[:40] + ']']:
+            with self.subTest(code=code):
+                with self.assertRaises(stgy.StrategyCodeError):
+                    stgy.decode(code)
+        self.assertFalse(stgy.is_valid_code(None))
+
+    def test_decode_many(self):
+        results = stgy.decode_many([CODE_TEST4, 'bad', CODE_DEMO, CODE_TEST4])
+        self.assertEqual(len(results), 4)
+        self.assertIsNone(results[1])
+        self.assertEqual(results[0], stgy.decode(CODE_TEST4))
+        self.assertEqual(results[2].name, 'Demo')
+        self.assertIs(results[0], results[3])
+
+
+class StrategyCodeStorageTests(TestCase):
+    """分享码的紧凑二进制存储"""
+
+    def test_pack_round_trip(self):
+        for code in [CODE_DEMO, CODE_TEST4, reencode(CODE_SUS_STRATS), f' {CODE_DEMO}\n', 'not a code', '']:
+            with self.subTest(code=code):
+                self.assertEqual(stgy.unpack_code(stgy.pack_code(code)), code)
+        packed = stgy.pack_code(CODE_DEMO)
+        self.assertEqual(packed[0], stgy.PACKED_BOARD)
+        self.assertLess(len(packed), len(CODE_DEMO) * 3 // 4)
+        self.assertEqual(stgy.pack_code('not a code')[0], stgy.PACKED_TEXT)
+
+    def test_model_field(self):
+        share = Share.objects.create(title='a', strategy_code=CODE_DEMO)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT strategy_code FROM shares_share WHERE id = %s', [share.id])
+            self.assertEqual(bytes(cursor.fetchone()[0]), stgy.pack_code(CODE_DEMO))
+        self.assertEqual(Share.objects.get(strategy_code=CODE_DEMO).strategy_code, CODE_DEMO)
+        self.assertEqual(list(Share.objects.values_list('strategy_code', flat=True)), [CODE_DEMO])
+
+        form = ShareForm(instance=share)
+        self.assertIn(CODE_DEMO, str(form['strategy_code']))
+
+    def test_size_report(self):
+        Share.objects.create(title='a', strategy_code=CODE_DEMO)
+        Share.objects.create(title='b', strategy_code='not a code')
+        out = StringIO()
+        call_command('report_code_storage', stdout=out)
+        self.assertIn('分享 2 个，其中 1 个以原始字节存储，1 个保留原文', out.getvalue())
+        self.assertIn('VACUUM', out.getvalue())
+
+
+class ShareIdTests(TestCase):
+    """计数器 + 置换的分享 ID 分配"""
+
+    def setUp(self):
+        shareids.discard_reserved()
+        self.addCleanup(shareids.discard_reserved)
+
+    def test_permutation_is_bijective(self):
+        key = b'k' * 32
+        outputs = {shareids.permute(index, key) for index in range(20000)}
+        self.assertEqual(len(outputs), 20000)
+        self.assertTrue(all(0 <= value < shareids.SPACE for value in outputs))
+        self.assertNotEqual(shareids.permute(0, key), shareids.permute(0, b'x' * 32))
+        share_id = shareids.format_id(shareids.SPACE - 1)
+        self.assertRegex(share_id, r'^([2-9][a-hjkmnp-z]){4}$')
+
+    def test_blacklisted_ids_are_skipped(self):
+        ids = [shareids.allocate() for _ in range(300)]
+        self.assertEqual(len(set(ids)), 300)
+        self.assertFalse(any(shareids.is_blacklisted(share_id) for share_id in ids))
+        self.assertGreaterEqual(ShareIdCounter.objects.get().value, 300)
+
+    def test_create_does_not_probe_existing_ids(self):
+        with CaptureQueriesContext(connection) as queries:
+            Share.objects.create(title='a', strategy_code='x')
+        self.assertFalse([q for q in queries if '"shares_share"."share_id" =' in q['sql']])
+
+    def test_retry_on_legacy_id_collision(self):
+        legacy = Share.objects.create(title='旧', strategy_code='x')
+        with mock.patch.object(shareids, 'allocate', side_effect=[legacy.share_id, '2a2a2a2a']):
+            share = Share.objects.create(title='新', strategy_code='x')
+        self.assertEqual(share.share_id, '2a2a2a2a')
+
+        share = Share(title='预先分配', strategy_code='x')
+        with mock.patch.object(shareids, 'allocate', side_effect=[legacy.share_id, '3b3b3b3b']):
+            share.allocate_share_id()
+            share.save()
+        self.assertEqual(share.share_id, '3b3b3b3b')
+
+    def test_create_view_allocates_outside_write_transaction(self):
+        user = User.objects.create_user('author', password='pw')
+        self.client.force_login(user)
+        allocated = []
+
+        def write(func):
+            # 进入写事务时 ID 已经分配好
+            allocated.append(func.__self__.share_id)
+            return func()
+
+        with mock.patch.object(sqlite, 'write', side_effect=write):
+            self.client.post('/create/', {
+                'title': '新分享', 'strategy_code': CODE_TEST4, 'category': 'combat', 'visibility': 'public',
+            })
+        share = Share.objects.get(title='新分享')
+        self.assertEqual(allocated, [share.share_id])
+
+
+class ShareIdConcurrencyTests(SimpleTestCase):
+    """多个线程（各自一个数据库连接）同时分配 ID 不会重复"""
+
+    alias = 'share_id_concurrency'
+
+    def setUp(self):
+        # 测试用的内存数据库不支持多连接并发写入，这里用临时文件数据库
+        path = os.path.join(tempfile.mkdtemp(), 'concurrency.sqlite3')
+        connections.settings[self.alias] = {**connections.settings['default'], 'NAME': path}
+        call_command('migrate', database=self.alias, verbosity=0)
+        shareids.discard_reserved()
+
+    def tearDown(self):
+        shareids.discard_reserved()
+        connections[self.alias].close()
+        del connections.settings[self.alias]
+
+    def test_concurrent_allocation(self):
+        errors = []
+        ids = []
+
+        def allocate():
+            try:
+                for _ in range(50):
+                    ids.append(shareids.allocate(self.alias))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections[self.alias].close()
+
+        with override_settings(SHARE_ID_BLOCK_SIZE=4):
+            threads = [threading.Thread(target=allocate) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(ids)), 200)
+        # 唯一约束也能接受全部 ID
+        Share.objects.using(self.alias).bulk_create(
+            [Share(share_id=share_id, title=share_id, strategy_code='x') for share_id in ids]
+        )
+
+
+class ThumbnailTests(TestCase):
+    """战术板缩略图与派生任务队列"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def run_worker(self):
+        call_command('run_derivative_worker', '--once', '--processes', '1', stdout=StringIO())
+
+    def test_render_thumbnail(self):
+        image = Image.open(BytesIO(thumbnails.render_thumbnail(CODE_SUS_STRATS)))
+        self.assertEqual(image.format, 'WEBP')
+        self.assertEqual(image.size, thumbnails.thumbnail_size())
+
+    def test_thumbnail_follows_strategy_code(self):
+        share = Share.objects.create(title='test', strategy_code=CODE_TEST4)
+        self.assertEqual(share.thumbnail_key, '')
+        self.assertEqual(DerivativeJob.objects.filter(share=share, status='pending').count(), 1)
+
+        self.run_worker()
+        share.refresh_from_db()
+        self.assertEqual(share.thumbnail_key, thumbnails.code_hash(CODE_TEST4))
+        self.assertTrue(default_storage.exists(thumbnails.thumbnail_path(share.thumbnail_key)))
+        self.assertIn(share.thumbnail_key, share.thumbnail_url)
+
+        # 只修改标题不会重新生成
+        share.title = 'renamed'
+        share.save()
+        self.assertFalse(DerivativeJob.objects.filter(status='pending').exists())
+
+        share.strategy_code = CODE_DEMO
+        share.save()
+        share.save()
+        self.assertEqual(DerivativeJob.objects.filter(status='pending').count(), 1)
+        self.run_worker()
+        share.refresh_from_db()
+        self.assertEqual(share.thumbnail_key, thumbnails.code_hash(CODE_DEMO))
+
+    def test_index_uses_thumbnail_image(self):
+        share = Share.objects.create(title='test', strategy_code=CODE_TEST4)
+        self.run_worker()
+        share.refresh_from_db()
+        response = self.client.get('/')
+        self.assertContains(response, f'src="{share.thumbnail_url}"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertNotContains(response, '<iframe')
+
+    def test_invalid_code_has_no_thumbnail(self):
+        share = Share.objects.create(title='test', strategy_code='not a code')
+        self.run_worker()
+        share.refresh_from_db()
+        self.assertEqual(share.thumbnail_key, thumbnails.INVALID_PREFIX + thumbnails.code_hash('not a code'))
+        self.assertEqual(share.thumbnail_url, '')
+        self.assertEqual(DerivativeJob.objects.get(share=share).status, 'done')
+
+        # 已确认无法解码的分享码不会因保存或补齐再次入队
+        share.title = 'renamed'
+        share.save()
+        call_command('run_derivative_worker', '--backfill', '--processes', '1', stdout=StringIO())
+        self.assertEqual(DerivativeJob.objects.filter(share=share).count(), 1)
+        self.assertContains(self.client.get('/'), '<iframe')
+
+    def test_finished_jobs_are_pruned(self):
+        shares = [Share.objects.create(title=f'test {i}', strategy_code=CODE_TEST4) for i in range(2)]
+        self.run_worker()
+        DerivativeJob.objects.filter(share=shares[0]).update(finished_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(derivatives.prune_finished(3600), 1)
+        self.assertEqual(list(DerivativeJob.objects.values_list('share_id', flat=True)), [shares[1].pk])
+
+    def test_failed_job_is_retried_then_given_up(self):
+        share = Share.objects.create(title='test', strategy_code=CODE_TEST4)
+        (job, code), = derivatives.claim(10, 'test')
+        derivatives.fail(job, RuntimeError('boom'), max_attempts=2, retry_delay=60)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('pending', 1, 'boom'))
+        self.assertEqual(derivatives.claim(10, 'test'), [])
+
+        derivatives.fail(job, RuntimeError('boom'), max_attempts=2, retry_delay=60)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(derivatives.queue_stats()['depth'], 0)
+
+    def test_backfill_enqueues_stale_shares(self):
+        shares = [Share.objects.create(title=f'test {i}', strategy_code=CODE_TEST4) for i in range(3)]
+        DerivativeJob.objects.all().delete()
+        call_command('run_derivative_worker', '--backfill', '--processes', '1', '--batch-size', '1', stdout=StringIO())
+        for share in shares:
+            share.refresh_from_db()
+            self.assertEqual(share.thumbnail_key, thumbnails.code_hash(CODE_TEST4))
+        self.assertEqual(derivatives.queue_stats()['counts'], {('thumbnail', 'done'): 3})
+
+
+class ContentHashTests(TestCase):
+    """按内容哈希查找重复分享"""
+
+    def test_reencoded_code_has_same_hash(self):
+        other = reencode(CODE_TEST4)
+        self.assertNotEqual(other, CODE_TEST4)
+        self.assertEqual(stgy.decode(other), stgy.decode(CODE_TEST4))
+        self.assertEqual(
+            Share.compute_content_hash(other), Share.compute_content_hash(CODE_TEST4)
+        )
+        self.assertNotEqual(
+            Share.compute_content_hash(CODE_DEMO), Share.compute_content_hash(CODE_TEST4)
+        )
+        self.assertEqual(Share.compute_content_hash('not a code'), '')
+
+    def test_hash_follows_strategy_code(self):
+        share = Share.objects.create(title='a', strategy_code=CODE_TEST4)
+        self.assertEqual(share.content_hash, Share.compute_content_hash(CODE_TEST4))
+        share.strategy_code = CODE_DEMO
+        share.save(update_fields=['strategy_code'])
+        share.refresh_from_db()
+        self.assertEqual(share.content_hash, Share.compute_content_hash(CODE_DEMO))
+
+    def test_find_duplicate_respects_visibility(self):
+        owner = User.objects.create_user('owner', password='pw')
+        original = Share.objects.create(title='原版', strategy_code=CODE_TEST4, author=owner,
+                                        visibility=Share.Visibility.PRIVATE)
+        copy = Share.objects.create(title='copy', strategy_code=reencode(CODE_TEST4))
+        self.assertIsNone(copy.find_duplicate())
+        self.assertEqual(copy.find_duplicate(owner), original)
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.assertEqual(copy.find_duplicate(staff), original)
+
+        original.visibility = Share.Visibility.PUBLIC
+        original.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(copy.find_duplicate().share_id, original.share_id)
+        self.assertIsNone(Share.objects.create(title='x', strategy_code='bad').find_duplicate())
+
+    def test_create_warns_about_duplicate(self):
+        self.addCleanup(viewcounter.discard)
+        original = Share.objects.create(title='原版', strategy_code=CODE_DEMO)
+        response = self.client.post('/create/', {
+            'title': '再发一次', 'strategy_code': reencode(CODE_DEMO), 'description': '',
+            'category': 'combat', 'visibility': 'public',
+        }, follow=True)
+        self.assertContains(response, f'href="{original.get_absolute_url()}"')
+        self.assertContains(response, '该战术板已存在于分享')
+
+    def test_backfill_command_reports_clusters(self):
+        shares = [
+            Share.objects.create(title='a', strategy_code=CODE_TEST4),
+            Share.objects.create(title='b', strategy_code=reencode(CODE_TEST4, 'x')),
+            Share.objects.create(title='c', strategy_code=CODE_DEMO),
+        ]
+        Share.objects.update(content_hash='')
+        out = StringIO()
+        call_command('backfill_content_hashes', '--chunk-size', '2', stdout=out)
+        for share in shares:
+            share.refresh_from_db()
+        self.assertEqual(shares[0].content_hash, shares[1].content_hash)
+        self.assertNotEqual(shares[0].content_hash, shares[2].content_hash)
+        self.assertIn('发现 1 组重复战术板', out.getvalue())
+        self.assertIn(shares[1].share_id, out.getvalue())
+
+
+class SearchTests(TestCase):
+    """FTS5 全文搜索"""
+
+    def setUp(self):
+        self.author = User.objects.create_user('raidlead', password='pw')
+        self.author.profile.nickname = '光之战士'
+        self.author.profile.save()
+        self.m1s = Share.objects.create(title='零式一层 黑猫 处理方法', strategy_code='x', author=self.author)
+        self.m2s = Share.objects.create(title='Savage Mechanics', description='二层分摊站位', strategy_code='x')
+        self.private = Share.objects.create(title='零式一层 私人', strategy_code='x',
+                                            visibility=Share.Visibility.PRIVATE)
+
+    def search(self, query):
+        return list(search.search_shares(
+            Share.objects.filter(visibility=Share.Visibility.PUBLIC), query
+        ))
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('零式一层 M1S'), ['零式', '式一', '一层', '层', 'm1s'])
+        self.assertEqual(search.tokenize('猫'), ['猫'])
+        self.assertEqual(search.build_match('一层 mech'), '"一层" "mech"*')
+        self.assertEqual(search.build_match('!!!'), '')
+
+    def test_cjk_and_prefix_queries(self):
+        self.assertEqual(self.search('一层'), [self.m1s])
+        self.assertEqual(self.search('黑猫处理'), [])
+        self.assertEqual(self.search('猫'), [self.m1s])
+        self.assertEqual(self.search('层'), [self.m1s, self.m2s])
+        self.assertEqual(self.search('savage mech'), [self.m2s])
+        self.assertEqual(self.search('分摊'), [self.m2s])
+        self.assertEqual(self.search('"'), [])
+
+    def test_author_names_are_indexed(self):
+        self.assertEqual(self.search('raidlead'), [self.m1s])
+        self.assertEqual(self.search('光之战士'), [self.m1s])
+        self.author.profile.nickname = '暗黑骑士'
+        self.author.profile.save()
+        self.assertEqual(self.search('光之战士'), [])
+        self.assertEqual(self.search('暗黑'), [self.m1s])
+
+    def test_title_ranks_above_description(self):
+        other = Share.objects.create(title='站位', strategy_code='x')
+        self.assertEqual(self.search('站位'), [other, self.m2s])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.m2s.title = 'Ultimate'
+        self.m2s.save()
+        self.assertEqual(self.search('savage'), [])
+        self.assertEqual(self.search('ultimate'), [self.m2s])
+        self.m2s.delete()
+        self.assertEqual(self.search('ultimate'), [])
+
+    def test_rebuild_command(self):
+        search.clear_index()
+        self.assertEqual(self.search('一层'), [])
+        call_command('rebuild_search_index', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(self.search('一层'), [self.m1s])
+
+    def test_single_match_joined_with_shares(self):
+        results = search.search_shares(Share.objects.filter(visibility=Share.Visibility.PUBLIC), '层')
+        paginator = pagination.CursorPaginator(results, 1, search.SEARCH_ORDERING)
+        first = paginator.get_page('')
+        for queryset in (results[:13], paginator._prepare(first.next_cursor)[0]):
+            self.assertEqual(str(queryset.query).count('MATCH'), 1)
+            plan = queryset.explain()
+            # 先扫描全文索引，再按主键找到分享，不对每个分享重新 MATCH
+            self.assertIn('SCAN share_search VIRTUAL TABLE', plan)
+            self.assertIn('SEARCH shares_share USING INTEGER PRIMARY KEY', plan)
+        self.assertEqual([share for share in first] + list(paginator.get_page(first.next_cursor)), list(results))
+
+    def test_search_view(self):
+        response = self.client.get('/search/', {'q': '零式'})
+        self.assertContains(response, self.m1s.share_id)
+        self.assertNotContains(response, self.private.share_id)
+
+
+class CursorPaginationTests(TestCase):
+    """游标分页"""
+
+    def setUp(self):
+        django_cache.clear()
+        for i in range(30):
+            Share.objects.create(title=f'share {i:02d}', strategy_code='x')
+        # 制造相同的 created_at，检验 id 作为次级排序键
+        Share.objects.filter(title__in=['share 10', 'share 11', 'share 12']).update(
+            created_at=Share.objects.get(title='share 10').created_at
+        )
+        self.expected = list(Share.objects.order_by('-created_at', '-id'))
+
+    def walk(self, queryset, per_page, **kwargs):
+        paginator = pagination.CursorPaginator(queryset, per_page, **kwargs)
+        page = paginator.get_page('')
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        return paginator, pages
+
+    def test_walk_forward_and_back(self):
+        paginator, pages = self.walk(Share.objects.all(), 7)
+        self.assertEqual([share for page in pages for share in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 7, 2])
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+        page = pages[-1]
+        back = []
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            back.insert(0, list(page))
+        self.assertEqual([list(page) for page in pages[:-1]], back)
+
+    def test_deep_page_query_count(self):
+        paginator, pages = self.walk(Share.objects.all(), 5)
+        with self.assertNumQueries(1):
+            page = paginator.get_page(pages[4].next_cursor)
+        self.assertEqual(list(page), self.expected[25:30])
+
+    def test_positions_carried_in_cursor(self):
+        paginator, pages = self.walk(Share.objects.all(), 7)
+        self.assertEqual([page.start_index() for page in pages], [1, 8, 15, 22, 29])
+        with self.assertNumQueries(1):
+            page = paginator.get_page(pages[-1].previous_cursor)
+            self.assertEqual(page.start_index(), 22)
+        self.assertEqual(paginator.get_page(pages[1].previous_cursor).start_index(), 1)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = pagination.CursorPaginator(Share.objects.all(), 5)
+        forged = base64.urlsafe_b64encode(b'["next",["2020-01-01T00:00:00+00:00",1],100]' + b'x' * 8).decode()
+        for cursor in ['garbage', pagination.encode_cursor('next', ['not a date', 1]),
+                       pagination.encode_cursor('prev', [1]), forged]:
+            page = paginator.get_page(cursor)
+            self.assertEqual(list(page), self.expected[:5])
+            self.assertFalse(page.has_previous())
+
+    def test_index_links_and_fragment(self):
+        response = self.client.get('/', {'category': 'entertainment'})
+        page = response.context['shares']
+        self.assertIn('category=entertainment', page.next_url)
+        self.assertContains(response, 'id="load-more-btn"')
+
+        response = self.client.get('/' + page.next_url + '&fragment=1')
+        self.assertTemplateUsed(response, 'shares/_share_cards.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertContains(response, self.expected[12].share_id)
+        self.assertNotContains(response, self.expected[11].share_id)
+        self.assertIn('cursor=', response['X-Next-Page'])
+
+    def test_search_pages_by_rank(self):
+        results = search.search_shares(Share.objects.all(), 'share')
+        paginator, pages = self.walk(results, 4, ordering=search.SEARCH_ORDERING)
+        found = [share for page in pages for share in page]
+        self.assertEqual(found, list(results))
+        self.assertEqual(len(set(found)), 30)
+        self.assertEqual(pages[2].start_index(), 9)
+
+        page = pages[-1]
+        back = []
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            back.insert(0, list(page))
+        self.assertEqual([list(page) for page in pages[:-1]], back)
+        self.assertFalse(page.has_previous())
+
+        response = self.client.get('/search/', {'q': 'share'})
+        self.assertIn('q=share', response.context['shares'].next_url)
+
+
+class ShareIndexTests(TestCase):
+    """列表查询使用对应的部分索引"""
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.order_by('-created_at', '-id')[:13].explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_list_queries_use_indexes(self):
+        public = Share.objects.filter(visibility=Share.Visibility.PUBLIC, status=Share.Status.APPROVED)
+        self.assertUsesIndex(public, 'share_public_feed')
+        self.assertUsesIndex(public.filter(category='combat'), 'share_public_category_feed')
+        self.assertUsesIndex(Share.objects.filter(author_id=1), 'share_author_feed')
+        self.assertUsesIndex(Share.objects.filter(status=Share.Status.PENDING), 'share_pending_review')
+
+
+@override_settings(VIEW_COUNTER_SPILL_INTERVAL=3600, VIEW_COUNTER_SPILL_THRESHOLD=1000)
+class ViewCounterTests(TestCase):
+    """浏览量缓冲计数"""
+
+    def setUp(self):
+        viewcounter.discard()
+        self.addCleanup(viewcounter.discard)
+        self.a = Share.objects.create(title='a', strategy_code='x')
+        self.b = Share.objects.create(title='b', strategy_code='x')
+
+    def views(self, share):
+        return Share.objects.values_list('views', flat=True).get(pk=share.pk)
+
+    def test_detail_view_does_not_write_views(self):
+        response = self.client.get(self.a.get_absolute_url())
+        self.assertEqual(response.context['share'].views, 1)
+        self.assertEqual(self.views(self.a), 0)
+        self.assertEqual(viewcounter.pending(), {self.a.pk: 1})
+
+        # 同一访客再次访问不计数
+        self.client.get(self.a.get_absolute_url())
+        self.assertEqual(viewcounter.pending(), {self.a.pk: 1})
+
+    def test_viewed_cookie_is_signed_and_scoped_to_details(self):
+        response = self.client.get(self.a.get_absolute_url())
+        cookie = response.cookies[viewdedup.COOKIE_NAME]
+        self.assertEqual(cookie['path'], '/s/')
+        self.assertLess(len(cookie.value), 100)
+
+        # 被篡改的 Cookie 视为没有浏览记录
+        self.client.cookies[viewdedup.COOKIE_NAME] = cookie.value[:-2] + ('AA' if cookie.value[-2:] != 'AA' else 'BB')
+        self.client.get(self.a.get_absolute_url())
+        self.assertEqual(viewcounter.pending(), {self.a.pk: 2})
+
+    def test_legacy_cookie_is_imported_and_deleted(self):
+        self.client.cookies['viewed_shares'] = f'zz99zz99,{self.a.share_id}'
+        response = self.client.get(self.a.get_absolute_url())
+        self.assertEqual(viewcounter.pending(), {})
+        self.assertEqual(response.cookies['viewed_shares']['max-age'], 0)
+        self.assertIn(self.a.share_id, viewdedup.ViewedShares.loads(response.cookies[viewdedup.COOKIE_NAME].value))
+
+        self.client.get(self.b.get_absolute_url())
+        self.client.get(self.a.get_absolute_url())
+        self.assertEqual(viewcounter.pending(), {self.b.pk: 1})
+
+    @override_settings(VIEW_DEDUP_CAPACITY=4)
+    def test_filter_rotation_keeps_recent_shares(self):
+        viewed = viewdedup.ViewedShares()
+        ids = [f'id{i:06d}' for i in range(12)]
+        for share_id in ids:
+            viewed.add(share_id)
+        restored = viewdedup.ViewedShares.loads(viewed.dumps())
+        # 最近两代（8 个）一定记得
+        self.assertTrue(all(share_id in restored for share_id in ids[-8:]))
+        self.assertEqual(len(viewed.dumps()), len(restored.dumps()))
+        self.assertIsNone(viewdedup.ViewedShares.loads('not-a-token'))
+
+    def test_spill_and_flush_aggregate_per_share(self):
+        for share in [self.a, self.a, self.b, self.a]:
+            viewcounter.record(share.pk)
+        self.assertEqual(viewcounter.spill(), 4)
+        viewcounter.record(self.a.pk)
+        viewcounter.spill()
+        self.assertEqual(ViewCountDelta.objects.count(), 3)
+
+        out = StringIO()
+        call_command('flush_view_counts', stdout=out)
+        self.assertIn('合并 5 次浏览到 2 个分享', out.getvalue())
+        self.assertEqual((self.views(self.a), self.views(self.b)), (4, 1))
+        self.assertFalse(ViewCountDelta.objects.exists())
+        self.assertEqual(viewcounter.flush(), (0, 0))
+
+    @override_settings(VIEW_COUNTER_SPILL_THRESHOLD=3)
+    def test_threshold_triggers_spill(self):
+        viewcounter.record(self.a.pk)
+        viewcounter.record(self.b.pk)
+        self.assertFalse(ViewCountDelta.objects.exists())
+        viewcounter.record(self.a.pk)
+        self.assertEqual(viewcounter.pending(), {})
+        self.assertEqual(sum(ViewCountDelta.objects.values_list('count', flat=True)), 3)
+
+    def test_failed_spill_keeps_counts(self):
+        viewcounter.record(self.a.pk)
+        with mock.patch.object(ViewCountDelta.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertLogs('shares.viewcounter', 'ERROR'):
+                self.assertEqual(viewcounter.spill(), 0)
+        self.assertEqual(viewcounter.pending(), {self.a.pk: 1})
+
+    @override_settings(VIEW_COUNTER_SPILL_INTERVAL=0.05)
+    def test_timer_spills_quiet_process(self):
+        fired = threading.Event()
+        # 距上次写出的时间不满足 record() 中的条件，只能由定时器写出
+        with mock.patch.object(viewcounter, '_timer_enabled', True), \
+                mock.patch.object(viewcounter, '_last_spill', time.monotonic() + 60), \
+                mock.patch.object(viewcounter, 'spill', side_effect=fired.set) as spill:
+            viewcounter.record(self.a.pk)
+            viewcounter.record(self.b.pk)
+            self.assertTrue(fired.wait(5))
+        # 定时器已触发过一次，下一次浏览会重新启动它
+        self.assertEqual(spill.call_count, 1)
+        self.assertIsNone(viewcounter._timer)
+
+    def test_timer_disabled_outside_server_processes(self):
+        viewcounter.record(self.a.pk)
+        self.assertIsNone(viewcounter._timer)
+
+    def test_spill_skips_deleted_shares(self):
+        viewcounter.record(self.a.pk)
+        viewcounter.record(self.b.pk)
+        viewcounter.record(self.b.pk)
+        self.b.delete()
+        self.assertEqual(viewcounter.spill(), 1)
+        self.assertEqual(viewcounter.pending(), {})
+        self.assertEqual(list(ViewCountDelta.objects.values_list('share_id', 'count')), [(self.a.pk, 1)])
+
+    def test_full_save_keeps_flushed_views(self):
+        stale = Share.objects.get(pk=self.a.pk)
+        viewcounter.record(self.a.pk)
+        viewcounter.record(self.a.pk)
+        viewcounter.spill()
+        viewcounter.flush()
+        stale.title = '改过的标题'
+        stale.save()
+        self.assertEqual(self.views(self.a), 2)
+        self.assertEqual(Share.objects.get(pk=self.a.pk).title, '改过的标题')
+
+    def test_failed_flush_rolls_back(self):
+        viewcounter.record(self.a.pk)
+        viewcounter.record(self.b.pk)
+        viewcounter.spill()
+        original = Share.objects.filter
+
+        def flaky_filter(*args, **kwargs):
+            if kwargs.get('pk') == self.b.pk:
+                raise DatabaseError('disk I/O error')
+            return original(*args, **kwargs)
+
+        with mock.patch.object(Share.objects, 'filter', side_effect=flaky_filter):
+            with self.assertRaises(DatabaseError):
+                viewcounter.flush()
+        self.assertEqual(self.views(self.a), 0)
+        self.assertEqual(ViewCountDelta.objects.count(), 2)
+        viewcounter.flush()
+        self.assertEqual((self.views(self.a), self.views(self.b)), (1, 1))
+
+
+@override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SLOW_MS=0)
+class RequestProfilingTests(TestCase):
+    """请求性能统计中间件"""
+
+    def setUp(self):
+        middleware.reset()
+        self.addCleanup(middleware.reset)
+        Share.objects.create(title='a', strategy_code='x')
+
+    def test_server_timing_header(self):
+        with self.assertLogs('shares.profiling', 'WARNING') as logs:
+            response = self.client.get('/')
+        timing = response['Server-Timing']
+        for metric in ['db;dur=', 'queries"', 'tpl;dur=', 'view;dur=', 'total;dur=']:
+            self.assertIn(metric, timing)
+        self.assertIn('(index)', logs.output[0])
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get('/'))
+
+    def test_staff_stats_endpoint(self):
+        with self.assertLogs('shares.profiling', 'WARNING'):
+            self.client.get('/')
+            self.client.get('/')
+            self.assertEqual(self.client.get('/staff/profiling/').status_code, 302)
+
+            staff = User.objects.create_user('staff', password='pw', is_staff=True)
+            self.client.force_login(staff)
+            stats = self.client.get('/staff/profiling/').json()['views']
+        self.assertEqual(stats['index']['count'], 2)
+        self.assertGreater(stats['index']['avg_queries'], 0)
+        self.assertEqual(sum(stats['index']['histogram'].values()), 2)
+
+
+class PageCacheTests(TestCase):
+    """匿名访问整页缓存"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        self.author = User.objects.create_user('author', password='pw')
+        self.share = Share.objects.create(title='第一个', strategy_code='x', author=self.author)
+
+    def get(self, url='/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_hit_and_query_params(self):
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, self.share.share_id)
+        # 不参与缓存键的参数被忽略，参与的参数各自缓存
+        self.assertEqual(self.get(utm='x')['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.get(category='combat')['X-Page-Cache'], 'MISS')
+
+    def test_public_share_invalidates_index(self):
+        self.get()
+        Share.objects.create(title='私有', strategy_code='x', visibility=Share.Visibility.PRIVATE)
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+
+        new = Share.objects.create(title='第二个', strategy_code='x')
+        response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, new.share_id)
+
+        # 下架也会使主页失效
+        self.share.status = Share.Status.REJECTED
+        self.share.save()
+        self.assertNotContains(self.get(), self.share.share_id)
+
+    def test_stale_while_revalidate(self):
+        self.get()
+        Share.objects.create(title='第二个', strategy_code='x')
+        # 模拟另一个请求正在重建
+        with mock.patch.object(django_cache, 'add', return_value=False):
+            response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'STALE')
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+    @override_settings(PAGE_CACHE_TTL=0)
+    def test_ttl_expiry(self):
+        self.get()
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+    def test_authenticated_bypass(self):
+        self.get()
+        self.client.force_login(self.author)
+        response = self.get()
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_profile_namespace(self):
+        url = '/u/author/'
+        other = User.objects.create_user('other')
+        self.get()
+        self.get(url)
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'HIT')
+
+        # 其他作者的变化不影响本页
+        Collection.objects.create(title='别人的合集', author=other)
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'HIT')
+
+        collection = Collection.objects.create(title='合集', author=self.author)
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'MISS')
+        CollectionItem.objects.create(collection=collection, share=self.share)
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+
+        # 登录时保存资料不失效，修改昵称才失效
+        profile = self.author.profile
+        profile.save()
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'HIT')
+        profile.nickname = '新昵称'
+        profile.save()
+        self.assertContains(self.get(url), '新昵称')
+
+    def test_thumbnail_invalidates(self):
+        self.get()
+        cache.shares_changed([self.share.pk])
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+
+    def test_deploy_check_rejects_local_cache(self):
+        self.assertEqual([error.id for error in checks.check_page_cache_backend(None)], ['shares.E001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://x'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(checks.check_page_cache_backend(None), [])
+
+
+class ShareCardCacheTests(TestCase):
+    """分享卡片片段缓存"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        self.author = User.objects.create_user('author', password='pw')
+        self.shares = [
+            Share.objects.create(title=f'卡片 {i}', strategy_code='x', author=self.author) for i in range(3)
+        ]
+        # 登录后不经过整页缓存
+        self.client.force_login(self.author)
+
+    def test_cards_cached_until_edited(self):
+        response = self.client.get('/')
+        self.assertTemplateUsed(response, 'shares/_share_card.html')
+
+        with mock.patch.object(cards.cache, 'get_many', wraps=cards.cache.get_many) as get_many:
+            response = self.client.get('/')
+        self.assertEqual(get_many.call_count, 1)
+        self.assertTemplateNotUsed(response, 'shares/_share_card.html')
+        self.assertContains(response, '卡片 0')
+
+        share = self.shares[0]
+        share.title = '改过的标题'
+        share.save()
+        response = self.client.get('/')
+        self.assertContains(response, '改过的标题')
+        self.assertNotContains(response, '卡片 0')
+        self.assertEqual(len([t for t in response.templates if t.name == 'shares/_share_card.html']), 1)
+
+    def test_fields_outside_updated_at(self):
+        self.client.get('/')
+        Share.objects.filter(pk=self.shares[1].pk).update(views=4321)
+        self.author.profile.nickname = '新昵称'
+        self.author.profile.save()
+        response = self.client.get('/', {'fragment': 1})
+        self.assertContains(response, '4321')
+        self.assertContains(response, '新昵称', count=3)
+
+    def test_views_not_in_key(self):
+        self.client.get('/')
+        Share.objects.filter(pk=self.shares[1].pk).update(views=4321)
+        response = self.client.get('/')
+        # 浏览量变化不换新键，卡片不重新渲染
+        self.assertTemplateNotUsed(response, 'shares/_share_card.html')
+        self.assertContains(response, '4321')
+
+    def test_author_without_profile(self):
+        UserProfile.objects.filter(user=self.author).delete()
+        collection = Collection.objects.create(title='合集', author=self.author, is_public=True)
+        CollectionItem.objects.create(collection=collection, share=self.shares[0], order=0)
+        self.client.logout()
+        for url, params in [
+            ('/', {}), ('/', {'fragment': 1}), ('/search/', {'q': '卡片'}), ('/u/author/', {}),
+            (f'/collections/{collection.id}/', {}),
+        ]:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(self.client.get('/'), 'author')
+
+    def test_profile_and_collection_cards(self):
+        collection = Collection.objects.create(title='合集', author=self.author, is_public=True)
+        for order, share in enumerate(self.shares):
+            CollectionItem.objects.create(collection=collection, share=share, order=order)
+        url = f'/collections/{collection.id}/'
+
+        self.client.get('/u/author/')
+        response = self.client.get('/u/author/')
+        self.assertTemplateNotUsed(response, 'shares/_profile_share_card.html')
+        self.assertContains(response, '卡片 2')
+
+        # 合集作者的卡片带移除表单，不缓存（另有一个拖放排序用的表单）
+        response = self.client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken', count=4)
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, f'?collection_id={collection.id}')
+        response = self.client.get(url)
+        self.assertTemplateNotUsed(response, 'shares/_collection_item_card.html')
+
+
+class CollectionDetailTests(TestCase):
+    """合集详情页在 SQL 中按访客过滤可见性并分页"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.other = User.objects.create_user('other', password='pw')
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.collection = Collection.objects.create(title='合集', author=self.owner)
+        self.visible = self.add(3)
+        self.private = self.add(1, author=self.owner, visibility=Share.Visibility.PRIVATE)[0]
+        self.pending = self.add(1, author=self.other, status=Share.Status.PENDING)[0]
+
+    def add(self, count, **fields):
+        shares = []
+        for _ in range(count):
+            share = Share.objects.create(title='分享', strategy_code='x', **fields)
+            order = CollectionItem.objects.filter(collection=self.collection).count() + 1
+            CollectionItem.objects.create(collection=self.collection, share=share, order=order)
+            shares.append(share)
+        return shares
+
+    def listed(self, user=None, url=None):
+        if user:
+            self.client.force_login(user)
+        response = self.client.get(url or f'/collections/{self.collection.id}/')
+        return response, [item.share.pk for item in response.context['items']]
+
+    def test_visibility_per_viewer(self):
+        public = [share.pk for share in self.visible]
+        self.assertEqual(self.listed()[1], public)
+        self.assertEqual(self.listed(self.owner)[1], public + [self.private.pk])
+        self.assertEqual(self.listed(self.other)[1], public + [self.pending.pk])
+        self.assertEqual(self.listed(self.staff)[1], public + [self.private.pk, self.pending.pk])
+
+    def test_visible_to_matches_filter(self):
+        self.assertEqual(Share.objects.visible_to(AnonymousUser()).count(), 3)
+        self.assertEqual(Share.objects.visible_to(self.owner).count(), 4)
+        self.assertEqual(Share.objects.visible_to(self.staff).count(), 5)
+
+    def test_paginates_with_absolute_positions(self):
+        self.add(12)
+        response, first = self.listed()
+        self.assertEqual(len(first), 12)
+        self.assertContains(response, '<span class="badge bg-secondary me-1">12</span>', html=False)
+        next_url = response.context['items'].next_url
+
+        response, second = self.listed(url=f'/collections/{self.collection.id}/{next_url}')
+        self.assertEqual(len(second), 3)
+        self.assertFalse(set(first) & set(second))
+        self.assertContains(response, '<span class="badge bg-secondary me-1">13</span>', html=False)
+
+
+class CollectionOrderingTests(TestCase):
+    """合集内容的稀疏排序键、拖放排序和批量加入"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.collection = Collection.objects.create(title='合集', author=self.owner)
+        self.shares = [
+            Share.objects.create(title=f'分享 {i}', strategy_code='x', author=self.owner) for i in range(4)
+        ]
+        self.ids = [share.share_id for share in self.shares]
+        self.client.force_login(self.owner)
+
+    def add_all(self):
+        return self.client.post('/collections/add-shares/', {
+            'collection_id': self.collection.id, 'share_ids': self.ids,
+        })
+
+    def current(self):
+        return list(
+            CollectionItem.objects.filter(collection=self.collection)
+            .order_by('order', 'added_at', 'id').values_list('share__share_id', flat=True)
+        )
+
+    def reorder(self, share_ids, **anchor):
+        return self.client.post(f'/collections/{self.collection.id}/reorder/', {'share_ids': share_ids, **anchor})
+
+    def test_bulk_add(self):
+        other = Share.objects.create(title='别人的', strategy_code='x')
+        CollectionItem.objects.create(collection=self.collection, share=self.shares[1], order=5)
+        response = self.client.post('/collections/add-shares/', {
+            'collection_id': self.collection.id, 'share_ids': [self.ids[2], self.ids[1], self.ids[0], other.share_id],
+        })
+        self.assertRedirects(response, f'/collections/{self.collection.id}/')
+        self.assertEqual(self.current(), [self.ids[1], self.ids[2], self.ids[0]])
+        self.assertEqual(
+            list(CollectionItem.objects.filter(collection=self.collection).order_by('order').values_list('order', flat=True)),
+            [5, 5 + ordering.ORDER_GAP, 5 + 2 * ordering.ORDER_GAP],
+        )
+        self.assertEqual(Collection.objects.get(pk=self.collection.pk).item_count, 3)
+
+    def test_add_one_computes_key_under_lock(self):
+        CollectionItem.objects.create(collection=self.collection, share=self.shares[0], order=7)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/share/{self.ids[1]}/add-to-collection/', {'collection_id': self.collection.id},
+            )
+        self.assertRedirects(response, f'/s/{self.ids[1]}', fetch_redirect_response=False)
+        self.assertEqual(
+            CollectionItem.objects.get(collection=self.collection, share=self.shares[1]).order,
+            7 + ordering.ORDER_GAP,
+        )
+        sql = [q['sql'] for q in queries.captured_queries]
+        lock = next(i for i, q in enumerate(sql) if q.startswith('UPDATE "shares_collection"'))
+        read = next(i for i, q in enumerate(sql) if 'ORDER BY "shares_collectionitem"."order" DESC' in q)
+        self.assertLess(lock, read)
+        self.assertEqual(Collection.objects.get(pk=self.collection.pk).item_count, 2)
+
+    def test_migration_respaces_dense_orders(self):
+        respace = import_module('shares.migrations.0026_respace_collection_item_order').respace_orders
+        for order, share in enumerate(self.shares, 1):
+            CollectionItem.objects.create(collection=self.collection, share=share, order=order % 4)
+        respace(django_apps, mock.Mock(connection=connection))
+        orders = CollectionItem.objects.filter(collection=self.collection).order_by('order')
+        self.assertEqual(
+            list(orders.values_list('share__share_id', 'order')),
+            [(self.ids[3], ordering.ORDER_GAP)] + [(self.ids[i], ordering.ORDER_GAP * (i + 2)) for i in range(3)],
+        )
+
+    def test_move_one_item_rewrites_one_row(self):
+        self.add_all()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reorder([self.ids[3]], after=self.ids[0])
+        self.assertEqual(response.json(), {'updated': 1})
+        self.assertEqual(self.current(), [self.ids[0], self.ids[3], self.ids[1], self.ids[2]])
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "shares_collectionitem"')]
+        self.assertEqual(len(writes), 1)
+
+        self.reorder([self.ids[2]], before=self.ids[0])
+        self.assertEqual(self.current(), [self.ids[2], self.ids[0], self.ids[3], self.ids[1]])
+
+    def test_full_reorder(self):
+        self.add_all()
+        self.reorder(list(reversed(self.ids)))
+        self.assertEqual(self.current(), list(reversed(self.ids)))
+
+    def test_rebalances_when_gap_is_exhausted(self):
+        for order, share in enumerate(self.shares, 1):
+            CollectionItem.objects.create(collection=self.collection, share=share, order=order)
+        response = self.reorder([self.ids[3], self.ids[2]], after=self.ids[0])
+        self.assertEqual(response.json(), {'updated': 4})
+        self.assertEqual(self.current(), [self.ids[0], self.ids[3], self.ids[2], self.ids[1]])
+        orders = CollectionItem.objects.filter(collection=self.collection).order_by('order').values_list('order', flat=True)
+        self.assertEqual(list(orders), [ordering.ORDER_GAP * i for i in range(1, 5)])
+
+    def test_invalid_requests(self):
+        self.add_all()
+        self.assertEqual(self.reorder([self.ids[0]], after=self.ids[0]).status_code, 400)
+        self.assertEqual(self.reorder(['nope']).status_code, 400)
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self.reorder([self.ids[0]]).status_code, 404)
+
+
+class SqliteProfileTests(TransactionTestCase):
+    """SQLite 连接初始化和串行写入重试"""
+
+    def test_connection_pragmas(self):
+        self.assertEqual(sqlite.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(sqlite.pragma('busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(sqlite.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+
+    @override_settings(SQLITE_WRITE_BACKOFF=0)
+    def test_write_retries_lock_errors(self):
+        attempts = []
+
+        def work():
+            attempts.append(connection.in_atomic_block)
+            if len(attempts) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        self.assertEqual(sqlite.write(work), 'ok')
+        self.assertEqual(attempts, [True, True, True])
+
+    @override_settings(SQLITE_WRITE_BACKOFF=0, SQLITE_WRITE_RETRIES=1)
+    def test_write_gives_up(self):
+        work = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            sqlite.write(work)
+        self.assertEqual(work.call_count, 2)
+
+        work = mock.Mock(side_effect=OperationalError('no such table: nope'))
+        with self.assertRaises(OperationalError):
+            sqlite.write(work)
+        self.assertEqual(work.call_count, 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_test', 'replica_broken'])
+class ReplicaRoutingTests(TestCase):
+    """只读视图从副本读取，写入后读主库，副本出错时回退到主库"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tempdir = tempfile.mkdtemp()
+        for alias in ('replica_test', 'replica_broken'):
+            path = os.path.join(cls.tempdir, f'{alias}.sqlite3')
+            connections.settings[alias] = {**connections.settings['default'], 'NAME': path}
+        # 正常的副本有完整的表结构和一条只存在于副本中的分享；损坏的副本是空文件
+        call_command('migrate', database='replica_test', verbosity=0)
+        Share.objects.using('replica_test').bulk_create([
+            Share(share_id='replica1', title='副本中的分享', strategy_code='x'),
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in ('replica_test', 'replica_broken'):
+            connections[alias].close()
+            del connections.settings[alias]
+        shutil.rmtree(cls.tempdir)
+        super().tearDownClass()
+
+    def setUp(self):
+        django_cache.clear()
+        replicas.reset()
+        self.addCleanup(replicas.reset)
+        Share.objects.create(title='主库中的分享', strategy_code='x')
+
+    def test_reads_from_replica(self):
+        replicas.mark_down('replica_broken')
+        response = self.client.get('/')
+        self.assertContains(response, '副本中的分享')
+        self.assertNotContains(response, '主库中的分享')
+
+    def test_user_loaded_from_primary(self):
+        replicas.mark_down('replica_broken')
+        user = User.objects.create_user('author', password='pw')
+        # 副本中有同一用户的私有分享，但还没有刚创建的会话
+        User.objects.using('replica_test').bulk_create([User(pk=user.pk, username='author')])
+        Share.objects.using('replica_test').bulk_create([
+            Share(share_id='private1', title='私有', strategy_code='x', author_id=user.pk, visibility='private'),
+        ])
+        self.client.force_login(user)
+        self.async_client.force_login(user)
+        for get in (self.client.get, self.async_get):
+            with self.subTest(get=get):
+                self.assertRedirects(
+                    get('/search/', {'q': 'private1'}), '/s/private1', fetch_redirect_response=False,
+                )
+
+    def async_get(self, *args, **kwargs):
+        with override_settings(ROOT_URLCONF='ffxivshare.urls_asgi'):
+            return async_to_sync(self.async_client.get)(*args, **kwargs)
+
+    def test_pinned_to_primary_after_write(self):
+        replicas.mark_down('replica_broken')
+        response = self.client.post('/login/', {'username': 'nobody', 'password': 'wrong'})
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        response = self.client.get('/')
+        self.assertContains(response, '主库中的分享')
+
+    def test_falls_back_to_primary(self):
+        replicas.mark_down('replica_test')
+        with self.assertLogs('shares.replicas', 'ERROR'):
+            response = self.client.get('/')
+        self.assertContains(response, '主库中的分享')
+        self.assertEqual(replicas.healthy_replicas(), [])
+
+    def test_writes_never_go_to_replica(self):
+        share = Share.objects.using('replica_test').get(share_id='replica1')
+        self.assertEqual(router.db_for_write(Share, instance=share), 'default')
+        self.assertIsNone(replicas.ReplicaRouter().db_for_read(Share))
+
+
+@override_settings(PAGE_CACHE_HTTP_MAX_AGE=30)
+class AnonymousFastPathTests(TestCase):
+    """没有会话 Cookie 的匿名读请求不访问会话，可被共享缓存缓存"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.author = User.objects.create_user('author', password='pw')
+        self.share = Share.objects.create(title='公开', strategy_code='x', author=self.author)
+        self.private = Share.objects.create(
+            title='私有', strategy_code='x', author=self.author, visibility=Share.Visibility.PRIVATE,
+        )
+        self.collection = Collection.objects.create(title='合集', author=self.author)
+
+    def assertShared(self, response, shared=True):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+        self.assertEqual('public' in response.get('Cache-Control', ''), shared)
+
+    def test_guest_reads_skip_session(self):
+        for url in ['/', '/', '/u/author/', f'/collections/{self.collection.id}/', '/search/?q=公开']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertShared(response)
+                self.assertIn('max-age=30', response['Cache-Control'])
+                self.assertFalse(response.cookies)
+                request = response.wsgi_request
+                self.assertTrue(request.guest_fast_path)
+                self.assertFalse(request.session.accessed)
+                self.assertIsInstance(request.user, AnonymousUser)
+
+        # 详情页需要计数，不允许共享缓存
+        self.assertShared(self.client.get(self.share.get_absolute_url()), shared=False)
+
+    def test_messages_still_delivered(self):
+        response = self.client.get(self.private.get_absolute_url())
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertIn('messages', response.cookies)
+
+        response = self.client.get('/')
+        self.assertContains(response, '该分享不存在或您没有权限访问')
+        self.assertShared(response, shared=False)
+        self.assertEqual(response.cookies['messages']['max-age'], 0)
+        self.assertFalse(response.wsgi_request.session.accessed)
+
+    def test_session_cookie_takes_full_path(self):
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'x' * 32
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertEqual(sum('django_session' in query['sql'] for query in queries), 1)
+        self.assertShared(response, shared=False)
+        self.assertEqual(response.cookies[settings.SESSION_COOKIE_NAME].value, '')
+
+        self.client.force_login(self.author)
+        response = self.client.get('/')
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        self.assertShared(response, shared=False)
+
+    @override_settings(ANONYMOUS_FAST_PATH=False)
+    def test_disabled(self):
+        response = self.client.get('/')
+        self.assertShared(response, shared=False)
+        self.assertFalse(hasattr(response.wsgi_request, 'guest_fast_path'))
+        self.assertTrue(response.wsgi_request.session.accessed)
+
+
+@override_settings(
+    ROOT_URLCONF='ffxivshare.urls_asgi', VIEW_COUNTER_SPILL_INTERVAL=3600, VIEW_COUNTER_SPILL_THRESHOLD=1000,
+)
+class AsyncViewTests(TestCase):
+    """ASGI 入口使用的异步视图与同步版本结果相同"""
+
+    def setUp(self):
+        django_cache.clear()
+        viewcounter.discard()
+        self.addCleanup(viewcounter.discard)
+        self.author = User.objects.create_user('author', password='pw')
+        self.shares = [
+            Share.objects.create(title=f'分享{i}', strategy_code='x', author=self.author) for i in range(3)
+        ]
+        self.private = Share.objects.create(
+            title='私有', strategy_code='x', author=self.author, visibility=Share.Visibility.PRIVATE,
+        )
+        self.collection = Collection.objects.create(title='合集', author=self.author, is_public=False)
+        for order, share in enumerate(self.shares + [self.private]):
+            CollectionItem.objects.create(collection=self.collection, share=share, order=order)
+
+    def aget(self, url, **params):
+        return async_to_sync(self.async_client.get)(url, params)
+
+    def sync_get(self, url, **params):
+        django_cache.clear()
+        with override_settings(ROOT_URLCONF='ffxivshare.urls'):
+            return self.client.get(url, params)
+
+    def listed(self, response, key='shares'):
+        return [getattr(obj, 'share', obj).pk for obj in response.context[key]]
+
+    def test_list_pages_match_sync_views(self):
+        for url, params in [('/', {}), ('/', {'category': 'combat'}), ('/u/author/', {}), ('/search/', {'q': '分享'})]:
+            with self.subTest(url=url, params=params):
+                django_cache.clear()
+                response = self.aget(url, **params)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+                self.assertEqual(self.listed(response), self.listed(self.sync_get(url, **params)))
+
+    def test_page_cache_shared_with_sync_views(self):
+        self.assertEqual(self.aget('/')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.aget('/')['X-Page-Cache'], 'HIT')
+        with override_settings(ROOT_URLCONF='ffxivshare.urls'):
+            self.assertEqual(self.client.get('/')['X-Page-Cache'], 'HIT')
+
+        response = self.aget('/', fragment='1')
+        self.assertTemplateUsed(response, 'shares/_share_cards.html')
+        self.assertIn('X-Next-Page', response)
+
+    def test_share_detail_counts_view_once(self):
+        share = self.shares[0]
+        response = self.aget(share.get_absolute_url())
+        self.assertEqual(response.context['share'].views, 1)
+        self.assertIn(viewdedup.COOKIE_NAME, response.cookies)
+        self.aget(share.get_absolute_url())
+        self.assertEqual(viewcounter.pending(), {share.pk: 1})
+
+        self.assertRedirects(self.aget(self.private.get_absolute_url()), '/', fetch_redirect_response=False)
+        self.assertEqual(self.aget('/s/missing/').status_code, 404)
+
+    def test_search_redirects_to_share_id(self):
+        self.assertRedirects(
+            self.aget('/search/', q=self.shares[1].share_id), self.shares[1].get_absolute_url(),
+            fetch_redirect_response=False,
+        )
+        # 私有分享不能通过 ID 搜索直接打开
+        response = self.aget('/search/', q=self.private.share_id)
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_and_collection_visibility(self):
+        self.assertEqual(self.aget('/u/nobody/').status_code, 404)
+        url = f'/collections/{self.collection.id}/'
+        self.assertRedirects(self.aget(url), '/', fetch_redirect_response=False)
+
+        self.async_client.force_login(self.author)
+        response = self.aget(url)
+        self.assertEqual(self.listed(response, 'items'), [share.pk for share in self.shares + [self.private]])
+        self.assertNotIn('X-Page-Cache', self.aget('/'))
+
+
+class ListColumnsTests(TestCase):
+    """列表查询不加载分享码和完整描述，分享码按需获取"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        self.author = User.objects.create_user('author', password='pw')
+        self.share = Share.objects.create(
+            title='公开', strategy_code=CODE_DEMO, author=self.author,
+            description='<p>' + '很长的描述' * 200 + '</p>',
+        )
+        self.private = Share.objects.create(
+            title='私有', strategy_code=CODE_TEST4, author=self.author, visibility=Share.Visibility.PRIVATE,
+        )
+
+    def test_list_queries_skip_heavy_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        sql = next(q['sql'] for q in queries if 'shares_share' in q['sql'])
+        self.assertNotIn('"shares_share"."strategy_code"', sql)
+        self.assertNotIn(CODE_DEMO, response.content.decode())
+        self.assertContains(response, f'/share/{self.share.share_id}/code/')
+        self.assertContains(response, '很长的描述')
+
+    def test_description_preview_drops_cut_tag(self):
+        share = Share(description='<p>正文</p><a href="http://exa')
+        share.description_excerpt = share.description
+        self.assertEqual(share.description_preview, '正文')
+        self.assertEqual(Share(description='<b>完整</b>').description_preview, '完整')
+
+    def test_share_code_endpoint(self):
+        response = self.client.get(f'/share/{self.share.share_id}/code/')
+        self.assertEqual(response.content.decode(), CODE_DEMO)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+
+        self.assertEqual(self.client.get(f'/share/{self.private.share_id}/code/').status_code, 404)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(f'/share/{self.private.share_id}/code/').content.decode(), CODE_TEST4)
+
+    def test_share_preview_redirect(self):
+        response = self.client.get(f'/share/{self.share.share_id}/preview/')
+        self.assertRedirects(
+            response, f'/static/viewer_new/index.html#{CODE_DEMO}', fetch_redirect_response=False
+        )
+        self.assertEqual(self.client.get(f'/share/{self.private.share_id}/preview/').status_code, 404)
+
+
+class BulkModerationTests(TestCase):
+    """批量审核"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.author = User.objects.create_user('author', password='pw')
+        self.pending = [
+            Share.objects.create(title=f'待审 {i}', strategy_code='x', author=self.author, status=Share.Status.PENDING)
+            for i in range(5)
+        ]
+        self.client.force_login(self.staff)
+
+    def post(self, action, shares, **headers):
+        return self.client.post('/staff/reviews/bulk/', {
+            'action': action, 'share_ids': [share.share_id for share in shares],
+        }, **headers)
+
+    def test_approve_with_single_update(self):
+        approved = Share.objects.create(title='已通过', strategy_code='x', author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('approve', self.pending[:3] + [approved], HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'action': 'approve', 'updated': 3})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "shares_share"')]), 1)
+        self.assertEqual(Share.objects.filter(status=Share.Status.PENDING).count(), 2)
+
+    def test_reject_makes_private(self):
+        response = self.post('reject', self.pending[:2])
+        self.assertRedirects(response, '/staff/reviews/')
+        rejected = Share.objects.filter(status=Share.Status.REJECTED)
+        self.assertEqual(rejected.count(), 2)
+        self.assertFalse(rejected.exclude(visibility=Share.Visibility.PRIVATE).exists())
+
+    def test_invalidates_page_cache(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'HIT')
+        self.client.force_login(self.staff)
+        self.post('approve', self.pending[:1])
+        self.client.logout()
+        response = self.client.get('/')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, '待审 0')
+
+    def test_invalid_action_and_permissions(self):
+        response = self.post('delete', self.pending, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(self.author)
+        self.post('approve', self.pending)
+        self.assertEqual(Share.objects.filter(status=Share.Status.PENDING).count(), 5)
+
+    def test_prefetch_fragment(self):
+        response = self.client.get('/staff/reviews/', {'fragment': 1, 'limit': 2})
+        self.assertContains(response, 'review-item', count=2)
+        self.assertContains(response, '待审 4')
+        response = self.client.get('/staff/reviews/' + response['X-Next-Page'])
+        self.assertContains(response, '待审 2')
+        self.assertNotContains(response, '待审 4')
+
+
+class PendingReportCountTests(TestCase):
+    """Share.pending_report_count 随举报提交和处理维护"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.reporter = User.objects.create_user('reporter', password='pw')
+        self.share = Share.objects.create(title='被举报', strategy_code='x', author=self.reporter)
+
+    def report(self, times=1):
+        self.client.force_login(self.reporter)
+        for _ in range(times):
+            self.client.post(f'/share/{self.share.share_id}/report/', {'reason': '违规'})
+        self.client.force_login(self.staff)
+
+    def count(self):
+        return Share.objects.values_list('pending_report_count', flat=True).get(pk=self.share.pk)
+
+    def test_report_and_resolve(self):
+        self.report(3)
+        self.assertEqual(self.count(), 3)
+
+        report = Report.objects.first()
+        self.client.get(f'/staff/reports/{report.id}/dismiss/')
+        self.client.get(f'/staff/reports/{report.id}/dismiss/')
+        self.assertEqual(self.count(), 2)
+
+        self.client.get(f'/staff/reports/share/{self.share.share_id}/resolve/')
+        self.assertEqual(self.count(), 0)
+        self.share.refresh_from_db()
+        self.assertEqual(self.share.visibility, Share.Visibility.PRIVATE)
+
+    def test_full_save_keeps_counter(self):
+        stale = Share.objects.get(pk=self.share.pk)
+        self.report(2)
+        stale.title = '改名'
+        stale.save()
+        self.assertEqual(self.count(), 2)
+
+    def test_dashboard_reads_counter(self):
+        self.report(2)
+        other = Share.objects.create(title='未被举报', strategy_code='x')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/staff/reports/')
+        self.assertContains(response, '2 条举报')
+        self.assertNotContains(response, other.title)
+        self.assertFalse([q for q in queries if 'GROUP BY' in q['sql']])
+
+    def test_reconcile_command(self):
+        self.report(2)
+        Share.objects.filter(pk=self.share.pk).update(pending_report_count=7)
+        drifted = Share.objects.create(title='漂移', strategy_code='x', pending_report_count=0)
+        Report.objects.create(share=drifted, reporter=self.reporter, reason='违规')
+
+        out = StringIO()
+        call_command('reconcile_report_counts', '--dry-run', stdout=out)
+        self.assertIn('2 个分享', out.getvalue())
+        self.assertEqual(self.count(), 7)
+
+        call_command('reconcile_report_counts', stdout=StringIO())
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(Share.objects.get(pk=drifted.pk).pending_report_count, 1)
+
+
+# 浏览量按时间间隔写出，测试运行较久时会在计数途中多出一次写入
+@override_settings(VIEW_COUNTER_SPILL_INTERVAL=3600, VIEW_COUNTER_SPILL_THRESHOLD=1000)
+class DenormalizedCounterTests(TestCase):
+    """合集内容数、用户公开分享数和总浏览量的冗余计数"""
+
+    def setUp(self):
+        self.addCleanup(viewcounter.discard)
+        self.author = User.objects.create_user('author', password='pw')
+        self.collection = Collection.objects.create(title='合集', author=self.author)
+
+    def profile(self):
+        return UserProfile.objects.values_list('public_share_count', 'total_views').get(user=self.author)
+
+    def create(self, **fields):
+        fields = {'visibility': Share.Visibility.PUBLIC, 'status': Share.Status.APPROVED, **fields}
+        return Share.objects.create(title='分享', strategy_code='x', author=self.author, **fields)
+
+    def test_collection_item_count(self):
+        shares = [self.create() for _ in range(3)]
+        for share in shares:
+            CollectionItem.objects.create(collection=self.collection, share=share)
+        CollectionItem.objects.filter(share=shares[0]).get().delete()
+        shares[1].delete()
+        self.assertEqual(Collection.objects.get(pk=self.collection.pk).item_count, 1)
+
+    def test_public_share_count_follows_visibility(self):
+        share = self.create()
+        self.create(status=Share.Status.PENDING)
+        self.assertEqual(self.profile(), (1, 0))
+
+        share = Share.objects.get(pk=share.pk)
+        share.visibility = Share.Visibility.PRIVATE
+        share.save()
+        self.assertEqual(self.profile(), (0, 0))
+        share.visibility = Share.Visibility.PUBLIC
+        share.save()
+        share.save()
+        self.assertEqual(self.profile(), (1, 0))
+
+        Share.objects.get(pk=share.pk).delete()
+        self.assertEqual(self.profile(), (0, 0))
+
+    def test_bulk_approve(self):
+        pending = [self.create(status=Share.Status.PENDING) for _ in range(2)]
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.client.post('/staff/reviews/bulk/', {
+            'action': 'approve', 'share_ids': [share.share_id for share in pending],
+        })
+        self.assertEqual(self.profile(), (2, 0))
+
+    def test_flush_adds_views_per_author(self):
+        shares = [self.create() for _ in range(2)]
+        for share in shares * 3:
+            viewcounter.record(share.pk)
+        viewcounter.spill()
+        viewcounter.flush()
+        self.assertEqual(self.profile(), (2, 6))
+
+    def test_stale_profile_save_keeps_counters(self):
+        stale = UserProfile.objects.get(user=self.author)
+        self.create()
+        stale.nickname = '新昵称'
+        stale.save()
+        self.assertEqual(self.profile(), (1, 0))
+
+    def test_recompute_counters(self):
+        share = self.create(views=5)
+        CollectionItem.objects.create(collection=self.collection, share=share)
+        UserProfile.objects.filter(user=self.author).update(public_share_count=9, total_views=0)
+        Collection.objects.filter(pk=self.collection.pk).update(item_count=0)
+
+        out = StringIO()
+        call_command('recompute_counters', '--dry-run', stdout=out)
+        self.assertIn('2 条记录', out.getvalue())
+        self.assertEqual(self.profile(), (9, 0))
+
+        call_command('recompute_counters', stdout=StringIO())
+        self.assertEqual(self.profile(), (1, 5))
+        self.assertEqual(Collection.objects.get(pk=self.collection.pk).item_count, 1)
+
+    def test_profile_page_reads_counters(self):
+        self.create(views=7)
+        UserProfile.objects.filter(user=self.author).update(public_share_count=1, total_views=7)
+        response = self.client.get('/u/author/')
+        self.assertContains(response, 'title="总浏览量"')
+        self.assertEqual(response.context['author'].profile.total_views, 7)
+
+
+@override_settings(VIEW_COUNTER_SPILL_INTERVAL=3600)
+class QueryBudgetTests(TestCase):
+    """列表页的查询次数不随每页条目数增长"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.addCleanup(viewcounter.discard)
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.collection = Collection.objects.create(title='合集', author=self.owner)
+        self.created = 0
+
+    def add_shares(self, count, **fields):
+        for _ in range(count):
+            self.created += 1
+            author = User.objects.create_user(f'author{self.created}')
+            author.profile.nickname = f'昵称{self.created}'
+            author.profile.save()
+            share = Share.objects.create(
+                title=f'分享 {self.created}', strategy_code='x', **{'author': author, **fields}
+            )
+            CollectionItem.objects.create(collection=self.collection, share=share, order=self.created)
+            Report.objects.create(share=share, reporter=self.staff, reason='违规')
+            Report.objects.create(share=share, reporter=self.owner, reason='违规')
+            Share.objects.filter(pk=share.pk).update(pending_report_count=2)
+
+    def count_queries(self, url, user=None):
+        if user:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertQueryBudget(self, url, page_size, budget, user=None, **fields):
+        self.add_shares(1, **fields)
+        one = self.count_queries(url, user)
+        self.add_shares(page_size - 1, **fields)
+        full = self.count_queries(url, user)
+        self.assertEqual(one, full, f'{url}: 1 条 {one} 次查询，{page_size} 条 {full} 次查询')
+        self.assertLessEqual(full, budget, f'{url}: {full} 次查询超出预算 {budget}')
+
+    def test_index(self):
+        self.assertQueryBudget('/', 12, 2)
+
+    def test_search(self):
+        self.assertQueryBudget('/search/?q=分享', 12, 2)
+
+    def test_my_shares(self):
+        self.assertQueryBudget('/my-shares/', 12, 6, user=self.owner, author=self.owner)
+
+    def test_user_public_profile(self):
+        self.assertQueryBudget('/u/owner/', 12, 5, author=self.owner)
+
+    def test_admin_review_list(self):
+        self.assertQueryBudget('/staff/reviews/', 20, 5, user=self.staff, status=Share.Status.PENDING)
+
+    def test_admin_report_list(self):
+        self.assertQueryBudget('/staff/reports/', 10, 6, user=self.staff)
+
+    def test_collection_detail(self):
+        self.assertQueryBudget(f'/collections/{self.collection.id}/', 12, 2)
+
+    def test_share_detail_related_collections(self):
+        self.add_shares(1)
+        share = Share.objects.get()
+        url = share.get_absolute_url()
+        one = self.count_queries(url)
+        for i in range(5):
+            collection = Collection.objects.create(title=f'合集 {i}', author=self.owner)
+            CollectionItem.objects.create(collection=collection, share=share)
+        self.client.cookies.clear()
+        self.assertEqual(self.count_queries(url), one)
@@ -0,0 +1,314 @@
+"""
+战术板缩略图
+
+使用 Pillow 在服务端把分享码渲染成 WebP 缩略图，素材复用 static/viewer/assets，
+绘制规则与 sb_renderer 中的 React 组件保持一致。缩略图按分享码的哈希存放在
+MEDIA_ROOT/thumbnails 下，相同的分享码只渲染一次。
+"""
+import hashlib
+import math
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from . import stgy
+
+
+ASSETS_DIR = settings.BASE_DIR / 'static' / 'viewer' / 'assets'
+THUMBNAIL_DIR = 'thumbnails'
+
+# 游戏内画布尺寸（分享码中的坐标单位）
+BOARD_WIDTH = 512
+BOARD_HEIGHT = 384
+
+BACKGROUND_FILES = {
+    'none': '1', 'checkered': '2', 'checkered_circle': '3', 'checkered_square': '4',
+    'grey': '5', 'grey_circle': '6', 'grey_square': '7',
+}
+
+DEFAULT_AOE_COLOR = '#ff8000'
+DONUT_COLOR = (255, 165, 0)
+
+
+def _sprite_row(sheet, cell, names_and_sizes):
+    """生成等宽精灵图的裁剪配置: name -> (sheet, 裁剪框, 显示尺寸)"""
+    return {
+        name: (sheet, (cell * index, 0, cell * (index + 1), cell), size)
+        for index, (name, size) in enumerate(names_and_sizes)
+    }
+
+
+_TAB1 = [(name, 32) for name in (
+    'tank', 'tank_1', 'tank_2', 'healer', 'healer_1', 'healer_2', 'pure_healer', 'barrier_healer',
+    'dps', 'dps_1', 'dps_2', 'dps_3', 'dps_4', 'melee_dps', 'ranged_dps', 'physical_ranged_dps',
+    'magical_ranged_dps', 'paladin', 'warrior', 'dark_knight', 'gunbreaker', 'white_mage',
+    'scholar', 'astrologian', 'sage', 'monk', 'dragoon', 'ninja', 'samurai', 'reaper', 'viper',
+    'bard', 'machinist', 'dancer', 'black_mage', 'summoner', 'red_mage', 'pictomancer',
+    'blue_mage', 'gladiator', 'marauder', 'conjurer', 'pugilist', 'lancer', 'rogue', 'archer',
+    'thaumaturge', 'arcanist',
+)]
+
+_TAB2 = [
+    ('gaze', 128), ('stack', 128), ('line_stack', 128), ('proximity', 256), ('stack_multi', 128),
+    ('proximity_player', 128), ('tankbuster', 64), ('radial_knockback', 256),
+    ('linear_knockback', 256), ('tower', 64), ('targeting', 64), ('moving_circle_aoe', 128),
+    ('1person_aoe', 64), ('2person_aoe', 64), ('3person_aoe', 64), ('4person_aoe', 64),
+]
+
+# tab3 的格子宽度不一致: (名称, 显示尺寸, 格子宽度)
+_TAB3 = [
+    ('small_enemy', 64, 128), ('medium_enemy', 64, 128), ('large_enemy', 64, 128),
+    ('enhancement', 32, 128), ('enfeeblement', 32, 128),
+] + [(f'attack_{i}', 32, 96) for i in range(1, 6)] + [
+    ('attack_6', 32, 96), ('attack_7', 32, 96), ('attack_8', 32, 96),
+    ('bind_1', 32, 96), ('bind_2', 32, 96), ('bind_3', 32, 96), ('ignore_1', 32, 96),
+    ('ignore_2', 32, 96), ('square_marker', 32, 96), ('circle_marker', 32, 96),
+    ('plus_marker', 32, 96), ('triangle_marker', 32, 96),
+] + [(name, 48, 96) for name in (
+    'waymark_a', 'waymark_b', 'waymark_c', 'waymark_d', 'waymark_1', 'waymark_2', 'waymark_3',
+    'waymark_4', 'lockon_red', 'lockon_blue', 'lockon_purple', 'lockon_green',
+)]
+
+_TAB4 = [(name, 48) for name in (
+    'shape_circle', 'shape_x', 'shape_triangle', 'shape_square', 'up_arrow', 'rotate',
+    'highlighted_circle', 'highlighted_x', 'highlighted_square', 'highlighted_triangle',
+    'rotate_clockwise', 'rotate_counterclockwise',
+)]
+
+_TAB5 = [(name, 256) for name in ('checkered_circle', 'checkered_square', 'grey_circle', 'grey_square')]
+
+
+def _build_icon_map():
+    icons = {}
+    icons.update(_sprite_row('tab1', 128, _TAB1))
+    icons.update(_sprite_row('tab2', 512, _TAB2))
+    left = 0
+    for name, size, cell in _TAB3:
+        icons[name] = ('tab3', (left, 0, left + cell, cell), size)
+        left += cell
+    icons.update(_sprite_row('tab4', 96, _TAB4))
+    icons.update(_sprite_row('tab5', 512, _TAB5))
+    return icons
+
+
+ICON_MAP = _build_icon_map()
+
+
+# 分享码无法解码时记录的缩略图键：没有缩略图，但已与当前分享码对应，不会再次入队
+INVALID_PREFIX = 'invalid:'
+
+
+def code_hash(code):
+    """分享码的哈希，用作缩略图文件名"""
+    return hashlib.sha1(code.strip().encode('utf-8')).hexdigest()
+
+
+def is_current(key, code):
+    """缩略图键是否对应当前分享码（包括已确认无法解码的分享码）"""
+    expected = code_hash(code)
+    return key == expected or key == INVALID_PREFIX + expected
+
+
+def thumbnail_path(key):
+    return f'{THUMBNAIL_DIR}/{key[:2]}/{key}.webp'
+
+
+def thumbnail_size():
+    return tuple(getattr(settings, 'SHARE_THUMBNAIL_SIZE', (400, 300)))
+
+
+@lru_cache(maxsize=None)
+def _load_asset(kind, name):
+    with Image.open(ASSETS_DIR / kind / f'{name}.webp') as image:
+        return image.convert('RGBA' if kind == 'objects' else 'RGB')
+
+
+@lru_cache(maxsize=32)
+def _background(name, size):
+    image = _load_asset('background', BACKGROUND_FILES.get(name, '1'))
+    return image.resize(size, Image.LANCZOS).convert('RGBA')
+
+
+@lru_cache(maxsize=256)
+def _icon(type_name, pixels):
+    """裁剪并缩放精灵图中的单个图标"""
+    sheet, box, _ = ICON_MAP[type_name]
+    return _load_asset('objects', sheet).crop(box).resize((pixels, pixels), Image.LANCZOS)
+
+
+@lru_cache(maxsize=64)
+def _aoe_sector(pixels, arc_angle):
+    """圆形/扇形 AOE 贴图，扇形时裁剪到扇区包围盒"""
+    image = _load_asset('objects', 'circle_aoe').resize((pixels, pixels), Image.LANCZOS)
+    if arc_angle >= 360:
+        return image
+    mask = Image.new('L', image.size, 0)
+    ImageDraw.Draw(mask).pieslice((0, 0, pixels - 1, pixels - 1), -90, -90 + arc_angle, fill=255)
+    sector = Image.new('RGBA', image.size, (0, 0, 0, 0))
+    sector.paste(image, (0, 0), mask)
+    return sector.crop(mask.getbbox())
+
+
+@lru_cache(maxsize=1)
+def _font(size):
+    path = getattr(settings, 'SHARE_THUMBNAIL_FONT', None)
+    if path:
+        return ImageFont.truetype(str(path), size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def _hex_to_rgb(color):
+    color = (color or DEFAULT_AOE_COLOR).lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _opacity(obj):
+    return (100 - (obj.transparency or 0)) / 100
+
+
+def _paste(canvas, sprite, cx, cy, obj, angle=None):
+    """按对象的翻转/旋转/透明度把贴图以 (cx, cy) 为中心合成到画布上"""
+    if obj.horizontal_flip:
+        sprite = ImageOps.mirror(sprite)
+    if obj.vertical_flip:
+        sprite = ImageOps.flip(sprite)
+    angle = obj.angle if angle is None else angle
+    if angle:
+        # Konva 的旋转方向为顺时针，Pillow 为逆时针
+        sprite = sprite.rotate(-angle, resample=Image.BICUBIC, expand=True)
+    opacity = _opacity(obj)
+    if opacity < 1:
+        sprite = sprite.copy()
+        sprite.putalpha(sprite.getchannel('A').point(lambda a: int(a * opacity)))
+    left = int(round(cx - sprite.width / 2))
+    top = int(round(cy - sprite.height / 2))
+    layer = Image.new('RGBA', canvas.size, (0, 0, 0, 0))
+    layer.paste(sprite, (left, top))
+    canvas.alpha_composite(layer)
+
+
+def _draw_icon(canvas, obj, scale):
+    config = ICON_MAP.get(obj.type)
+    if not config:
+        return
+    pixels = max(1, int(round(config[2] * obj.size / 100 * scale)))
+    _paste(canvas, _icon(obj.type, pixels), obj.x * scale, obj.y * scale, obj)
+
+
+def _draw_circle_aoe(canvas, obj, scale):
+    pixels = max(1, int(round(BOARD_WIDTH * obj.size / 100 * scale)))
+    arc_angle = (obj.arc_angle or 90) if obj.type_id == stgy.TYPE_FAN_AOE else 360
+    _paste(canvas, _aoe_sector(pixels, arc_angle), obj.x * scale, obj.y * scale, obj)
+
+
+def _draw_donut(canvas, obj, scale):
+    ratio = obj.size / 100 * scale
+    outer = max(1, int(round(BOARD_WIDTH / 2 * ratio)))
+    inner = int(round((obj.donut_radius or 0) * ratio))
+    arc_angle = obj.arc_angle or 360
+    mask = Image.new('L', (outer * 2, outer * 2), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.pieslice((0, 0, outer * 2 - 1, outer * 2 - 1), -90, -90 + arc_angle, fill=255)
+    if inner > 0:
+        draw.ellipse((outer - inner, outer - inner, outer + inner, outer + inner), fill=0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return
+    sprite = Image.new('RGBA', mask.size, DONUT_COLOR + (0,))
+    sprite.putalpha(mask)
+    _paste(canvas, sprite.crop(bbox), obj.x * scale, (obj.y - 5) * scale, obj)
+
+
+def _draw_line_aoe(canvas, obj, scale):
+    ratio = obj.size / 100 * scale
+    width = max(1, int(round((obj.width or 128) * ratio)))
+    height = max(1, int(round((obj.height or 128) * ratio)))
+    sprite = Image.new('RGBA', (width, height), _hex_to_rgb(obj.color) + (255,))
+    _paste(canvas, sprite, obj.x * scale, obj.y * scale, obj)
+
+
+def _draw_line(canvas, obj, scale):
+    opacity = int(255 * _opacity(obj))
+    end_x = obj.x if obj.end_x is None else obj.end_x
+    end_y = obj.y if obj.end_y is None else obj.end_y
+    layer = Image.new('RGBA', canvas.size, (0, 0, 0, 0))
+    ImageDraw.Draw(layer).line(
+        (obj.x * scale, obj.y * scale, end_x * scale, end_y * scale),
+        fill=_hex_to_rgb(obj.color) + (opacity,),
+        width=max(1, int(round((obj.height or 6) * scale))),
+    )
+    canvas.alpha_composite(layer)
+
+
+def _draw_text(canvas, obj, scale):
+    if not obj.text:
+        return
+    font = _font(max(8, int(round(14 * scale))))
+    draw = ImageDraw.Draw(canvas)
+    x, y = obj.x * scale, obj.y * scale
+    # 预览器的文字带有向右下偏移的黑色阴影
+    shadow = max(1, int(round(scale)))
+    draw.text((x + shadow, y + shadow), obj.text, font=font, anchor='mm', fill=(0, 0, 0))
+    draw.text((x, y), obj.text, font=font, anchor='mm', fill=_hex_to_rgb(obj.color or '#ffffff'))
+
+
+_DRAWERS = {
+    stgy.TYPE_CIRCLE_AOE: _draw_circle_aoe,
+    stgy.TYPE_FAN_AOE: _draw_circle_aoe,
+    stgy.TYPE_DONUT: _draw_donut,
+    stgy.TYPE_LINE_AOE: _draw_line_aoe,
+    stgy.TYPE_LINE: _draw_line,
+    stgy.TYPE_TEXT: _draw_text,
+}
+
+
+def render_board(board, size=None):
+    """把 StrategyBoard 渲染为 RGB 图像"""
+    size = size or thumbnail_size()
+    scale = min(size[0] / BOARD_WIDTH, size[1] / BOARD_HEIGHT)
+    canvas = _background(board.background, size).copy()
+    # 与预览器一致：列表靠前的对象绘制在上层
+    for obj in reversed(board.objects):
+        if obj.hidden:
+            continue
+        _DRAWERS.get(obj.type_id, _draw_icon)(canvas, obj, scale)
+    return canvas.convert('RGB')
+
+
+def render_thumbnail(code, size=None, quality=80):
+    """渲染分享码，返回 WebP 字节；分享码无法解码时抛出 StrategyCodeError"""
+    image = render_board(stgy.decode(code.strip()), size)
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def ensure_thumbnail(code):
+    """
+    确保分享码对应的缩略图已存在，返回缩略图的哈希键
+
+    文件以分享码哈希命名，已存在时直接复用；分享码无法解码时返回带 INVALID_PREFIX 的哈希。
+    """
+    key = code_hash(code)
+    path = thumbnail_path(key)
+    if default_storage.exists(path):
+        return key
+    try:
+        data = render_thumbnail(code)
+    except stgy.StrategyCodeError:
+        return INVALID_PREFIX + key
+    default_storage.save(path, ContentFile(data))
+    return key
+
+
+def thumbnail_url(key):
+    if not key or key.startswith(INVALID_PREFIX):
+        return ''
+    return default_storage.url(thumbnail_path(key))
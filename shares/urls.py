@@ -10,6 +10,8 @@ urlpatterns = [
     path('create/', views.create_share, name='create_share'),
     path('share/<str:share_id>/edit/', views.edit_share, name='edit_share'),
     path('share/<str:share_id>/delete/', views.delete_share, name='delete_share'),
+    path('share/<str:share_id>/code/', views.share_code, name='share_code'),
+    path('share/<str:share_id>/preview/', views.share_preview, name='share_preview'),
     path('my-shares/', views.my_shares, name='my_shares'),
     path('search/', views.search, name='search'),
     
@@ -30,9 +32,13 @@ urlpatterns = [
     
     # 管理员审核 (使用 staff 前缀避免与 Django Admin 冲突)
     path('staff/reviews/', views.admin_review_list, name='admin_review_list'),
+    path('staff/reviews/bulk/', views.admin_bulk_moderate, name='admin_bulk_moderate'),
     path('staff/reviews/<str:share_id>/approve/', views.admin_approve_share, name='admin_approve_share'),
     path('staff/reviews/<str:share_id>/reject/', views.admin_reject_share, name='admin_reject_share'),
     
+    # 性能统计
+    path('staff/profiling/', views.admin_profiling_stats, name='admin_profiling_stats'),
+    
     # 举报处理
     path('share/<str:share_id>/report/', views.report_share, name='report_share'),
     path('staff/reports/', views.admin_report_list, name='admin_report_list'),
@@ -46,4 +52,6 @@ urlpatterns = [
     path('collections/<int:collection_id>/delete/', views.delete_collection, name='delete_collection'),
     path('share/<str:share_id>/add-to-collection/', views.add_share_to_collection, name='add_share_to_collection'),
     path('collections/<int:collection_id>/remove-share/<str:share_id>/', views.remove_share_from_collection, name='remove_share_from_collection'),
+    path('collections/<int:collection_id>/reorder/', views.reorder_collection, name='reorder_collection'),
+    path('collections/add-shares/', views.bulk_add_to_collection, name='bulk_add_to_collection'),
 ]
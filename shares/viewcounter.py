@@ -0,0 +1,145 @@
+"""
+浏览量缓冲计数
+
+详情页每次新浏览都写一次 Share.views 会在 SQLite 上为每个页面浏览争抢写锁。这里分两级缓冲：
+
+1. 进程内：record() 只在内存中累加，不访问数据库
+2. 跨进程：累计到 VIEW_COUNTER_SPILL_THRESHOLD 次或距上次写出超过
+   VIEW_COUNTER_SPILL_INTERVAL 秒时，spill() 把本进程的计数一次性插入 ViewCountDelta 表；
+   进程正常退出时也会写出
+
+   这两个条件只在 record() 中检查。服务进程（wsgi.py / asgi.py）调用 enable_timer()，
+   有计数未写出时另起一个后台定时器，最迟 VIEW_COUNTER_SPILL_INTERVAL 秒后写出，
+   访问量很低的进程不会把计数一直留在内存中；管理命令和测试中不启用，只由 record() 和退出时写出
+
+``manage.py flush_view_counts`` 在一个事务中按分享汇总增量表，每个分享执行一条
+``UPDATE ... SET views = views + n``，再按作者汇总累加到 UserProfile.total_views，
+最后删除已合并的增量，中途失败会整体回滚，不会丢失或重复计数。
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import F, Max, Sum
+
+from . import counters, sqlite
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = Counter()
+_last_spill = time.monotonic()
+_timer_enabled = False
+_timer = None
+
+
+def enable_timer():
+    """有计数未写出时用后台定时器写出（服务进程启动时调用）"""
+    global _timer_enabled
+    _timer_enabled = True
+
+
+def record(share_pk):
+    """记录一次浏览"""
+    global _last_spill, _timer
+    with _lock:
+        _buffer[share_pk] += 1
+        due = (
+            sum(_buffer.values()) >= settings.VIEW_COUNTER_SPILL_THRESHOLD
+            or time.monotonic() - _last_spill >= settings.VIEW_COUNTER_SPILL_INTERVAL
+        )
+        if not due and _timer_enabled and _timer is None:
+            _timer = threading.Timer(settings.VIEW_COUNTER_SPILL_INTERVAL, _spill_on_timer)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        spill()
+
+
+def _spill_on_timer():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        spill()
+    finally:
+        # 定时器线程结束后不再使用它的数据库连接
+        connections.close_all()
+
+
+def pending():
+    """本进程尚未写出的计数（share pk -> 次数）"""
+    with _lock:
+        return dict(_buffer)
+
+
+def spill():
+    """把本进程缓冲的计数写入增量表，返回写出的浏览次数（已删除的分享的计数直接丢弃）"""
+    global _buffer, _last_spill
+    with _lock:
+        counts, _buffer = _buffer, Counter()
+        _last_spill = time.monotonic()
+    if not counts:
+        return 0
+    try:
+        written = sqlite.write(lambda: _insert_deltas(counts))
+    except DatabaseError:
+        # 写出失败时放回缓冲区，下次再试（期间被删除的分享下次会被跳过）
+        with _lock:
+            _buffer.update(counts)
+        logger.exception('浏览量写入增量表失败，%d 次浏览保留在内存中', sum(counts.values()))
+        return 0
+    return written
+
+
+def _insert_deltas(counts):
+    from .models import Share, ViewCountDelta
+
+    # 缓冲期间被删除的分享不再写入：外键约束会在提交时失败，整批计数都写不出去
+    existing = set(Share.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=counts).values_list('pk', flat=True))
+    rows = [ViewCountDelta(share_id=pk, count=count) for pk, count in counts.items() if pk in existing]
+    ViewCountDelta.objects.bulk_create(rows)
+    return sum(row.count for row in rows)
+
+
+def flush():
+    """把增量表合并到 Share.views，返回 (更新的分享数, 合并的浏览次数)"""
+    from .models import Share, ViewCountDelta
+
+    with transaction.atomic():
+        max_id = ViewCountDelta.objects.aggregate(max_id=Max('id'))['max_id']
+        if max_id is None:
+            return 0, 0
+        deltas = ViewCountDelta.objects.filter(id__lte=max_id)
+        totals = list(deltas.values_list('share_id').annotate(total=Sum('count')).order_by())
+        for share_pk, total in totals:
+            Share.objects.filter(pk=share_pk).update(views=F('views') + total)
+        authors = dict(Share.objects.filter(pk__in=[pk for pk, _ in totals]).values_list('pk', 'author_id'))
+        by_author = Counter()
+        for share_pk, total in totals:
+            by_author[authors.get(share_pk)] += total
+        counters.adjust_profiles('total_views', by_author)
+        deltas.delete()
+    return len(totals), sum(total for _, total in totals)
+
+
+def discard():
+    """丢弃本进程缓冲的计数（测试用）"""
+    global _timer
+    with _lock:
+        _buffer.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+
+
+@atexit.register
+def _spill_at_exit():
+    try:
+        spill()
+    except Exception:
+        logger.exception('进程退出时写出浏览量失败')
@@ -0,0 +1,139 @@
+"""
+详情页浏览去重
+
+以前把访客浏览过的最近 100 个分享 ID 用逗号拼接存入 viewed_shares Cookie（最长约 1 KB），
+它的 path 是 /，访问站内任何页面都会带上：请求头变大，匿名页面也因为 Cookie 各不相同
+无法被共享缓存复用；详情页每次还要拆分字符串逐个比较。
+
+这里改为签名的布隆过滤器，存入只随详情页（/s/ 下）发送的 Cookie：
+
+- 每个分享 ID 经 blake2b 得到若干位置，在 VIEW_DEDUP_BITS 位的位图中置位，
+  全部位置都已置位即视为浏览过
+- 当前位图记满 VIEW_DEDUP_CAPACITY 个分享后轮换：当前位图成为上一代，换一个空位图，
+  两代都参与判断，因此至少记住最近 VIEW_DEDUP_CAPACITY 个分享，最多两倍
+- Cookie 值是 版本、计数、当前位图、上一代位图（轮换前没有）和 8 字节截断的 HMAC，
+  base64url 编码后长度固定：默认 512 位时一代 99 个字符，两代 184 个字符
+
+布隆过滤器只会误判为“浏览过”（少记一次浏览），不会多记；默认参数下每代记满时误判率约 0.6%，
+没记满时更低。签名不符或格式不对的 Cookie 视为没有浏览记录。
+旧的 viewed_shares Cookie 在访客下次打开详情页时导入新 Cookie 并删除。
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import math
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+COOKIE_NAME = 'seen_shares'
+COOKIE_PATH = '/s/'
+COOKIE_MAX_AGE = 30 * 24 * 60 * 60  # 30天
+LEGACY_COOKIE_NAME = 'viewed_shares'
+
+VERSION = 1
+MAC_SIZE = 8
+KEY_SALT = 'shares.viewdedup'
+
+
+def _mask(share_id):
+    return _bloom_mask(share_id, settings.VIEW_DEDUP_BITS, settings.VIEW_DEDUP_CAPACITY)
+
+
+@functools.lru_cache(maxsize=4096)
+def _bloom_mask(share_id, bits, capacity):
+    """share_id 对应的位置全部置位的整数；位置由一个摘要的两半双重哈希得到，
+    个数取最优值 位数 / 容量 * ln 2"""
+    digest = hashlib.blake2b(share_id.encode('utf-8'), digest_size=8, person=b'view-dedup').digest()
+    first = int.from_bytes(digest[:4], 'little')
+    step = int.from_bytes(digest[4:], 'little') | 1
+    mask = 0
+    for i in range(max(1, round(bits / capacity * math.log(2)))):
+        mask |= 1 << (first + i * step) % bits
+    return mask
+
+
+@functools.lru_cache(maxsize=8)
+def _signing_key(secret):
+    # 与 salted_hmac 相同的密钥派生，按 SECRET_KEY 缓存，省去每次一次 SHA-256
+    return hashlib.sha256((KEY_SALT + secret).encode('utf-8')).digest()
+
+
+def _sign(payload):
+    return hmac.new(_signing_key(settings.SECRET_KEY), payload, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+class ViewedShares:
+    """访客浏览过的分享（两代布隆过滤器）"""
+
+    def __init__(self, current=0, previous=0, count=0):
+        self.current = current
+        self.previous = previous
+        self.count = count
+        # changed：需要写回 Cookie；legacy：请求带有旧 Cookie，需要删除
+        self.changed = False
+        self.legacy = False
+
+    def __contains__(self, share_id):
+        mask = _mask(share_id)
+        return (self.current & mask) == mask or (self.previous & mask) == mask
+
+    def add(self, share_id):
+        if self.count >= settings.VIEW_DEDUP_CAPACITY:
+            self.previous, self.current, self.count = self.current, 0, 0
+        self.current |= _mask(share_id)
+        self.count += 1
+        self.changed = True
+
+    def dumps(self):
+        size = settings.VIEW_DEDUP_BITS // 8
+        payload = bytes([VERSION, self.count]) + self.current.to_bytes(size, 'little')
+        if self.previous:
+            payload += self.previous.to_bytes(size, 'little')
+        return base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b'=').decode('ascii')
+
+    @classmethod
+    def loads(cls, value):
+        """解析 Cookie 值，签名不符或格式不对时返回 None"""
+        try:
+            raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        except (ValueError, TypeError):
+            return None
+        payload, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        size = settings.VIEW_DEDUP_BITS // 8
+        if len(payload) not in (2 + size, 2 + 2 * size) or payload[0] != VERSION:
+            return None
+        if not constant_time_compare(mac, _sign(payload)):
+            return None
+        current = int.from_bytes(payload[2:2 + size], 'little')
+        previous = int.from_bytes(payload[2 + size:], 'little')
+        return cls(current, previous, payload[1])
+
+
+def load(request):
+    """读取请求中的浏览记录，没有时导入旧的 viewed_shares Cookie"""
+    viewed = ViewedShares.loads(request.COOKIES.get(COOKIE_NAME, '')) or ViewedShares()
+    legacy = request.COOKIES.get(LEGACY_COOKIE_NAME)
+    if legacy is not None:
+        if not viewed.count and not viewed.previous:
+            for share_id in legacy.split(',')[-2 * settings.VIEW_DEDUP_CAPACITY:]:
+                if share_id:
+                    viewed.add(share_id)
+        viewed.legacy = True
+    return viewed
+
+
+def save(response, viewed):
+    """写回浏览记录并删除旧 Cookie"""
+    if viewed.changed:
+        response.set_cookie(
+            COOKIE_NAME,
+            viewed.dumps(),
+            max_age=COOKIE_MAX_AGE,
+            path=COOKIE_PATH,
+            httponly=True,  # 防止JavaScript访问
+            samesite='Lax'  # CSRF保护
+        )
+    if viewed.legacy:
+        response.delete_cookie(LEGACY_COOKIE_NAME, samesite='Lax')
@@ -1,29 +1,78 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import login, logout, authenticate, update_session_auth_hash
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib import messages
+from django.conf import settings
 from django.core.paginator import Paginator
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q, Count, Prefetch, Max
+from django.db import transaction
+from django.http import JsonResponse, HttpResponse, Http404
+from django.db.models import Q, F, Prefetch
+from django.db.models.functions import Greatest, Substr
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.html import format_html
+from django.views.decorators.http import require_POST
 from .models import Share, UserProfile, Report, Announcement, Collection, CollectionItem
 from .forms import ShareForm, UserProfileForm, CustomPasswordChangeForm, ReportForm, CollectionForm
+from .cards import attach_cards
+from .cache import author_namespace, cache_anonymous_page, invalidate, public_for_guests, shares_changed
+from .pagination import paginate
+from .replicas import read_from_replica
+from .search import SEARCH_ORDERING, search_shares
+from . import counters, middleware as profiling, ordering, sqlite, viewcounter, viewdedup
 from io import BytesIO
 import base64
+import os
 
 
 def is_admin(user):
     return user.is_authenticated and (user.is_staff or user.is_superuser)
 
 
+# 列表卡片只显示描述开头的几十个字，截取时给 HTML 标签留出余量
+DESCRIPTION_EXCERPT_LENGTH = 500
+
+
+def _list_columns(queryset, prefix=''):
+    """
+    列表页不加载分享码和完整描述（可能有数 KB），描述只截取开头一段放在 description_excerpt 中
+
+    prefix 的含义与 Share.visible_filter 相同。
+    """
+    return queryset.defer(f'{prefix}strategy_code', f'{prefix}description').annotate(
+        description_excerpt=Substr(f'{prefix}description', 1, DESCRIPTION_EXCERPT_LENGTH)
+    )
+
+
+@cache_anonymous_page(
+    'index', params=['category', 'hide_spoiler', 'hide_nsfw', 'cursor', 'fragment'],
+    namespaces=lambda request: ['index'],
+)
+@read_from_replica
 def index(request):
     """主页 - 显示所有公开且已通过审核的分享"""
-    shares_list = Share.objects.filter(
-        visibility=Share.Visibility.PUBLIC,
-        status=Share.Status.APPROVED
-    )
+    shares_list, context = _index_queryset(request)
+    shares = paginate(request, shares_list, 12)  # 每页12个
+    attach_cards(shares, 'index')
+    if request.GET.get('fragment'):
+        return _share_cards_fragment(request, shares)
+    
+    # 获取最新站点动态
+    context['latest_announcement'] = _latest_announcement().first()
+    context['shares'] = shares
+    return render(request, 'shares/index.html', context)
+
+
+def _listed_shares():
+    """公开且已通过审核的分享（列表页使用的列）"""
+    return _list_columns(Share.objects.visible_to(AnonymousUser()).select_related('author__profile'))
+
+
+def _index_queryset(request):
+    """主页按查询参数筛选后的分享列表，以及筛选条件对应的模板变量"""
+    shares_list = _listed_shares()
 
     # 筛选分类
     category = request.GET.get('category')
@@ -39,21 +88,15 @@ def index(request):
     if hide_nsfw:
         shares_list = shares_list.filter(is_nsfw=False)
 
-    paginator = Paginator(shares_list, 12)  # 每页12个
-    page_number = request.GET.get('page')
-    shares = paginator.get_page(page_number)
-    
-    # 获取最新站点动态
-    latest_announcement = Announcement.objects.filter(is_active=True).order_by('-created_at').first()
-    
-    context = {
-        'shares': shares,
+    return shares_list, {
         'current_category': category,
         'hide_spoiler': hide_spoiler,
         'hide_nsfw': hide_nsfw,
-        'latest_announcement': latest_announcement,
     }
-    return render(request, 'shares/index.html', context)
+
+
+def _latest_announcement():
+    return Announcement.objects.filter(is_active=True).order_by('-created_at')
 
 
 def announcement_list(request):
@@ -81,89 +124,125 @@ def toggle_announcement_visibility(request, announcement_id):
     return redirect('announcement_list')
 
 
+def _share_access_error(user, share):
+    """
+    检查 user 能否查看 share，不能查看时返回提示信息
+
+    私有分享仅作者和管理员可见；待审核的公开分享相当于链接可见，
+    已拒绝的仅作者和管理员可见。
+    """
+    has_permission = user.is_authenticated and (
+        share.author_id == user.id or
+        user.is_staff or
+        user.is_superuser
+    )
+    if has_permission:
+        return None
+    if share.visibility == Share.Visibility.PRIVATE:
+        return '该分享不存在或您没有权限访问'
+    if share.visibility == Share.Visibility.PUBLIC and share.status == Share.Status.REJECTED:
+        return '该分享违反规定已被拒绝，无法访问'
+    return None
+
+
+def _get_code_or_404(request, share_id):
+    share = get_object_or_404(
+        Share.objects.only('strategy_code', 'author_id', 'visibility', 'status'), share_id=share_id
+    )
+    if _share_access_error(request.user, share):
+        raise Http404
+    return share.strategy_code
+
+
+def share_code(request, share_id):
+    """列表卡片“复制码”按钮按需获取分享码（列表查询不加载分享码）"""
+    response = HttpResponse(_get_code_or_404(request, share_id), content_type='text/plain; charset=utf-8')
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
+def share_preview(request, share_id):
+    """
+    没有缩略图的卡片用 iframe 加载预览器，分享码通过重定向放在地址的 # 片段中，
+    iframe 懒加载时才查询分享码
+    """
+    response = redirect(f'/static/viewer_new/index.html#{_get_code_or_404(request, share_id)}')
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
 def share_detail(request, share_id):
     """分享详情页"""
     try:
-        share = Share.objects.get(share_id=share_id)
+        share = Share.objects.select_related('author__profile').get(share_id=share_id)
     except Share.DoesNotExist:
         return render(request, '404.html', status=404)
     
     # 检查权限
-    # 私有分享仅作者和管理员可见
-    if share.visibility == Share.Visibility.PRIVATE:
-        has_permission = request.user.is_authenticated and (
-            share.author == request.user or 
-            request.user.is_staff or 
-            request.user.is_superuser
-        )
-        if not has_permission:
-            messages.error(request, '该分享不存在或您没有权限访问')
-            return redirect('index')
+    error = _share_access_error(request.user, share)
+    if error:
+        messages.error(request, error)
+        return redirect('index')
     
-    # 审核状态检查
-    # 如果是待审核或已拒绝，仅作者和管理员可见，或者通过链接访问（待审核状态下）
-    # 用户需求：待审核的相当于链接可见
-    if share.status != Share.Status.APPROVED:
-        # 如果是公开分享但未通过审核
-        if share.visibility == Share.Visibility.PUBLIC:
-            # 待审核状态：所有人可通过链接访问（类似于 Unlisted）
-            # 已拒绝状态：仅作者和管理员可见
-            if share.status == Share.Status.REJECTED:
-                has_permission = request.user.is_authenticated and (
-                    share.author == request.user or 
-                    request.user.is_staff or 
-                    request.user.is_superuser
-                )
-                if not has_permission:
-                    messages.error(request, '该分享违反规定已被拒绝，无法访问')
-                    return redirect('index')
-    
-    # 精准浏览量统计：使用Cookie防止重复计数
-    # Cookie名称：viewed_shares，存储已浏览的分享ID列表
-    viewed_shares = request.COOKIES.get('viewed_shares', '')
-    viewed_list = viewed_shares.split(',') if viewed_shares else []
-    
-    # 如果该分享未被当前访客浏览过，则增加浏览量
-    if share_id not in viewed_list:
-        share.views += 1
-        share.save(update_fields=['views'])
-        # 将该分享ID添加到已浏览列表
-        viewed_list.append(share_id)
-        # 限制Cookie大小，最多保留最近100个浏览记录
-        if len(viewed_list) > 100:
-            viewed_list = viewed_list[-100:]
-    
-    # 获取该分享所属的合集（仅显示公开的，或者作者自己的）
-    related_collections = Collection.objects.filter(
-        collectionitem__share=share
-    ).filter(
-        Q(is_public=True) | Q(author=request.user if request.user.is_authenticated else None)
-    ).distinct()
+    viewed = _count_view(request, share)
     
     # 获取用户的合集列表（用于添加到合集功能）
     user_collections = []
-    if request.user.is_authenticated and share.author == request.user:
-        user_collections = Collection.objects.filter(author=request.user).order_by('-updated_at')
+    if request.user.is_authenticated and share.author_id == request.user.id:
+        user_collections = _user_collections(request.user)
 
     response = render(request, 'shares/detail.html', {
         'share': share,
-        'related_collections': related_collections,
+        'related_collections': _related_collections(share, request.user),
         'user_collections': user_collections,
     })
-    
-    # 更新Cookie（30天有效期）
-    if share_id not in viewed_shares.split(','):
-        response.set_cookie(
-            'viewed_shares',
-            ','.join(viewed_list),
-            max_age=30*24*60*60,  # 30天
-            httponly=True,  # 防止JavaScript访问
-            samesite='Lax'  # CSRF保护
-        )
-    
+    _set_viewed_cookie(response, viewed)
     return response
 
 
+def _count_view(request, share):
+    """
+    精准浏览量统计：使用Cookie防止重复计数
+
+    浏览记录是签名的布隆过滤器，只随详情页发送（见 viewdedup.py）。
+    该分享未被当前访客浏览过时记一次浏览。返回浏览记录，由 _set_viewed_cookie 写回。
+    """
+    viewed = viewdedup.load(request)
+    if share.share_id in viewed:
+        return viewed
+
+    # 先记入缓冲区，由 flush_view_counts 批量写回；页面上直接显示加一后的值
+    viewcounter.record(share.pk)
+    share.views += 1
+    viewed.add(share.share_id)
+    return viewed
+
+
+def _set_viewed_cookie(response, viewed):
+    # 有新的浏览时更新Cookie（30天有效期），同时删除旧格式的Cookie
+    viewdedup.save(response, viewed)
+
+
+def _related_collections(share, user):
+    """分享所属的合集（仅显示公开的，或者作者自己的）"""
+    return Collection.objects.filter(
+        collectionitem__share=share
+    ).filter(
+        Q(is_public=True) | Q(author=user if user.is_authenticated else None)
+    ).distinct().select_related('author__profile').prefetch_related(
+        Prefetch(
+            'collectionitem_set',
+            queryset=CollectionItem.objects.select_related('share').only(
+                'collection_id', 'order', 'added_at', 'share__share_id', 'share__title'
+            ),
+        )
+    )
+
+
+def _user_collections(user):
+    return Collection.objects.filter(author=user).order_by('-updated_at')
+
+
 def create_share(request):
     """创建新分享"""
     if request.method == 'POST':
@@ -188,16 +267,16 @@ def create_share(request):
                 share.visibility = Share.Visibility.UNLISTED
                 share.status = Share.Status.APPROVED
             
-            share.save()
+            share.allocate_share_id()
+            sqlite.write(share.save)
+            _warn_duplicate(request, share)
             
             # 如果选择了合集，则添加到合集
             collection_id = request.POST.get('collection_id')
             if collection_id and request.user.is_authenticated:
                 try:
                     collection = Collection.objects.get(id=collection_id, author=request.user)
-                    max_order = CollectionItem.objects.filter(collection=collection).aggregate(Max('order'))['order__max']
-                    new_order = (max_order or 0) + 1
-                    CollectionItem.objects.create(collection=collection, share=share, order=new_order)
+                    sqlite.write(lambda: ordering.add(collection, share))
                 except Collection.DoesNotExist:
                     pass
 
@@ -215,6 +294,16 @@ def create_share(request):
     return render(request, 'shares/create.html', {'form': form, 'user_collections': user_collections})
 
 
+def _warn_duplicate(request, share):
+    """分享的战术板与已有分享内容相同时给出提示"""
+    duplicate = share.find_duplicate(request.user)
+    if duplicate:
+        messages.warning(request, format_html(
+            '该战术板已存在于分享 <a href="{}" class="alert-link">{}</a>（{}）',
+            duplicate.get_absolute_url(), duplicate.title, duplicate.share_id,
+        ))
+
+
 @login_required
 def edit_share(request, share_id):
     """编辑分享"""
@@ -238,6 +327,8 @@ def edit_share(request, share_id):
                 new_share.status = Share.Status.APPROVED
                 
             new_share.save()
+            if 'strategy_code' in form.changed_data:
+                _warn_duplicate(request, new_share)
             if new_share.status == Share.Status.APPROVED:
                 messages.success(request, '分享更新成功！')
             return redirect('share_detail', share_id=share.share_id)
@@ -272,16 +363,15 @@ def delete_share(request, share_id):
 @login_required
 def my_shares(request):
     """我的分享列表"""
-    shares_list = Share.objects.filter(author=request.user)
-    paginator = Paginator(shares_list, 12)
-    page_number = request.GET.get('page')
-    shares = paginator.get_page(page_number)
+    shares_list = _list_columns(Share.objects.filter(author=request.user))
+    shares = paginate(request, shares_list, 12)
     
     # 获取我的合集
-    collections = Collection.objects.filter(author=request.user).annotate(item_count=Count('collectionitem')).order_by('-updated_at')
+    collections = Collection.objects.filter(author=request.user).order_by('-updated_at')
     
     return render(request, 'shares/my_shares.html', {
         'shares': shares,
+        'share_count': shares_list.count(),
         'collections': collections,
     })
 
@@ -359,6 +449,8 @@ def password_change(request):
     return render(request, 'shares/password_change.html', {'form': form})
 
 
+@public_for_guests
+@read_from_replica
 def search(request):
     """搜索分享"""
     query = request.GET.get('q', '').strip()
@@ -367,37 +459,16 @@ def search(request):
         return redirect('index')
         
     # 优先匹配 share_id (不再限制长度，兼容不同版本的ID格式)
-    try:
-        share = Share.objects.get(share_id=query)
-        # 检查权限：
-        # 1. 公开或不公开(Unlisted) -> 允许访问
-        # 2. 私有(Private) -> 作者或管理员允许访问
-        can_view = (share.visibility != Share.Visibility.PRIVATE) or \
-                   (request.user.is_authenticated and (
-                       share.author == request.user or 
-                       request.user.is_staff or 
-                       request.user.is_superuser
-                   ))
-                   
-        if can_view:
-            return redirect('share_detail', share_id=share.share_id)
-    except Share.DoesNotExist:
-        pass
+    share = _search_id_match(query).first()
+    if share and _can_open_by_id(request.user, share):
+        return redirect('share_detail', share_id=share.share_id)
 
-    # 普通搜索 - 仅显示公开且已通过审核的分享
-    shares_list = Share.objects.filter(
-        visibility=Share.Visibility.PUBLIC,
-        status=Share.Status.APPROVED
-    ).filter(
-        Q(title__icontains=query) |
-        Q(description__icontains=query) |
-        Q(author__profile__nickname__icontains=query) |
-        Q(author__username__icontains=query)
-    ).distinct()
-    
-    paginator = Paginator(shares_list, 12)
-    page_number = request.GET.get('page')
-    shares = paginator.get_page(page_number)
+    # 普通搜索 - 仅显示公开且已通过审核的分享，按相关度排序
+    shares_list = search_shares(_listed_shares(), query)
+    shares = paginate(request, shares_list, 12, ordering=SEARCH_ORDERING)
+    attach_cards(shares, 'index')
+    if request.GET.get('fragment'):
+        return _share_cards_fragment(request, shares)
     
     return render(request, 'shares/index.html', {
         'shares': shares,
@@ -405,6 +476,31 @@ def search(request):
     })
 
 
+def _search_id_match(query):
+    return Share.objects.filter(share_id=query).only('share_id', 'author_id', 'visibility')
+
+
+def _can_open_by_id(user, share):
+    """
+    搜索框输入分享 ID 时能否直接跳转：
+    1. 公开或不公开(Unlisted) -> 允许访问
+    2. 私有(Private) -> 作者或管理员允许访问
+    """
+    return (share.visibility != Share.Visibility.PRIVATE) or \
+           (user.is_authenticated and (
+               share.author_id == user.id or
+               user.is_staff or
+               user.is_superuser
+           ))
+
+
+def _share_cards_fragment(request, shares):
+    """“加载更多”使用的卡片片段，下一页地址放在 X-Next-Page 响应头中"""
+    response = render(request, 'shares/_share_cards.html', {'shares': shares})
+    response['X-Next-Page'] = shares.next_url
+    return response
+
+
 def about(request):
     """关于页面"""
     return render(request, 'about.html')
@@ -415,14 +511,85 @@ def page_not_found(request, exception):
     return render(request, '404.html', status=404)
 
 
+@user_passes_test(is_admin)
+def admin_profiling_stats(request):
+    """管理员查看按 URL 名称汇总的请求耗时统计（POST 清空）"""
+    if request.method == 'POST':
+        profiling.reset()
+    return JsonResponse({
+        'enabled': settings.REQUEST_PROFILING,
+        'pid': os.getpid(),
+        'views': profiling.snapshot(),
+    }, json_dumps_params={'ensure_ascii': False, 'indent': 2})
+
+
+# 审核列表“加载更多”一次最多预取的条数
+REVIEW_PREFETCH_LIMIT = 50
+
+
 @user_passes_test(is_admin)
 def admin_review_list(request):
     """管理员审核列表"""
-    pending_shares = Share.objects.filter(status=Share.Status.PENDING).order_by('-created_at')
-    paginator = Paginator(pending_shares, 20)
-    page_number = request.GET.get('page')
-    shares = paginator.get_page(page_number)
-    return render(request, 'shares/admin_review_list.html', {'shares': shares})
+    pending_shares = _list_columns(
+        Share.objects.filter(status=Share.Status.PENDING).select_related('author__profile')
+    )
+    if request.GET.get('fragment'):
+        # 键盘审核时预取后续的待审核分享
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), REVIEW_PREFETCH_LIMIT)
+        except ValueError:
+            limit = 20
+        shares = paginate(request, pending_shares, limit)
+        response = render(request, 'shares/_review_cards.html', {'shares': shares})
+        response['X-Next-Page'] = shares.next_url
+        return response
+
+    shares = paginate(request, pending_shares, 20)
+    pending_count = Share.objects.filter(status=Share.Status.PENDING).count()
+    return render(request, 'shares/admin_review_list.html', {'shares': shares, 'pending_count': pending_count})
+
+
+def _moderate_shares(share_ids, action):
+    """
+    批量通过或拒绝待审核分享，返回实际处理的数量
+
+    每个操作只执行一条 UPDATE（不逐个 save()），已被其他管理员处理过的分享不受影响。
+    queryset.update 不触发信号，之后手动调整作者的公开分享数并使受影响的缓存页面失效。
+    """
+    changes = {'status': Share.Status.APPROVED}
+    if action == 'reject':
+        changes = {'status': Share.Status.REJECTED, 'visibility': Share.Visibility.PRIVATE}
+    with transaction.atomic():
+        pending = Share.objects.filter(share_id__in=share_ids, status=Share.Status.PENDING)
+        pks = list(pending.values_list('pk', flat=True))
+        updated = pending.filter(pk__in=pks).update(**changes, updated_at=timezone.now())
+        if action == 'approve':
+            counters.shares_published(pks)
+    if pks:
+        shares_changed(pks)
+    return updated
+
+
+@user_passes_test(is_admin)
+@require_POST
+def admin_bulk_moderate(request):
+    """批量审核：通过或拒绝选中的分享（POST share_ids 可重复，action 为 approve 或 reject）"""
+    action = request.POST.get('action')
+    share_ids = request.POST.getlist('share_ids')
+    if action not in ('approve', 'reject'):
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'error': '无效的操作'}, status=400)
+        messages.error(request, '无效的操作')
+        return redirect('admin_review_list')
+
+    updated = _moderate_shares(share_ids, action)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'action': action, 'updated': updated})
+    if action == 'approve':
+        messages.success(request, f'已通过 {updated} 个分享')
+    else:
+        messages.warning(request, f'已拒绝 {updated} 个分享并设为私有')
+    return redirect('admin_review_list')
 
 
 @user_passes_test(is_admin)
@@ -457,7 +624,11 @@ def report_share(request, share_id):
             report = form.save(commit=False)
             report.share = share
             report.reporter = request.user
-            report.save()
+            def submit():
+                report.save()
+                _adjust_pending_reports(share.pk, 1)
+
+            sqlite.write(submit)
             messages.success(request, '举报已提交，管理员将尽快处理。')
             return redirect('share_detail', share_id=share_id)
     else:
@@ -466,17 +637,22 @@ def report_share(request, share_id):
     return render(request, 'shares/report_share.html', {'form': form, 'share': share})
 
 
+def _adjust_pending_reports(share_pk, delta):
+    """增减分享的待处理举报数（与举报状态的修改放在同一事务中）"""
+    Share.objects.filter(pk=share_pk).update(
+        pending_report_count=Greatest(F('pending_report_count') + delta, 0)
+    )
+
+
 @user_passes_test(is_admin)
 def admin_report_list(request):
     """管理员举报处理列表 - 按分享聚合"""
-    # 查找所有有待处理举报的分享
-    reported_shares = Share.objects.annotate(
-        pending_count=Count('reports', filter=Q(reports__status=Report.Status.PENDING))
-    ).filter(
-        pending_count__gt=0
-    ).prefetch_related(
+    # 只读取有待处理举报的分享（share_reported 部分索引），不再对全表聚合
+    reported_shares = Share.objects.filter(
+        pending_report_count__gt=0
+    ).select_related('author').defer('strategy_code', 'description').prefetch_related(
         Prefetch('reports', queryset=Report.objects.filter(status=Report.Status.PENDING).select_related('reporter'), to_attr='pending_reports')
-    ).order_by('-pending_count', '-updated_at')
+    ).order_by('-pending_report_count', '-updated_at')
     
     paginator = Paginator(reported_shares, 10)
     page_number = request.GET.get('page')
@@ -488,27 +664,34 @@ def admin_report_list(request):
 @user_passes_test(is_admin)
 def admin_resolve_report(request, report_id, action):
     """管理员处理单条举报"""
-    report = get_object_or_404(Report, id=report_id)
+    report = get_object_or_404(Report.objects.select_related('share'), id=report_id)
     
     if action == 'resolve':
         # 认可举报：将分享设为私有，标记举报为已处理
-        report.status = Report.Status.RESOLVED
-        share = report.share
-        share.visibility = Share.Visibility.PRIVATE
-        share.save()
-        messages.success(request, f'举报已认可，分享 "{share.title}" 已被设为私有')
+        status = Report.Status.RESOLVED
     elif action == 'dismiss':
         # 驳回举报
-        report.status = Report.Status.DISMISSED
-        messages.info(request, '举报已驳回')
+        status = Report.Status.DISMISSED
     else:
         messages.error(request, '无效的操作')
         return redirect('admin_report_list')
-        
-    report.resolved_at = timezone.now()
-    report.resolved_by = request.user
-    report.save()
-    
+
+    share = report.share
+    with transaction.atomic():
+        # 只有仍为待处理的举报才计入变化，重复提交不会重复扣减
+        updated = Report.objects.filter(pk=report.pk, status=Report.Status.PENDING).update(
+            status=status, resolved_at=timezone.now(), resolved_by=request.user
+        )
+        if updated:
+            _adjust_pending_reports(share.pk, -1)
+        if action == 'resolve':
+            share.visibility = Share.Visibility.PRIVATE
+            share.save()
+
+    if action == 'resolve':
+        messages.success(request, f'举报已认可，分享 "{share.title}" 已被设为私有')
+    else:
+        messages.info(request, '举报已驳回')
     return redirect('admin_report_list')
 
 
@@ -524,47 +707,52 @@ def admin_resolve_share_reports(request, share_id, action):
 
     if action == 'resolve':
         # 认可举报：分享设为私有，所有待处理举报设为已解决
-        share.visibility = Share.Visibility.PRIVATE
-        share.save()
-        pending_reports.update(status=Report.Status.RESOLVED, resolved_at=timezone.now(), resolved_by=request.user)
+        with transaction.atomic():
+            share.visibility = Share.Visibility.PRIVATE
+            share.save()
+            updated = pending_reports.update(status=Report.Status.RESOLVED, resolved_at=timezone.now(), resolved_by=request.user)
+            _adjust_pending_reports(share.pk, -updated)
         messages.success(request, f'已认可举报，分享 "{share.title}" 已设为私有，相关举报已标记为处理。')
         
     elif action == 'dismiss':
         # 驳回举报：所有待处理举报设为已驳回
-        pending_reports.update(status=Report.Status.DISMISSED, resolved_at=timezone.now(), resolved_by=request.user)
+        with transaction.atomic():
+            updated = pending_reports.update(status=Report.Status.DISMISSED, resolved_at=timezone.now(), resolved_by=request.user)
+            _adjust_pending_reports(share.pk, -updated)
         messages.info(request, f'已驳回分享 "{share.title}" 的所有举报。')
         
     return redirect('admin_report_list')
 
 
+@cache_anonymous_page(
+    'user_public_profile', params=['cursor'],
+    namespaces=lambda request, username: [author_namespace(username)],
+)
+@read_from_replica
 def user_public_profile(request, username):
     """用户公开个人主页"""
-    author = get_object_or_404(User, username=username)
+    # 分享数和浏览量直接读取资料中的计数，不再聚合
+    author = get_object_or_404(User.objects.select_related('profile'), username=username)
     
     # 获取该用户发布的所有公开且已通过审核的分享
-    shares_list = Share.objects.filter(
-        author=author,
-        visibility=Share.Visibility.PUBLIC,
-        status=Share.Status.APPROVED
-    ).order_by('-created_at')
-    
-    paginator = Paginator(shares_list, 12)
-    page_number = request.GET.get('page')
-    shares = paginator.get_page(page_number)
-    
-    # 获取用户的公开合集
-    collections = Collection.objects.filter(
-        author=author,
-        is_public=True
-    ).annotate(item_count=Count('collectionitem')).order_by('-updated_at')
+    shares = paginate(request, _listed_shares().filter(author=author), 12)
+    attach_cards(shares, 'profile')
     
     return render(request, 'shares/user_public_profile.html', {
         'author': author,
         'shares': shares,
-        'collections': collections,
+        'collections': _public_collections(author),
     })
 
 
+def _public_collections(author):
+    """用户的公开合集"""
+    return Collection.objects.filter(
+        author=author,
+        is_public=True
+    ).order_by('-updated_at')
+
+
 @login_required
 def create_collection(request):
     """创建合集"""
@@ -618,37 +806,58 @@ def delete_collection(request, collection_id):
     return render(request, 'shares/delete_collection.html', {'collection': collection})
 
 
+# 合集内容的排序（同时作为游标分页的键，对应 collection_item_order 索引）
+COLLECTION_ITEM_ORDERING = ('order', 'added_at', 'id')
+
+
+@public_for_guests
+@read_from_replica
 def collection_detail(request, collection_id):
     """合集详情页"""
-    collection = get_object_or_404(Collection, id=collection_id)
+    collection = get_object_or_404(Collection.objects.select_related('author__profile'), id=collection_id)
     
     # 权限检查：如果是私有合集，仅作者可见
     if not collection.is_public and collection.author != request.user:
         messages.error(request, '该合集不存在或您没有权限访问')
         return redirect('index')
         
-    # 获取合集内的分享（按顺序）
-    collection_items = CollectionItem.objects.filter(collection=collection).select_related('share', 'share__author', 'share__author__profile').order_by('order', 'added_at')
-    
-    # 过滤掉不可见的分享（除非是作者或管理员）
-    visible_items = []
-    for item in collection_items:
-        share = item.share
-        can_view = (share.visibility == Share.Visibility.PUBLIC and share.status == Share.Status.APPROVED) or \
-                   (request.user.is_authenticated and (
-                       share.author == request.user or 
-                       request.user.is_staff or 
-                       request.user.is_superuser
-                   ))
-        if can_view:
-            visible_items.append(item)
-            
+    items = paginate(request, _collection_items(collection, request.user), 12, ordering=COLLECTION_ITEM_ORDERING)
+    attach_cards(items, **_collection_card_options(request, collection), start=items.start_index())
+
     return render(request, 'shares/collection_detail.html', {
         'collection': collection,
-        'items': visible_items,
+        'items': items,
     })
 
 
+def _collection_items(collection, user):
+    """合集内当前访客可见的分享（按顺序），可见性在 SQL 中过滤，每页只读取一页的行"""
+    return _list_columns(
+        CollectionItem.objects.filter(collection=collection)
+        .filter(Share.visible_filter(user, prefix='share__'))
+        .select_related('share', 'share__author', 'share__author__profile'),
+        prefix='share__',
+    )
+
+
+def _collection_card_options(request, collection):
+    """合集页 attach_cards 的参数；合集作者的卡片带有移除表单（含 CSRF 令牌），不走缓存"""
+    is_owner = request.user == collection.author
+
+    def item_share(item):
+        item.share.description_excerpt = item.description_excerpt
+        return item.share
+
+    return {
+        'variant': 'collection',
+        'share': item_share,
+        'extra': lambda item, position: (collection.id, position, item.added_at),
+        'context': {'collection': collection, 'is_owner': is_owner},
+        'request': request,
+        'cached': not is_owner,
+    }
+
+
 @login_required
 def add_share_to_collection(request, share_id):
     """将分享添加到合集"""
@@ -667,11 +876,7 @@ def add_share_to_collection(request, share_id):
         if CollectionItem.objects.filter(collection=collection, share=share).exists():
             messages.warning(request, '该分享已在合集中')
         else:
-            # 获取当前最大排序值
-            max_order = CollectionItem.objects.filter(collection=collection).aggregate(Max('order'))['order__max']
-            new_order = (max_order or 0) + 1
-            
-            CollectionItem.objects.create(collection=collection, share=share, order=new_order)
+            sqlite.write(lambda: ordering.add(collection, share))
             messages.success(request, '已添加到合集')
             
         return redirect('share_detail', share_id=share_id)
@@ -692,5 +897,51 @@ def remove_share_from_collection(request, collection_id, share_id):
     return redirect('collection_detail', collection_id=collection_id)
 
 
+@login_required
+@require_POST
+def reorder_collection(request, collection_id):
+    """
+    调整合集内容的顺序（拖放排序）
+
+    POST share_ids（可重复）为要移动的分享，按给出的顺序连续排在 after 之后或 before 之前；
+    都不传时排在开头。传入全部分享即为完整的重新排序。
+    """
+    collection = get_object_or_404(Collection, id=collection_id, author=request.user)
+    try:
+        updated = ordering.move(
+            collection, request.POST.getlist('share_ids'),
+            after=request.POST.get('after') or None, before=request.POST.get('before') or None,
+        )
+    except ordering.OrderingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    # bulk_update 不触发信号；合集的更新时间变了，作者主页的合集列表需要失效
+    invalidate(author_namespace(request.user.username))
+    return JsonResponse({'updated': updated})
+
+
+@login_required
+@require_POST
+def bulk_add_to_collection(request):
+    """把选中的多个自己的分享一次加入合集（POST collection_id 和可重复的 share_ids）"""
+    collection = get_object_or_404(Collection, id=request.POST.get('collection_id'), author=request.user)
+    share_ids = request.POST.getlist('share_ids')
+    position = {share_id: index for index, share_id in enumerate(share_ids)}
+    shares = sorted(
+        Share.objects.filter(author=request.user, share_id__in=share_ids).only('id', 'share_id'),
+        key=lambda share: position[share.share_id],
+    )
+    added = ordering.append(collection, shares)
+    if added:
+        invalidate(author_namespace(request.user.username))
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'added': len(added)})
+    if added:
+        messages.success(request, f'已将 {len(added)} 个分享加入合集「{collection.title}」')
+    else:
+        messages.info(request, '所选分享都已在合集中')
+    return redirect('collection_detail', collection_id=collection.id)
+
+
 
 